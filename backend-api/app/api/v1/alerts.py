@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
-router = APIRouter()
+from app.core.profiling import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/")
 async def get_alerts():
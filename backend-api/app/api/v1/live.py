@@ -0,0 +1,53 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+import asyncio
+
+from app.core.profiling import TimedRoute
+from app.schemas.weather import GridBounds
+from app.services.live_updates import ConnectionQueue, live_hub
+
+router = APIRouter(route_class=TimedRoute)
+
+
+async def _pump(websocket: WebSocket, queue: ConnectionQueue):
+    """Send queued payloads to the client as they become available"""
+    while True:
+        payload = await queue.get()
+        await websocket.send_text(payload)
+
+
+@router.websocket("/ws")
+async def live_updates(websocket: WebSocket):
+    """
+    Live weather updates for a map region
+
+    Clients send `{"type": "subscribe", "bounds": {...}}` to (re)set the
+    watched area and receive `cell_update` messages for readings inside it.
+    """
+
+    await websocket.accept()
+    conn_id, queue = live_hub.connect()
+    sender = asyncio.create_task(_pump(websocket, queue))
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+
+            if message.get("type") == "subscribe":
+                try:
+                    live_hub.subscribe(conn_id, GridBounds(**message.get("bounds", {})))
+                except (ValidationError, ValueError) as exc:
+                    await websocket.send_json({"type": "error", "detail": str(exc)})
+            elif message.get("type") == "unsubscribe":
+                live_hub.unsubscribe(conn_id)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        live_hub.disconnect(conn_id)
+
+
+@router.get("/stats")
+async def live_stats():
+    """Live update connection statistics"""
+    return live_hub.stats()
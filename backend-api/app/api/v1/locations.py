@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Query
+from typing import List
+
+from app.core.config import settings
+from app.core.profiling import TimedRoute
+from app.schemas.weather import PlaceResult, PlaceSearchResponse
+from app.services.location_search import location_search
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/search", response_model=PlaceSearchResponse)
+async def search_locations(
+    q: str = Query(..., min_length=1, description="Place name in English or Chinese"),
+    limit: int = Query(10, ge=1, le=settings.LOCATION_SEARCH_MAX_RESULTS)
+):
+    """
+    Search districts, places, estates and buildings by name
+    
+    Prefix matches on any word of the name come first, then fuzzy
+    (trigram) matches, so typos such as `mongkok` still find Mong Kok.
+    """
+    
+    results = location_search.index.search(q, limit)
+    return {"query": q, "results": results, "total": len(results)}
+
+
+@router.get("/reverse", response_model=List[PlaceResult])
+async def reverse_geocode(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    limit: int = Query(1, ge=1, le=settings.LOCATION_SEARCH_MAX_RESULTS),
+    max_distance: float = Query(settings.REVERSE_GEOCODE_MAX_METERS, gt=0, le=50000)
+):
+    """
+    Nearest named places to a point
+    
+    - **max_distance**: search radius in meters; an empty list when
+      nothing is within it
+    """
+    
+    return location_search.index.nearest(lat, lng, limit, max_distance)
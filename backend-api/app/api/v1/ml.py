@@ -1,6 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+import numpy as np
 
-router = APIRouter()
+from app.core.config import settings
+from app.core.profiling import TimedRoute
+from app.schemas.weather import MorphologyRequest, MorphologyResponse
+from app.services.morphology import MORPHOLOGY_FEATURES, morphology_store
+
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/models")
 async def list_ml_models():
@@ -19,3 +25,33 @@ async def list_ml_models():
             }
         ]
     }
+
+
+@router.post("/morphology", response_model=MorphologyResponse)
+async def get_morphology(request: MorphologyRequest):
+    """
+    Urban morphology features for a batch of points
+    
+    Returns one array per feature (plan/frontal area index, heights,
+    H/W, sky view factor, street orientation), aligned with the input
+    points, from the precomputed morphology grid.
+    """
+    
+    if len(request.lats) != len(request.lngs):
+        raise HTTPException(status_code=400, detail="lats and lngs must have the same length")
+    if len(request.lats) > settings.MORPHOLOGY_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.MORPHOLOGY_MAX_POINTS} points per request"
+        )
+    
+    grid = morphology_store.get()
+    if grid is None:
+        raise HTTPException(status_code=503, detail="Morphology grid has not been built")
+    
+    values = grid.lookup(request.lats, request.lngs)
+    values = np.where(np.isfinite(values), values, None)
+    return {
+        "resolution": grid.resolution,
+        "features": {name: values[:, i].tolist() for i, name in enumerate(MORPHOLOGY_FEATURES)}
+    }
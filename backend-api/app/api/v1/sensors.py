@@ -1,8 +1,37 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Body, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Union
 
-router = APIRouter()
+from app.core.config import settings
+from app.core.profiling import TimedRoute
+from app.db.database import get_db
+from app.schemas.weather import SensorReading
+from app.services.ingest import ingest_readings
 
-@router.post("/readings")
-async def submit_sensor_reading():
-    """Submit sensor reading from crowdsourced device"""
-    return {"status": "accepted"}
+router = APIRouter(route_class=TimedRoute)
+
+@router.post("/readings", status_code=202)
+async def submit_sensor_reading(
+    readings: Union[SensorReading, List[SensorReading]] = Body(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Submit sensor readings from crowdsourced devices
+
+    Accepts one reading or a batch of up to SENSOR_BATCH_SIZE. Readings
+    with missing or implausible values are counted as rejected.
+    """
+
+    if not settings.ENABLE_CROWDSOURCING:
+        raise HTTPException(status_code=403, detail="Crowdsourced readings are disabled")
+
+    if isinstance(readings, SensorReading):
+        readings = [readings]
+    if len(readings) > settings.SENSOR_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.SENSOR_BATCH_SIZE} readings per request"
+        )
+
+    accepted = await ingest_readings(db, readings)
+    return {"status": "accepted", "accepted": accepted, "rejected": len(readings) - accepted}
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+
+from app.core.http_cache import cache_headers, is_not_modified, not_modified
+from app.core.profiling import TimedRoute
+from app.db.database import get_read_db
+from app.services.epochs import data_epochs
+from app.services.raster import HK_BOUNDS, raster_store
+from app.services.tiles import (
+    HEATMAP_LAYERS,
+    RASTER_FORMATS,
+    VECTOR_LAYERS,
+    VectorTileService,
+    heatmap_tile,
+    raster_tile_cache,
+    tile_bounds,
+    validate_tile,
+    vector_tile_cache,
+)
+
+router = APIRouter(route_class=TimedRoute)
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+@router.get("/{layer}/{z}/{x}/{y}.mvt")
+async def get_vector_tile(
+    request: Request,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get a weather layer as a Mapbox Vector Tile
+
+    - **layer**: temperature, humidity, rain or wind
+    - **z/x/y**: XYZ tile coordinates
+    """
+
+    if layer not in VECTOR_LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown layer '{layer}'")
+    try:
+        validate_tile(z, x, y)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    epoch = data_epochs.epoch(*tile_bounds(z, x, y))
+    etag = data_epochs.etag(epoch, request.url.path)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    key = (layer, z, x, y, epoch)
+    tile = await vector_tile_cache.get(key)
+    if tile is None:
+        tile = await VectorTileService(db).render(layer, z, x, y)
+        await vector_tile_cache.set(key, tile)
+
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=cache_headers(etag))
+
+
+@router.get("/heatmap/{layer}/{z}/{x}/{y}.{fmt}")
+async def get_heatmap_tile(
+    request: Request,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+    fmt: str,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get a 256x256 heatmap overlay tile
+
+    - **layer**: temperature, humidity, rain or wind
+    - **fmt**: png, or webp when Pillow is installed
+    """
+
+    if layer not in HEATMAP_LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown layer '{layer}'")
+    if fmt not in RASTER_FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unsupported tile format '{fmt}'")
+    try:
+        validate_tile(z, x, y)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # The raster is rebuilt per Hong Kong-wide epoch, so revalidate first
+    etag = data_epochs.etag(data_epochs.epoch(*HK_BOUNDS), request.url.path)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    pyramid = await raster_store.get(db)
+    if pyramid is None:
+        raise HTTPException(status_code=404, detail="No weather data available")
+
+    # Rebuilds are throttled, so tag the tile with the epoch it was built from
+    raster = pyramid.base
+    etag = data_epochs.etag(raster.epoch, request.url.path)
+
+    key = (layer, fmt, z, x, y, raster.epoch)
+    tile = await raster_tile_cache.get(key)
+    if tile is None:
+        try:
+            tile = await asyncio.to_thread(heatmap_tile, raster, layer, z, x, y, fmt)
+        except ValueError as exc:
+            raise HTTPException(status_code=415, detail=str(exc))
+        await raster_tile_cache.set(key, tile)
+
+    return Response(content=tile, media_type=RASTER_FORMATS[fmt], headers=cache_headers(etag))
+
+
+@router.get("/stats")
+async def tile_cache_stats():
+    """Tile cache statistics"""
+    return {
+        "vector": vector_tile_cache.stats(),
+        "raster": raster_tile_cache.stats(),
+    }
@@ -1,26 +1,107 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from geoalchemy2.functions import ST_Distance, ST_MakePoint, ST_SetSRID
-from typing import Optional, List
+from typing import Optional, List, Sequence, Tuple
 from datetime import datetime, timedelta
+import json
 
-from app.db.database import get_db
-from app.db.models import WeatherReading
+from app.core.config import settings
+from app.core.geo import degrees_for_meters
+from app.core.http_cache import cache_headers, is_not_modified, not_modified
+from app.core.locations import point_location, resolve_locations
+from app.core.profiling import TimedRoute
+from app.db.columns import naive_utc
+from app.db.database import get_db, get_read_db
 from app.schemas.weather import (
     WeatherResponse, 
     WeatherGridRequest, 
     WeatherGridResponse,
-    VerticalProfileResponse
+    GridBounds,
+    VerticalProfileResponse,
+    ComparisonRequest,
+    ComparisonResponse
 )
-from app.services.weather_service import WeatherService
+from app.services.weather_service import COMPARISON_SORT_KEYS, WeatherService
 from app.services.cache import RedisCache
+from app.services.epochs import data_epochs
+from app.services.raster import HK_BOUNDS, raster_store
+from app.services.export import EXPORT_COLUMNS, EXPORT_FORMATS, PYARROW_AVAILABLE, stream_export
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+
+def _request_etag(request: Request, epoch: str) -> str:
+    """ETag for a GET request keyed by path, sorted query and data epoch"""
+    query = sorted(request.query_params.multi_items())
+    return data_epochs.etag(epoch, request.url.path, query)
+
+
+def _parse_points(points: Optional[str]) -> List[Tuple[float, float]]:
+    """ "lat,lng;lat,lng" -> [(lat, lng), ...]"""
+    if not points:
+        return []
+    try:
+        pairs = [tuple(float(v) for v in p.split(",")) for p in points.split(";") if p.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="points must be 'lat,lng' pairs separated by ';'")
+    if any(len(pair) != 2 for pair in pairs):
+        raise HTTPException(status_code=400, detail="points must be 'lat,lng' pairs separated by ';'")
+    return pairs
+
+
+def _ndjson_entries(entries: List[dict], chunk_size: int = settings.COMPARISON_STREAM_CHUNK):
+    for start in range(0, len(entries), chunk_size):
+        lines = (json.dumps(e, ensure_ascii=False, separators=(",", ":")) for e in entries[start:start + chunk_size])
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def _compare(
+    db: AsyncSession,
+    location_ids: Sequence[str],
+    points: Sequence[Tuple[float, float]],
+    elevation: float,
+    sort: Optional[str],
+    descending: bool,
+    stream: bool
+):
+    """Resolve, cap and compare locations; shared by GET and POST /comparison"""
+    
+    if sort is not None and sort not in COMPARISON_SORT_KEYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sort must be one of: {', '.join(COMPARISON_SORT_KEYS)}"
+        )
+    
+    targets, unknown = resolve_locations(location_ids)
+    for lat, lng in points:
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise HTTPException(status_code=400, detail=f"Point out of range: {lat},{lng}")
+        targets.append(point_location(lat, lng))
+    
+    if not targets:
+        raise HTTPException(status_code=400, detail="No known locations or points to compare")
+    limit = settings.COMPARISON_STREAM_MAX_LOCATIONS if stream else settings.COMPARISON_MAX_LOCATIONS
+    if len(targets) > limit:
+        hint = "" if stream else "; use stream=true for larger lists"
+        raise HTTPException(status_code=400, detail=f"At most {limit} locations per comparison{hint}")
+    
+    weather_service = WeatherService(db)
+    entries = await weather_service.compare_locations(targets, elevation, sort, descending)
+    
+    if stream:
+        return StreamingResponse(
+            _ndjson_entries(entries),
+            media_type="application/x-ndjson",
+            headers={"X-Unknown-Locations": ",".join(unknown)} if unknown else None
+        )
+    
+    return {"timestamp": datetime.utcnow(), "comparison": entries, "unknown": unknown}
 
 
 @router.get("/current", response_model=WeatherResponse)
 async def get_current_weather(
+    request: Request,
+    response: Response,
     lat: float = Query(..., ge=-90, le=90),
     lng: float = Query(..., ge=-180, le=180),
     elevation: Optional[float] = Query(None, ge=0, le=1000),
@@ -34,8 +115,15 @@ async def get_current_weather(
     - **elevation**: Elevation in meters (optional, for floor-level predictions)
     """
     
-    # Check cache first
-    cache_key = f"weather:current:{lat}:{lng}:{elevation or 0}"
+    # Revalidate against the data epoch before doing any work
+    epoch = data_epochs.epoch_near(lat, lng, settings.CURRENT_RADIUS_METERS)
+    etag = _request_etag(request, epoch)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
+    
+    # Check cache first; keyed on the epoch so new readings miss it
+    cache_key = f"weather:current:{lat}:{lng}:{elevation or 0}:{epoch}"
     cached = await RedisCache.get(cache_key)
     if cached:
         return cached
@@ -58,7 +146,7 @@ async def get_current_weather(
 @router.post("/grid", response_model=WeatherGridResponse)
 async def get_weather_grid(
     request: WeatherGridRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get weather grid for a bounding box
@@ -75,8 +163,47 @@ async def get_weather_grid(
     return grid
 
 
+@router.get("/grid", response_model=WeatherGridResponse)
+async def get_weather_grid_cached(
+    request: Request,
+    response: Response,
+    min_lat: float = Query(..., ge=-90, le=90),
+    max_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lng: float = Query(..., ge=-180, le=180),
+    resolution: int = Query(100, ge=50, le=500),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get weather grid for a bounding box (cacheable)
+    
+    Same as `POST /grid` but supports conditional requests, so browsers,
+    the service worker and CDNs can revalidate unchanged grids cheaply.
+    """
+    
+    # Cells come from the Hong Kong-wide raster pyramid, so revalidate on its epoch
+    etag = _request_etag(request, data_epochs.epoch(*HK_BOUNDS))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
+    # Rebuilds are throttled, so tag the grid with the epoch it was built from
+    pyramid = await raster_store.get(db)
+    if pyramid is not None:
+        etag = _request_etag(request, pyramid.epoch)
+    response.headers.update(cache_headers(etag))
+    
+    weather_service = WeatherService(db)
+    return await weather_service.generate_weather_grid(
+        GridBounds(min_lat=min_lat, max_lat=max_lat, min_lng=min_lng, max_lng=max_lng),
+        resolution,
+        pyramid=pyramid
+    )
+
+
 @router.get("/vertical", response_model=VerticalProfileResponse)
 async def get_vertical_profile(
+    request: Request,
+    response: Response,
     lat: float = Query(..., ge=-90, le=90),
     lng: float = Query(..., ge=-180, le=180),
     max_floor: int = Query(100, ge=1, le=200),
@@ -88,6 +215,11 @@ async def get_vertical_profile(
     Returns weather conditions at different elevation levels
     """
     
+    etag = _request_etag(request, data_epochs.epoch_near(lat, lng, settings.CURRENT_RADIUS_METERS))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
+    
     weather_service = WeatherService(db)
     profile = await weather_service.get_vertical_profile(lat, lng, max_floor)
     
@@ -96,10 +228,12 @@ async def get_vertical_profile(
 
 @router.get("/history")
 async def get_weather_history(
+    request: Request,
+    response: Response,
     lat: float = Query(..., ge=-90, le=90),
     lng: float = Query(..., ge=-180, le=180),
     hours: int = Query(24, ge=1, le=168),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get historical weather data for a location
@@ -107,30 +241,133 @@ async def get_weather_history(
     - **hours**: Number of hours to look back (max 168 = 7 days)
     """
     
-    # Query historical data
-    since = datetime.utcnow() - timedelta(hours=hours)
-    point = ST_SetSRID(ST_MakePoint(lng, lat, 0), 4326)
+    etag = _request_etag(request, data_epochs.epoch_near(lat, lng, settings.HISTORY_RADIUS_METERS))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
     
-    stmt = select(WeatherReading).where(
-        and_(
-            WeatherReading.timestamp >= since,
-            ST_Distance(WeatherReading.location, point) < 1000  # Within 1km
+    weather_service = WeatherService(db)
+    history = await weather_service.get_weather_history(lat, lng, hours)
+    
+    return history
+
+
+@router.get("/comparison", response_model=ComparisonResponse)
+async def compare_weather(
+    request: Request,
+    response: Response,
+    locations: str = Query("districts", description="Comma-separated location or group ids"),
+    points: Optional[str] = Query(None, description="Extra 'lat,lng' points separated by ';'"),
+    elevation: float = Query(0, ge=0, le=1000),
+    sort: Optional[str] = Query(None, description="Order by this value instead of request order"),
+    descending: bool = Query(False),
+    stream: bool = Query(False, description="Stream NDJSON entries, for large lists"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Compare current weather and comfort indices across locations
+    
+    - **locations**: named location ids, or `districts` / `places` for
+      all 18 districts or the popular places (default: districts)
+    - **points**: additional coordinates, e.g. `22.28,114.16;22.32,114.17`
+    - **sort**: a weather variable or index; locations without data go last
+    - **stream**: one NDJSON entry per line, allows up to
+      COMPARISON_STREAM_MAX_LOCATIONS locations
+    
+    All locations are served from one readings query.
+    """
+    
+    location_ids = [loc.strip() for loc in locations.split(",") if loc.strip()]
+    parsed_points = _parse_points(points)
+    
+    if not stream:
+        targets, _ = resolve_locations(location_ids)
+        coords = [(loc.lat, loc.lng) for _, loc in targets] + parsed_points
+        if coords:
+            lats, lngs = zip(*coords)
+            dlat, dlng = degrees_for_meters(settings.CURRENT_RADIUS_METERS, max(abs(v) for v in lats))
+            epoch = data_epochs.epoch(min(lats) - dlat, min(lngs) - dlng, max(lats) + dlat, max(lngs) + dlng)
+            etag = _request_etag(request, epoch)
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+            response.headers.update(cache_headers(etag))
+    
+    return await _compare(db, location_ids, parsed_points, elevation, sort, descending, stream)
+
+
+@router.post("/comparison", response_model=ComparisonResponse)
+async def compare_weather_post(
+    request: ComparisonRequest,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Compare current weather across locations (request body)
+    
+    Same as `GET /comparison`, for lists too long for a query string.
+    """
+    
+    return await _compare(
+        db,
+        request.locations,
+        request.points,
+        request.elevation,
+        request.sort,
+        request.descending,
+        request.stream
+    )
+
+
+@router.get("/export")
+async def export_weather_readings(
+    start: datetime = Query(..., description="Inclusive start time"),
+    end: Optional[datetime] = Query(None, description="Exclusive end time, default now"),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lng: Optional[float] = Query(None, ge=-180, le=180),
+    max_lng: Optional[float] = Query(None, ge=-180, le=180),
+    columns: Optional[str] = Query(None, description="Comma-separated column names"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$")
+):
+    """
+    Stream raw readings for long time ranges
+    
+    - **start/end**: time range, at most EXPORT_MAX_DAYS long
+    - **min_lat/max_lat/min_lng/max_lng**: optional bounding box (all four)
+    - **columns**: subset of the exportable columns, default all
+    - **format**: ndjson, csv, or parquet when pyarrow is installed
+    """
+    
+    start = naive_utc(start)
+    end = naive_utc(end) if end else datetime.utcnow()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > timedelta(days=settings.EXPORT_MAX_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range exceeds {settings.EXPORT_MAX_DAYS} days"
         )
-    ).order_by(WeatherReading.timestamp.desc()).limit(1000)
-    
-    result = await db.execute(stmt)
-    readings = result.scalars().all()
-    
-    return [
-        {
-            "timestamp": r.timestamp.isoformat(),
-            "temperature": r.temperature,
-            "humidity": r.humidity,
-            "rainfall": r.rainfall,
-            "wind_speed": r.wind_speed
-        }
-        for r in readings
-    ]
+    
+    box = (min_lat, min_lng, max_lat, max_lng)
+    if all(v is None for v in box):
+        bbox = None
+    elif any(v is None for v in box):
+        raise HTTPException(status_code=400, detail="Bounding box needs all of min/max lat/lng")
+    else:
+        bbox = box
+    
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else list(EXPORT_COLUMNS)
+    unknown = sorted(set(selected) - set(EXPORT_COLUMNS))
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    
+    if format == "parquet" and not PYARROW_AVAILABLE:
+        raise HTTPException(status_code=415, detail="Parquet export requires pyarrow")
+    
+    return StreamingResponse(
+        stream_export(selected, start, end, bbox, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="weather-readings.{format}"'}
+    )
 
 
 @router.get("/laundry-index")
@@ -0,0 +1,169 @@
+"""
+Projected coordinates for distance math
+
+All interpolation, radius and grid distances are computed in UTM zone 50N
+(EPSG:32650) metres rather than raw lng/lat degrees. The transverse
+Mercator projection uses the Krüger series, accurate to well under a
+millimetre across Hong Kong, so no projection library is required.
+"""
+
+from collections import OrderedDict
+from typing import Tuple
+import hashlib
+
+import numpy as np
+
+# Projected CRS used for all metric distances, as an SRID for PostGIS
+PROJECTED_SRID = 32650
+
+# Hong Kong SAR bounding box (min_lat, min_lng, max_lat, max_lng)
+HK_BOUNDS = (22.15, 113.82, 22.58, 114.45)
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+# UTM zone 50N
+CENTRAL_MERIDIAN = 117.0
+SCALE_FACTOR = 0.9996
+FALSE_EASTING = 500000.0
+
+_N = WGS84_F / (2 - WGS84_F)
+_RECTIFYING_RADIUS = WGS84_A / (1 + _N) * (1 + _N ** 2 / 4 + _N ** 4 / 64)
+_E = 2 * np.sqrt(_N) / (1 + _N)
+_E2 = WGS84_F * (2 - WGS84_F)
+
+_ALPHA = np.array([
+    _N / 2 - 2 * _N ** 2 / 3 + 5 * _N ** 3 / 16,
+    13 * _N ** 2 / 48 - 3 * _N ** 3 / 5,
+    61 * _N ** 3 / 240,
+])
+_BETA = np.array([
+    _N / 2 - 2 * _N ** 2 / 3 + 37 * _N ** 3 / 96,
+    _N ** 2 / 48 + _N ** 3 / 15,
+    17 * _N ** 3 / 480,
+])
+_DELTA = np.array([
+    2 * _N - 2 * _N ** 2 / 3 - 2 * _N ** 3,
+    7 * _N ** 2 / 3 - 8 * _N ** 3 / 5,
+    56 * _N ** 3 / 15,
+])
+_ORDERS = np.arange(1, 4)[:, None] * 2
+
+
+def project(lngs, lats) -> np.ndarray:
+    """Project lng/lat degrees to (n, 2) UTM 50N easting/northing metres"""
+    lngs = np.asarray(lngs, dtype=np.float64).ravel()
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+
+    phi = np.radians(lats)
+    lam = np.radians(lngs - CENTRAL_MERIDIAN)
+    sin_phi = np.sin(phi)
+
+    t = np.sinh(np.arctanh(sin_phi) - _E * np.arctanh(_E * sin_phi))
+    xi = np.arctan2(t, np.cos(lam))
+    eta = np.arctanh(np.sin(lam) / np.sqrt(1 + t * t))
+
+    xi_series = xi + _ALPHA @ (np.sin(_ORDERS * xi) * np.cosh(_ORDERS * eta))
+    eta_series = eta + _ALPHA @ (np.cos(_ORDERS * xi) * np.sinh(_ORDERS * eta))
+
+    scale = SCALE_FACTOR * _RECTIFYING_RADIUS
+    return np.column_stack([FALSE_EASTING + scale * eta_series, scale * xi_series])
+
+
+def unproject(xy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of `project`: (n, 2) UTM 50N metres to (lngs, lats) degrees"""
+    xy = np.atleast_2d(np.asarray(xy, dtype=np.float64))
+    scale = SCALE_FACTOR * _RECTIFYING_RADIUS
+    xi = xy[:, 1] / scale
+    eta = (xy[:, 0] - FALSE_EASTING) / scale
+
+    xi_p = xi - _BETA @ (np.sin(_ORDERS * xi) * np.cosh(_ORDERS * eta))
+    eta_p = eta - _BETA @ (np.cos(_ORDERS * xi) * np.sinh(_ORDERS * eta))
+
+    chi = np.arcsin(np.sin(xi_p) / np.cosh(eta_p))
+    phi = chi + _DELTA @ np.sin(_ORDERS * chi)
+    lam = np.arctan2(np.sinh(eta_p), np.cos(xi_p))
+
+    return CENTRAL_MERIDIAN + np.degrees(lam), np.degrees(phi)
+
+
+def distance_meters(lng1, lat1, lng2, lat2) -> np.ndarray:
+    """Projected distance in metres between broadcastable lng/lat arrays"""
+    lng1, lat1, lng2, lat2 = np.broadcast_arrays(lng1, lat1, lng2, lat2)
+    delta = project(lng1, lat1) - project(lng2, lat2)
+    return np.hypot(delta[:, 0], delta[:, 1]).reshape(lng1.shape)
+
+
+def meters_per_degree(lat: float) -> Tuple[float, float]:
+    """Ellipsoidal metres per degree of (latitude, longitude) at lat"""
+    phi = np.radians(lat)
+    w = np.sqrt(1 - _E2 * np.sin(phi) ** 2)
+    meridional = WGS84_A * (1 - _E2) / w ** 3
+    prime_vertical = WGS84_A / w
+    return float(np.radians(meridional)), float(np.radians(prime_vertical * np.cos(phi)))
+
+
+def degrees_for_meters(meters: float, lat: float) -> Tuple[float, float]:
+    """(dlat, dlng) spanning `meters` at lat, e.g. for bounding-box prefilters"""
+    per_lat, per_lng = meters_per_degree(lat)
+    return meters / per_lat, meters / per_lng
+
+
+# Spatial partition grid of weather_readings.cell_id; must match
+# weather_cell_id() in database/init.sql
+CELL_SIZE_DEG = 0.02
+CELL_COLUMNS = 18000  # 360 / CELL_SIZE_DEG
+
+
+def cell_ids(lats, lngs) -> np.ndarray:
+    """Partition cell id of each lat/lng, as computed at insert time"""
+    rows = np.floor((np.asarray(lats, dtype=np.float64) + 90) / CELL_SIZE_DEG).astype(np.int64)
+    cols = np.floor((np.asarray(lngs, dtype=np.float64) + 180) / CELL_SIZE_DEG).astype(np.int64)
+    return rows * CELL_COLUMNS + cols
+
+
+def cells_in_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> np.ndarray:
+    """Ids of every partition cell intersecting a bounding box"""
+    corners = cell_ids([min_lat, max_lat], [min_lng, max_lng])
+    rows = np.arange(corners[0] // CELL_COLUMNS, corners[1] // CELL_COLUMNS + 1)
+    cols = np.arange(corners[0] % CELL_COLUMNS, corners[1] % CELL_COLUMNS + 1)
+    return (rows[:, None] * CELL_COLUMNS + cols).ravel()
+
+
+class ProjectionCache:
+    """
+    LRU of projected coordinate arrays keyed by their lng/lat contents
+
+    Station snapshots and raster lattices are re-projected on every
+    interpolation; while the set of stations is unchanged the projected
+    array is reused. Returned arrays are read-only.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def project(self, lngs, lats) -> np.ndarray:
+        lngs = np.ascontiguousarray(lngs, dtype=np.float64).ravel()
+        lats = np.ascontiguousarray(lats, dtype=np.float64).ravel()
+        key = hashlib.sha1(lngs.tobytes() + lats.tobytes()).digest()
+
+        xy = self._entries.get(key)
+        if xy is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return xy
+
+        self.misses += 1
+        xy = project(lngs, lats)
+        xy.flags.writeable = False
+        self._entries[key] = xy
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return xy
+
+
+projection_cache = ProjectionCache()
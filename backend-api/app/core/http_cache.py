@@ -0,0 +1,34 @@
+from fastapi import Request, Response
+from typing import Dict
+
+from app.core.config import settings
+
+
+def cache_headers(etag: str, max_age: int = settings.HTTP_CACHE_MAX_AGE) -> Dict[str, str]:
+    """ETag and Cache-Control headers for a cacheable response"""
+    return {
+        "ETag": etag,
+        "Cache-Control": (
+            f"public, max-age={max_age}, "
+            f"stale-while-revalidate={settings.HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+        ),
+    }
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already matches etag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    # Weak comparison, as required for If-None-Match
+    candidates = (tag.strip().removeprefix("W/") for tag in header.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str, max_age: int = settings.HTTP_CACHE_MAX_AGE) -> Response:
+    """Empty 304 response carrying the validators"""
+    return Response(status_code=304, headers=cache_headers(etag, max_age))
@@ -0,0 +1,81 @@
+"""
+Named Hong Kong locations
+
+The 18 District Council districts (approximate population-weighted
+centres) and a few popular places, keyed by URL-safe id. Coordinates
+are WGS84 degrees.
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+
+class NamedLocation(NamedTuple):
+    name: str
+    name_zh: str
+    lat: float
+    lng: float
+    kind: str  # 'district', 'place' or 'point'
+
+
+NAMED_LOCATIONS: Dict[str, NamedLocation] = {
+    # Hong Kong Island
+    "central-and-western": NamedLocation("Central and Western", "中西區", 22.2820, 114.1430, "district"),
+    "wan-chai": NamedLocation("Wan Chai", "灣仔區", 22.2760, 114.1830, "district"),
+    "eastern": NamedLocation("Eastern", "東區", 22.2730, 114.2240, "district"),
+    "southern": NamedLocation("Southern", "南區", 22.2470, 114.1600, "district"),
+    # Kowloon
+    "yau-tsim-mong": NamedLocation("Yau Tsim Mong", "油尖旺區", 22.3110, 114.1700, "district"),
+    "sham-shui-po": NamedLocation("Sham Shui Po", "深水埗區", 22.3300, 114.1590, "district"),
+    "kowloon-city": NamedLocation("Kowloon City", "九龍城區", 22.3280, 114.1910, "district"),
+    "wong-tai-sin": NamedLocation("Wong Tai Sin", "黃大仙區", 22.3420, 114.1950, "district"),
+    "kwun-tong": NamedLocation("Kwun Tong", "觀塘區", 22.3130, 114.2250, "district"),
+    # New Territories
+    "tsuen-wan": NamedLocation("Tsuen Wan", "荃灣區", 22.3710, 114.1140, "district"),
+    "tuen-mun-district": NamedLocation("Tuen Mun", "屯門區", 22.3910, 113.9770, "district"),
+    "yuen-long": NamedLocation("Yuen Long", "元朗區", 22.4450, 114.0220, "district"),
+    "north": NamedLocation("North", "北區", 22.4940, 114.1380, "district"),
+    "tai-po": NamedLocation("Tai Po", "大埔區", 22.4500, 114.1640, "district"),
+    "sai-kung-district": NamedLocation("Sai Kung", "西貢區", 22.3810, 114.2700, "district"),
+    "sha-tin": NamedLocation("Sha Tin", "沙田區", 22.3870, 114.1950, "district"),
+    "kwai-tsing": NamedLocation("Kwai Tsing", "葵青區", 22.3540, 114.1310, "district"),
+    "islands": NamedLocation("Islands", "離島區", 22.2610, 113.9460, "district"),
+    # Places (ids shared with the demo server)
+    "central": NamedLocation("Central, Hong Kong Island", "中環", 22.2819, 114.1581, "place"),
+    "mong-kok": NamedLocation("Mong Kok, Kowloon", "旺角", 22.3193, 114.1694, "place"),
+    "shatin": NamedLocation("Sha Tin, New Territories", "沙田", 22.3817, 114.1877, "place"),
+    "tuen-mun": NamedLocation("Tuen Mun, New Territories", "屯門", 22.3908, 113.9725, "place"),
+    "sai-kung": NamedLocation("Sai Kung, New Territories", "西貢", 22.3814, 114.2705, "place"),
+    "causeway": NamedLocation("Causeway Bay, Hong Kong Island", "銅鑼灣", 22.2800, 114.1840, "place"),
+    "tsim-sha-tsui": NamedLocation("Tsim Sha Tsui, Kowloon", "尖沙咀", 22.2976, 114.1722, "place"),
+    "victoria-peak": NamedLocation("Victoria Peak", "太平山頂", 22.2710, 114.1500, "place"),
+}
+
+# Group ids that expand to several locations
+LOCATION_GROUPS: Dict[str, List[str]] = {
+    "districts": [key for key, loc in NAMED_LOCATIONS.items() if loc.kind == "district"],
+    "places": [key for key, loc in NAMED_LOCATIONS.items() if loc.kind == "place"],
+}
+
+
+def resolve_locations(ids: Iterable[str]) -> Tuple[List[Tuple[str, NamedLocation]], List[str]]:
+    """
+    (id, location) pairs for location and group ids, in request order
+
+    Group ids expand in place and repeats are dropped. Also returns the
+    ids that matched nothing.
+    """
+
+    resolved: Dict[str, NamedLocation] = {}
+    unknown: List[str] = []
+    for key in ids:
+        for member in LOCATION_GROUPS.get(key, [key]):
+            if member in NAMED_LOCATIONS:
+                resolved.setdefault(member, NAMED_LOCATIONS[member])
+            elif member not in unknown:
+                unknown.append(member)
+    return list(resolved.items()), unknown
+
+
+def point_location(lat: float, lng: float) -> Tuple[str, NamedLocation]:
+    """(id, location) for an unnamed coordinate; the id is "lat,lng" """
+    return f"{lat:.5f},{lng:.5f}", NamedLocation("", "", lat, lng, "point")
@@ -0,0 +1,316 @@
+"""
+Request timing, stage histograms and on-demand profiling
+
+`span("db_query")` times a stage of the current request. Stage times
+are summed per request and, when the request finishes, observed into
+the `microclimate_stage_seconds{stage, route}` histogram and returned
+in a `Server-Timing` header. Spans outside a request (background
+rebuilds, startup) are observed immediately with route="background".
+
+`ProfilingMiddleware` also records request latency, and with
+PROFILING_ENABLED set, answers requests carrying the PROFILING_HEADER
+with a sampling profile of the request instead of its response.
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+try:
+    from pyinstrument import Profiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+# Stage seconds of the request being handled, summed per stage
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, in Prometheus' model"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(counts), total) for k, (counts, total) in sorted(self._series.items())]
+
+        for label_values, counts, total in series:
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "microclimate_request_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+    settings.METRICS_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "microclimate_stage_seconds",
+    "Time per request spent in each stage (db_query, interpolate, serialize, ...)",
+    ("stage", "route"),
+    settings.METRICS_BUCKETS,
+)
+
+
+def render_metrics() -> str:
+    """All histograms in the Prometheus text exposition format"""
+    return "\n".join(REQUEST_SECONDS.render() + STAGE_SECONDS.render()) + "\n"
+
+
+def record_stage(stage: str, seconds: float):
+    stages = _request_stages.get()
+    if stages is None:
+        STAGE_SECONDS.observe(seconds, stage, "background")
+    else:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as `stage` of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that records the `serialize` stage
+
+    The endpoint is wrapped to note when it returns; the rest of the
+    route handler after that point is response model validation and
+    rendering.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            stages = _request_stages.get()
+            if stages is not None and "_endpoint_done" in stages:
+                stages["serialize"] = stages.get("serialize", 0.0) + time.perf_counter() - stages.pop("_endpoint_done")
+            return response
+
+        return timed_handler
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    is_coroutine = asyncio.iscoroutinefunction(endpoint)
+
+    @wraps(endpoint)
+    async def timed(*args, **kwargs):
+        try:
+            if is_coroutine:
+                return await endpoint(*args, **kwargs)
+            return await run_in_threadpool(endpoint, *args, **kwargs)
+        finally:
+            stages = _request_stages.get()
+            if stages is not None:
+                stages["_endpoint_done"] = time.perf_counter()
+
+    return timed
+
+
+class StackSampler:
+    """
+    Minimal sampling profiler for one thread
+
+    A daemon thread snapshots the target thread's stack every
+    `interval` seconds; stacks are reported in collapsed (flame graph)
+    form with sample counts. All work on the event loop is sampled, so
+    concurrent requests show up too.
+    """
+
+    def __init__(self, interval: float = settings.PROFILING_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self, top: int = 60) -> str:
+        total = sum(self.samples.values())
+        lines = [f"# {total} samples at {self.interval * 1000:g} ms, collapsed stacks by count"]
+        lines += [f"{stack} {count}" for stack, count in self.samples.most_common(top)]
+        return "\n".join(lines) + "\n"
+
+
+class _Profile:
+    """pyinstrument when installed, otherwise StackSampler"""
+
+    def __init__(self):
+        if PYINSTRUMENT_AVAILABLE:
+            self._profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+        else:
+            self._profiler = StackSampler()
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self) -> str:
+        self._profiler.stop()
+        if PYINSTRUMENT_AVAILABLE:
+            return self._profiler.output_text(unicode=True)
+        return self._profiler.report()
+
+
+def _route_template(scope) -> str:
+    """
+    Full path template of the matched route, e.g. /api/tiles/{z}/{x}/{y}.png
+
+    The route's own template may or may not include the router prefix
+    (depending on the FastAPI version); the prefix is taken from the
+    leading segments of the request path.
+    """
+    template = getattr(scope.get("route"), "path_format", None)
+    if template is None:
+        return "unmatched"
+    depth = template.count("/")
+    return "/".join(scope["path"].split("/")[:-depth]) + template
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware recording request latency and stage breakdowns
+
+    Routes are labelled by their path template, so metrics have one
+    series per endpoint rather than per URL. Only one request is
+    profiled at a time; others carrying the header are served normally.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._profile_lock = asyncio.Lock()
+        self._header = settings.PROFILING_HEADER.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if (
+            settings.PROFILING_ENABLED
+            and any(name == self._header for name, _ in scope["headers"])
+            and not self._profile_lock.locked()
+        ):
+            async with self._profile_lock:
+                await self._profiled(scope, receive, send)
+            return
+
+        stages: Dict[str, float] = {}
+        token = _request_stages.set(stages)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = ", ".join(
+                    f"{stage};dur={seconds * 1000:.1f}"
+                    for stage, seconds in stages.items() if not stage.startswith("_")
+                )
+                if timing:
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _request_stages.reset(token)
+            template = _route_template(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], template, str(status))
+            for stage, seconds in stages.items():
+                if not stage.startswith("_"):
+                    STAGE_SECONDS.observe(seconds, stage, template)
+
+    async def _profiled(self, scope, receive, send):
+        """Run the request under the profiler and respond with the profile"""
+        status = 500
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        token = _request_stages.set({})
+        profile = _Profile()
+        profile.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            report = profile.stop()
+            _request_stages.reset(token)
+
+        body = f"# {scope['method']} {scope['path']} -> {status}\n{report}".encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,57 @@
+"""
+Import timing for the startup log
+
+main.py wraps its import groups in `import_timer(group)`; the lifespan
+logs `import_breakdown()` once the worker starts, with the third-party
+packages each group pulled in. Uses the standard library only, so it
+can be imported before anything else.
+"""
+
+from contextlib import contextmanager
+from typing import List, Tuple
+import sys
+import time
+
+# (group, seconds, top-level packages first imported by the group)
+_timings: List[Tuple[str, float, List[str]]] = []
+
+# Packages listed per group in the log line
+MAX_PACKAGES = 6
+
+
+def _loaded_packages() -> set:
+    """Top-level packages in sys.modules, without builtin pseudo-modules"""
+    return {
+        name.partition(".")[0] for name, module in list(sys.modules.items())
+        if getattr(module, "__spec__", None) is not None
+    }
+
+
+@contextmanager
+def import_timer(group: str):
+    """Time the imports in the enclosed block as `group`"""
+    before = _loaded_packages()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        packages = sorted(
+            name for name in _loaded_packages() - before
+            if not name.startswith("_") and name not in sys.stdlib_module_names and name != "app"
+        )
+        _timings.append((group, seconds, packages))
+
+
+def import_breakdown() -> str:
+    """e.g. '1650 ms: framework 520 ms (fastapi, pydantic), ...'"""
+    parts = []
+    for group, seconds, packages in _timings:
+        part = f"{group} {seconds * 1000:.0f} ms"
+        if packages:
+            shown = ", ".join(packages[:MAX_PACKAGES])
+            more = len(packages) - MAX_PACKAGES
+            part += f" ({shown}{f', +{more}' if more > 0 else ''})"
+        parts.append(part)
+    total = sum(seconds for _, seconds, _ in _timings)
+    return f"{total * 1000:.0f} ms: " + ", ".join(parts)
@@ -0,0 +1,66 @@
+"""
+Precompute per-cell urban morphology features from building_data
+
+Usage (from backend-api/):
+    python -m app.db.build_morphology [--resolution 100] [--output data/morphology.npz]
+
+Run after loading buildings (app.db.load_buildings); the API picks up
+the new file on its next lookup.
+"""
+
+from typing import List, Optional
+from pathlib import Path
+import argparse
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.geo import HK_BOUNDS
+from app.db.database import dispose_engines
+from app.services.buildings import building_cache
+from app.services.morphology import MORPHOLOGY_FEATURES, compute_morphology
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--resolution", type=int, default=settings.MORPHOLOGY_RESOLUTION, help="cell size in meters")
+    parser.add_argument("--output", type=Path, default=Path(settings.MORPHOLOGY_PATH))
+    args = parser.parse_args(argv)
+
+    try:
+        buildings = await building_cache.get()
+    finally:
+        await dispose_engines()
+    if buildings is None:
+        print("building_data is empty; load footprints first")
+        return 1
+
+    started = time.perf_counter()
+    grid = compute_morphology(buildings, HK_BOUNDS, args.resolution)
+    elapsed = time.perf_counter() - started
+
+    # Write next to the target and rename, so readers never see a partial file
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    partial = args.output.with_name(args.output.name + ".tmp.npz")
+    grid.save(str(partial))
+    partial.replace(args.output)
+
+    built_up = grid.features[MORPHOLOGY_FEATURES.index("plan_area_index")] > 0
+    print(
+        f"{len(buildings)} buildings -> {grid.shape[0]}x{grid.shape[1]} cells at {args.resolution} m "
+        f"({np.count_nonzero(built_up)} built up) in {elapsed:.2f}s"
+    )
+    for i, name in enumerate(MORPHOLOGY_FEATURES):
+        values = grid.features[i][built_up]
+        values = values[np.isfinite(values)]
+        if len(values):
+            print(f"    {name:<20} median {np.median(values):8.2f}  max {values.max():8.2f}")
+    print(f"Wrote {args.output} ({args.output.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
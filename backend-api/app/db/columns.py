@@ -0,0 +1,97 @@
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from geoalchemy2.functions import ST_X, ST_Y, ST_Z
+from typing import Dict, Optional
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.core.profiling import span
+from app.db.models import WeatherReading
+
+# Column name -> NumPy array, as returned by fetch_columns
+Columns = Dict[str, np.ndarray]
+
+# Point coordinates, computed in SQL from the location geometry
+COORDINATE_COLUMNS = {"lng": ST_X, "lat": ST_Y, "elevation": ST_Z}
+
+# Measurement columns of weather_readings
+MEASUREMENT_COLUMNS = (
+    "temperature",
+    "humidity",
+    "rainfall",
+    "wind_speed",
+    "wind_direction",
+    "pressure",
+    "uv_index",
+)
+
+
+def reading_columns(*names: str, coordinates: bool = True) -> Select:
+    """
+    Select weather_readings columns without loading ORM objects
+
+    Coordinates ("lng", "lat", "elevation") are extracted in SQL with
+    ST_X/ST_Y/ST_Z, so no WKB is parsed in Python; `coordinates`
+    prepends all three.
+    """
+
+    if coordinates:
+        names = (*COORDINATE_COLUMNS, *names)
+    return select(*(_column(name) for name in names))
+
+
+def latest_per_sensor(stmt: Select) -> Select:
+    """
+    Keep only the newest row per sensor of a reading_columns select
+
+    Repeated readings of one sensor would otherwise enter interpolation
+    as co-located stations. `stmt` (with its filters) becomes a
+    DISTINCT ON (sensor_id) subquery; the returned select has the same
+    labelled columns, to be ordered and limited through
+    `selected_columns`. Readings without a sensor_id are all kept.
+    """
+
+    sensor = func.coalesce(WeatherReading.sensor_id, cast(WeatherReading.id, String))
+    latest = stmt.distinct(sensor).order_by(sensor, WeatherReading.timestamp.desc()).subquery()
+    return select(*latest.c)
+
+
+def _column(name: str):
+    if name in COORDINATE_COLUMNS:
+        return COORDINATE_COLUMNS[name](WeatherReading.location).label(name)
+    return getattr(WeatherReading, name).label(name)
+
+
+def _column_array(values: tuple) -> np.ndarray:
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, datetime):
+        return np.array(values, dtype="datetime64[us]")
+    if sample is None or isinstance(sample, (int, float)):
+        # NULLs become NaN
+        return np.array(values, dtype=np.float64)
+    return np.array(values, dtype=object)
+
+
+async def fetch_columns(db: AsyncSession, stmt: Select) -> Columns:
+    """Execute stmt and transpose the row set into one array per column"""
+    with span("db_query"):
+        result = await db.execute(stmt)
+        keys = list(result.keys())
+        rows = result.all()
+    if not rows:
+        return {key: np.empty(0) for key in keys}
+    return {key: _column_array(values) for key, values in zip(keys, zip(*rows))}
+
+
+def optional_float(value: float) -> Optional[float]:
+    """Column value as a float, or None where it was NULL"""
+    return None if np.isnan(value) else float(value)
+
+
+def naive_utc(timestamp: datetime) -> datetime:
+    """Naive UTC, as stored in weather_readings"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
@@ -1,17 +1,109 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from contextlib import asynccontextmanager
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from typing import Any, Dict
+import uuid
 from app.core.config import settings
 
-# Create async engine
-engine = create_async_engine(
+
+class PoolMetrics:
+    """Checkout counters for one engine's connection pool"""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.checkouts = 0
+        self.peak_checked_out = 0
+        self.timeouts = 0
+
+    def attach(self, engine: AsyncEngine):
+        pool = engine.sync_engine.pool
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+
+        self.pool = pool
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "utilization": round(pool.checkedout() / self.capacity, 3),
+            "peak_checked_out": self.peak_checked_out,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+        }
+
+
+def _create_engine(
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    statement_timeout_ms: int,
+    read_only: bool = False
+) -> AsyncEngine:
+    server_settings = {"statement_timeout": str(statement_timeout_ms)}
+    if read_only:
+        server_settings["default_transaction_read_only"] = "on"
+
+    # SQLAlchemy and asyncpg each keep a per-connection prepared statement
+    # cache; both must be off behind a transaction-mode pgbouncer, where
+    # statements also need names unique across server connections
+    cache_size = settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+    connect_args: Dict[str, Any] = {
+        "server_settings": server_settings,
+        "prepared_statement_cache_size": cache_size,
+        "statement_cache_size": cache_size,
+    }
+    if cache_size == 0:
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=connect_args,
+    )
+
+
+# Create async engine (writes and latency-sensitive reads)
+engine = _create_engine(
     settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+    settings.DB_POOL_SIZE,
+    settings.DB_MAX_OVERFLOW,
+    settings.DB_STATEMENT_TIMEOUT_MS
 )
 
-# Create session maker
+# Read-only engine for heavy GET endpoints (history, grids, tiles). It uses
+# the replica when DATABASE_READ_URL is set and always has its own pool, so
+# long scans cannot starve point queries on the primary pool.
+read_engine = _create_engine(
+    settings.DATABASE_READ_URL or settings.DATABASE_URL,
+    settings.DB_READ_POOL_SIZE,
+    settings.DB_READ_MAX_OVERFLOW,
+    settings.DB_READ_STATEMENT_TIMEOUT_MS,
+    read_only=True
+)
+
+pool_metrics = {
+    "primary": PoolMetrics("primary", settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+    "read": PoolMetrics("read", settings.DB_READ_POOL_SIZE + settings.DB_READ_MAX_OVERFLOW),
+}
+pool_metrics["primary"].attach(engine)
+pool_metrics["read"].attach(read_engine)
+
+# Create session makers
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -20,19 +112,53 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+AsyncReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+)
+
 # Base class for models
 Base = declarative_base()
 
 
-# Dependency for getting DB session
-async def get_db():
-    """Database session dependency"""
-    async with AsyncSessionLocal() as session:
+@asynccontextmanager
+async def _session(session_factory, metrics: PoolMetrics):
+    async with session_factory() as session:
         try:
             yield session
             await session.commit()
+        except PoolTimeoutError:
+            metrics.timeouts += 1
+            await session.rollback()
+            raise
         except Exception:
             await session.rollback()
             raise
         finally:
             await session.close()
+
+
+# Dependency for getting DB session
+async def get_db():
+    """Database session dependency"""
+    async with _session(AsyncSessionLocal, pool_metrics["primary"]) as session:
+        yield session
+
+
+async def get_read_db():
+    """Read-only database session dependency for heavy GET endpoints"""
+    async with _session(AsyncReadSessionLocal, pool_metrics["read"]) as session:
+        yield session
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Utilization of the primary and read connection pools"""
+    return {name: metrics.stats() for name, metrics in pool_metrics.items()}
+
+
+async def dispose_engines():
+    await engine.dispose()
+    await read_engine.dispose()
@@ -0,0 +1,227 @@
+"""
+Bulk load building footprints into building_data
+
+Usage (from backend-api/):
+    python -m app.db.load_buildings buildings.geojson [--height-field height] [--dry-run]
+    python -m app.db.load_buildings buildings.shp --id-field BUILDINGID --floors-field NUMFLOOR
+
+Footprints are read from GeoJSON (or a shapefile, with geopandas),
+their area, orientation, facing and centroid are derived in one
+vectorized pass, and rows are COPYed into a staging table and upserted
+on building_id.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import sys
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from app.core.config import settings
+from app.services.buildings import footprint_attributes
+
+try:
+    import geopandas as gpd
+    GEOPANDAS_AVAILABLE = True
+except ImportError:
+    GEOPANDAS_AVAILABLE = False
+
+STAGING_COLUMNS = (
+    "building_id", "address", "lng", "lat", "height_meters", "floors",
+    "facing", "footprint", "footprint_area", "orientation_deg",
+)
+
+STAGING_SQL = """
+    CREATE TEMP TABLE building_staging (
+        building_id TEXT,
+        address TEXT,
+        lng DOUBLE PRECISION,
+        lat DOUBLE PRECISION,
+        height_meters DOUBLE PRECISION,
+        floors INTEGER,
+        facing TEXT,
+        footprint BYTEA,
+        footprint_area DOUBLE PRECISION,
+        orientation_deg DOUBLE PRECISION
+    ) ON COMMIT DROP
+"""
+
+UPSERT_SQL = """
+    INSERT INTO building_data (
+        building_id, address, location, height_meters, floors, facing,
+        footprint, footprint_area, orientation_deg
+    )
+    SELECT
+        building_id, address, ST_SetSRID(ST_MakePoint(lng, lat), 4326), height_meters,
+        floors, facing, ST_GeomFromWKB(footprint, 4326), footprint_area, orientation_deg
+    FROM building_staging
+    ON CONFLICT (building_id) DO UPDATE SET
+        address = EXCLUDED.address,
+        location = EXCLUDED.location,
+        height_meters = EXCLUDED.height_meters,
+        floors = EXCLUDED.floors,
+        facing = EXCLUDED.facing,
+        footprint = EXCLUDED.footprint,
+        footprint_area = EXCLUDED.footprint_area,
+        orientation_deg = EXCLUDED.orientation_deg,
+        updated_at = NOW()
+"""
+
+
+def read_features(path: Path) -> List[Tuple[Dict[str, Any], Any]]:
+    """(properties, shapely geometry) of every feature in a GeoJSON file or shapefile"""
+    if path.suffix.lower() in (".geojson", ".json"):
+        with open(path) as f:
+            collection = json.load(f)
+        return [
+            ({"id": feature.get("id"), **(feature.get("properties") or {})}, shape(feature["geometry"]))
+            for feature in collection["features"]
+            if feature.get("geometry")
+        ]
+
+    if not GEOPANDAS_AVAILABLE:
+        raise RuntimeError(f"Reading {path.suffix} files requires geopandas; export to GeoJSON instead")
+    frame = gpd.read_file(path).to_crs(epsg=4326)
+    properties = frame.drop(columns=frame.geometry.name).to_dict("records")
+    return [(props, geometry) for props, geometry in zip(properties, frame.geometry) if geometry is not None]
+
+
+def exterior_ring(geometry) -> Optional[np.ndarray]:
+    """2D lng/lat exterior ring of a polygon, or of the largest part of a multipolygon"""
+    if geometry.geom_type == "MultiPolygon":
+        geometry = max(geometry.geoms, key=lambda part: part.area)
+    if geometry.geom_type != "Polygon" or geometry.is_empty:
+        return None
+    return np.asarray(geometry.exterior.coords)[:, :2]
+
+
+def _number(value) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if np.isfinite(number) and number > 0 else None
+
+
+def building_records(
+    features: List[Tuple[Dict[str, Any], Any]],
+    id_field: str,
+    height_field: str,
+    floors_field: str,
+    address_field: str,
+    id_prefix: str
+) -> List[tuple]:
+    """
+    Staging rows for every usable footprint, in STAGING_COLUMNS order
+
+    Height falls back to floors * BUILDING_FLOOR_HEIGHT; features with
+    neither, or without a polygon, are skipped. Later duplicates of a
+    building_id replace earlier ones.
+    """
+
+    rows: Dict[str, tuple] = {}
+    rings = []
+    skipped = 0
+
+    for i, (props, geometry) in enumerate(features):
+        ring = exterior_ring(geometry)
+        floors = _number(props.get(floors_field))
+        height = _number(props.get(height_field))
+        if height is None and floors is not None:
+            height = floors * settings.BUILDING_FLOOR_HEIGHT
+        if ring is None or len(ring) < 4 or height is None:
+            skipped += 1
+            continue
+
+        building_id = props.get(id_field)
+        building_id = str(building_id) if building_id is not None else f"{id_prefix}-{i}"
+        address = props.get(address_field)
+        rows[building_id] = (
+            building_id,
+            str(address) if address is not None else None,
+            height,
+            int(floors) if floors is not None else None,
+            len(rings),
+        )
+        rings.append(ring)
+
+    if skipped:
+        print(f"Skipped {skipped} features without a polygon footprint or height")
+    if not rows:
+        return []
+
+    areas, orientation, facing, centroid_lng, centroid_lat = footprint_attributes(rings)
+    footprints = shapely.to_wkb(shapely.polygons([rings[i] for *_, i in rows.values()]))
+
+    return [
+        (
+            building_id, address,
+            float(centroid_lng[i]), float(centroid_lat[i]),
+            height, floors, str(facing[i]), footprint,
+            float(areas[i]), float(orientation[i]),
+        )
+        for (building_id, address, height, floors, i), footprint in zip(rows.values(), footprints)
+    ]
+
+
+async def load(records: List[tuple]) -> str:
+    """COPY records into a staging table and upsert them into building_data"""
+    # Imported here so --dry-run works without database drivers
+    from app.db.database import engine
+
+    try:
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            async with driver.transaction():
+                await driver.execute("SET LOCAL statement_timeout = 0")
+                await driver.execute(STAGING_SQL)
+                await driver.copy_records_to_table(
+                    "building_staging", records=records, columns=STAGING_COLUMNS
+                )
+                status = await driver.execute(UPSERT_SQL)
+            await driver.execute("ANALYZE building_data")
+    finally:
+        await engine.dispose()
+
+    return status
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", type=Path, help="GeoJSON file or shapefile of footprints (WGS84)")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--height-field", default="height", help="building height in meters")
+    parser.add_argument("--floors-field", default="floors", help="used when height is missing")
+    parser.add_argument("--address-field", default="address")
+    parser.add_argument("--dry-run", action="store_true", help="derive attributes without loading")
+    args = parser.parse_args(argv)
+
+    features = read_features(args.path)
+    records = building_records(
+        features, args.id_field, args.height_field, args.floors_field,
+        args.address_field, args.path.stem
+    )
+    print(f"Read {len(features)} features, {len(records)} buildings")
+    if not records:
+        return 1
+
+    if args.dry_run:
+        areas = np.array([record[8] for record in records])
+        facings, counts = np.unique([record[6] for record in records], return_counts=True)
+        print(f"Footprint area: median {np.median(areas):.0f} m2, total {areas.sum() / 1e6:.2f} km2")
+        print("Facing: " + ", ".join(f"{name} {count}" for name, count in zip(facings, counts)))
+        return 0
+
+    status = await load(records)
+    print(f"building_data: {status}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
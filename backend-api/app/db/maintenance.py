@@ -0,0 +1,233 @@
+"""
+TimescaleDB maintenance for the weather_readings tiers
+
+Usage (from backend-api/):
+    python -m app.db.maintenance verify [--fix]
+    python -m app.db.maintenance chunks [--verbose]
+    python -m app.db.maintenance backfill [--days 30] [--view weather_hourly] [--step-days 7]
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import sys
+
+from app.core.config import settings
+from app.db.database import engine
+from app.db.tiers import TIERS, StorageTier
+
+# Continuous aggregate tiers, finest first
+AGGREGATE_TIERS = tuple(tier for tier in TIERS if tier.bucket is not None)
+
+JOBS_SQL = text("""
+    SELECT
+        j.proc_name,
+        COALESCE(ca.view_name, j.hypertable_name) AS relation,
+        (j.config->>'drop_after')::interval AS drop_after,
+        (j.config->>'compress_after')::interval AS compress_after
+    FROM timescaledb_information.jobs j
+    LEFT JOIN timescaledb_information.continuous_aggregates ca
+        ON ca.materialization_hypertable_schema = j.hypertable_schema
+       AND ca.materialization_hypertable_name = j.hypertable_name
+    WHERE j.proc_name IN (
+        'policy_retention', 'policy_compression', 'policy_refresh_continuous_aggregate'
+    )
+""")
+
+HYPERTABLE_SQL = text("""
+    SELECT materialization_hypertable_schema, materialization_hypertable_name
+    FROM timescaledb_information.continuous_aggregates
+    WHERE view_name = :view
+""")
+
+REALTIME_SQL = text("""
+    SELECT view_name, materialized_only
+    FROM timescaledb_information.continuous_aggregates
+""")
+
+CHUNKS_SQL = text("""
+    SELECT c.chunk_name, c.range_start, c.range_end, c.is_compressed, s.total_bytes
+    FROM timescaledb_information.chunks c
+    JOIN chunks_detailed_size(CAST(:relation AS regclass)) s
+        ON s.chunk_schema = c.chunk_schema AND s.chunk_name = c.chunk_name
+    WHERE c.hypertable_schema = :schema AND c.hypertable_name = :name
+    ORDER BY c.range_start
+""")
+
+
+def expected_policies() -> List[Tuple[str, str, Optional[timedelta]]]:
+    """(policy, relation, interval) for every policy the tiers rely on"""
+    policies = [
+        ("policy_compression", "weather_readings", timedelta(days=settings.RAW_COMPRESS_AFTER_DAYS)),
+    ]
+    for tier in TIERS:
+        if tier.retention is not None:
+            policies.append(("policy_retention", tier.relation, tier.retention))
+    for tier in AGGREGATE_TIERS:
+        policies.append(("policy_refresh_continuous_aggregate", tier.relation, None))
+    return policies
+
+
+async def verify(conn: AsyncConnection, fix: bool = False) -> int:
+    """Print the status of each expected policy; return the number of problems"""
+    rows = (await conn.execute(JOBS_SQL)).all()
+    jobs: Dict[Tuple[str, str], Optional[timedelta]] = {
+        (proc, relation): drop_after or compress_after
+        for proc, relation, drop_after, compress_after in rows
+    }
+
+    problems = 0
+    for policy, relation, interval in expected_policies():
+        label = f"{policy:<38} {relation:<18}"
+        if (policy, relation) not in jobs:
+            if fix and interval is not None:
+                add = "add_retention_policy" if policy == "policy_retention" else "add_compression_policy"
+                await conn.execute(
+                    text(f"SELECT {add}(:relation, CAST(:interval AS interval), if_not_exists => TRUE)"),
+                    {"relation": relation, "interval": interval}
+                )
+                print(f"{label} ADDED ({interval.days} days)")
+            else:
+                problems += 1
+                print(f"{label} MISSING")
+            continue
+
+        actual = jobs[(policy, relation)]
+        if interval is not None and actual != interval:
+            problems += 1
+            print(f"{label} MISMATCH (expected {interval.days} days, found {actual})")
+        else:
+            print(f"{label} OK")
+
+    # Tier queries rely on real-time aggregation for the buckets newer
+    # than the last refresh
+    materialized_only = dict((await conn.execute(REALTIME_SQL)).all())
+    for tier in AGGREGATE_TIERS:
+        label = f"{'real-time aggregation':<38} {tier.relation:<18}"
+        if tier.relation not in materialized_only:
+            continue  # already reported through its refresh policy
+        if not materialized_only[tier.relation]:
+            print(f"{label} OK")
+        elif fix:
+            await conn.execute(text(
+                f"ALTER MATERIALIZED VIEW {tier.relation} SET (timescaledb.materialized_only = false)"
+            ))
+            print(f"{label} ENABLED")
+        else:
+            problems += 1
+            print(f"{label} DISABLED")
+
+    return problems
+
+
+async def _hypertable(conn: AsyncConnection, tier: StorageTier) -> Optional[Tuple[str, str]]:
+    if tier.bucket is None:
+        return "public", tier.relation
+    row = (await conn.execute(HYPERTABLE_SQL, {"view": tier.relation})).first()
+    return tuple(row) if row else None
+
+
+def _size(num_bytes: int) -> str:
+    for unit in ("B", "kB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+async def report_chunks(conn: AsyncConnection, verbose: bool = False):
+    """Print chunk counts, compression and sizes per tier"""
+    for tier in TIERS:
+        hypertable = await _hypertable(conn, tier)
+        if hypertable is None:
+            print(f"{tier.relation:<18} not found")
+            continue
+
+        schema, name = hypertable
+        chunks = (await conn.execute(
+            CHUNKS_SQL, {"relation": f"{schema}.{name}", "schema": schema, "name": name}
+        )).all()
+        compressed = sum(1 for chunk in chunks if chunk.is_compressed)
+        total = sum(chunk.total_bytes or 0 for chunk in chunks)
+        print(f"{tier.relation:<18} {len(chunks):>5} chunks {compressed:>5} compressed {_size(total):>10}")
+
+        if verbose:
+            for chunk in chunks:
+                state = "compressed" if chunk.is_compressed else ""
+                print(
+                    f"    {chunk.chunk_name:<32} {chunk.range_start:%Y-%m-%d %H:%M} "
+                    f"-> {chunk.range_end:%Y-%m-%d %H:%M} {_size(chunk.total_bytes or 0):>10} {state}"
+                )
+
+
+async def backfill(conn: AsyncConnection, days: int, views: List[str], step_days: int = 7):
+    """
+    Refresh continuous aggregates over the last `days`, oldest first
+
+    The window is refreshed in `step_days` slices so each refresh
+    materializes a bounded amount of data. Needs an autocommit
+    connection, as refresh_continuous_aggregate cannot run in a
+    transaction.
+    """
+
+    now = datetime.utcnow()
+    for tier in AGGREGATE_TIERS:
+        if tier.relation not in views:
+            continue
+
+        start = now - timedelta(days=days)
+        end = now - tier.bucket
+        while start < end:
+            stop = min(start + timedelta(days=step_days), end)
+            await conn.execute(
+                text("CALL refresh_continuous_aggregate(:view, :start, :stop)"),
+                {"view": tier.relation, "start": start, "stop": stop}
+            )
+            print(f"{tier.relation:<18} refreshed {start:%Y-%m-%d %H:%M} -> {stop:%Y-%m-%d %H:%M}")
+            start = stop
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify_parser = commands.add_parser("verify", help="check compression, retention and refresh policies")
+    verify_parser.add_argument("--fix", action="store_true", help="add missing compression/retention policies and enable real-time aggregation")
+
+    chunks_parser = commands.add_parser("chunks", help="report chunk counts and sizes")
+    chunks_parser.add_argument("--verbose", action="store_true", help="list every chunk")
+
+    backfill_parser = commands.add_parser("backfill", help="refresh continuous aggregates")
+    backfill_parser.add_argument("--days", type=int, default=settings.RAW_RETENTION_DAYS)
+    backfill_parser.add_argument(
+        "--view", action="append", choices=[tier.relation for tier in AGGREGATE_TIERS],
+        help="aggregate to refresh (repeatable, default all)"
+    )
+    backfill_parser.add_argument("--step-days", type=int, default=7)
+
+    args = parser.parse_args(argv)
+    problems = 0
+
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            # Maintenance work is not bound by the API's statement timeout
+            await conn.execute(text("SET statement_timeout = 0"))
+            if args.command == "verify":
+                problems = await verify(conn, args.fix)
+            elif args.command == "chunks":
+                await report_chunks(conn, args.verbose)
+            else:
+                views = args.view or [tier.relation for tier in AGGREGATE_TIERS]
+                await backfill(conn, args.days, views, args.step_days)
+    finally:
+        await engine.dispose()
+
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
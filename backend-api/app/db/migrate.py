@@ -0,0 +1,205 @@
+"""
+Create the API's tables and upgrade existing ones
+
+Runs once per deployment, before the API workers start; they no longer
+create the schema themselves. Missing tables are created, and tables
+created by earlier versions get the columns, triggers and backfills
+added since (every step is idempotent, so reruns are safe).
+TimescaleDB hypertables, aggregates and policies come from
+database/init.sql (see `python -m app.db.maintenance verify`).
+
+Usage (from backend-api/):
+    python -m app.db.migrate [--dry-run]
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from typing import List, Optional, Set
+import argparse
+import asyncio
+import sys
+
+from app.db.database import engine
+from app.db.models import Base  # via models, so every table is registered
+
+# weather_readings.cell_id and its insert trigger, as in database/init.sql
+CELL_ID_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION weather_cell_id(lat DOUBLE PRECISION, lng DOUBLE PRECISION)
+    RETURNS INTEGER
+    LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+        SELECT floor((lat + 90) / 0.02)::integer * 18000 + floor((lng + 180) / 0.02)::integer
+    $$
+    """,
+    "ALTER TABLE weather_readings ADD COLUMN IF NOT EXISTS cell_id INTEGER",
+    """
+    CREATE OR REPLACE FUNCTION set_weather_cell_id()
+    RETURNS TRIGGER
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.cell_id := weather_cell_id(ST_Y(NEW.location), ST_X(NEW.location));
+        RETURN NEW;
+    END;
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS weather_readings_cell_id ON weather_readings",
+    """
+    CREATE TRIGGER weather_readings_cell_id
+        BEFORE INSERT OR UPDATE OF location ON weather_readings
+        FOR EACH ROW EXECUTE FUNCTION set_weather_cell_id()
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_weather_cell_time ON weather_readings(cell_id, timestamp DESC)",
+]
+
+BACKFILL_CELL_ID_SQL = (
+    "UPDATE {relation} SET cell_id = weather_cell_id(ST_Y(location), ST_X(location)) "
+    "WHERE cell_id IS NULL"
+)
+
+TIMESCALE_SQL = text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")
+
+READING_CHUNKS_SQL = text("""
+    SELECT format('%I.%I', chunk_schema, chunk_name), is_compressed
+    FROM timescaledb_information.chunks
+    WHERE hypertable_name = 'weather_readings'
+    ORDER BY range_start
+""")
+
+CELL_DIMENSION_SQL = text("""
+    SELECT 1 FROM timescaledb_information.dimensions
+    WHERE hypertable_name = 'weather_readings' AND column_name = 'cell_id'
+""")
+
+# building_data attributes derived from the footprint (app/db/load_buildings.py)
+BUILDING_COLUMNS_SQL = [
+    "ALTER TABLE building_data ADD COLUMN IF NOT EXISTS footprint_area DOUBLE PRECISION",
+    "ALTER TABLE building_data ADD COLUMN IF NOT EXISTS orientation_deg DOUBLE PRECISION",
+]
+
+UNDERIVED_FOOTPRINTS_SQL = text("""
+    SELECT id, ST_AsBinary(footprint) FROM building_data
+    WHERE footprint IS NOT NULL AND (footprint_area IS NULL OR orientation_deg IS NULL)
+""")
+
+SET_FOOTPRINT_ATTRIBUTES_SQL = text(
+    "UPDATE building_data SET footprint_area = :area, orientation_deg = :orientation WHERE id = :id"
+)
+
+
+async def _columns(conn: AsyncConnection, table: str) -> Set[str]:
+    columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns(table))
+    return {column["name"] for column in columns}
+
+
+async def upgrade_weather_readings(dry_run: bool):
+    """
+    Add cell_id, its trigger and index, and fill it for existing rows
+
+    The backfill runs one chunk per transaction. Compressed chunks
+    cannot be updated in place and are listed for decompress_chunk()
+    and a rerun instead. The space partition itself cannot be added
+    here: add_dimension() only works on an empty hypertable.
+    """
+
+    async with engine.begin() as conn:
+        has_column = "cell_id" in await _columns(conn, "weather_readings")
+        timescale = (await conn.execute(TIMESCALE_SQL)).first() is not None
+        chunks = (await conn.execute(READING_CHUNKS_SQL)).all() if timescale else []
+        partitioned = timescale and (await conn.execute(CELL_DIMENSION_SQL)).first() is not None
+
+        if dry_run:
+            action = "ensure the trigger on" if has_column else "add"
+            print(f"Would {action} weather_readings.cell_id and backfill it")
+            return
+        for statement in CELL_ID_SQL:
+            await conn.execute(text(statement))
+
+    relations = [name for name, compressed in chunks if not compressed] if chunks else ["weather_readings"]
+    compressed = [name for name, is_compressed in chunks if is_compressed]
+    updated = 0
+    for relation in relations:
+        async with engine.begin() as conn:
+            result = await conn.execute(text(BACKFILL_CELL_ID_SQL.format(relation=relation)))
+            updated += result.rowcount
+    print(f"Backfilled cell_id on {updated} weather_readings rows")
+
+    if compressed:
+        print(
+            f"Skipped {len(compressed)} compressed chunks with possibly missing cell_id; "
+            f"decompress them (SELECT decompress_chunk('<chunk>')) and rerun: {', '.join(compressed)}"
+        )
+    if timescale and not partitioned:
+        print(
+            "weather_readings is not space partitioned on cell_id; add_dimension() needs "
+            "an empty hypertable, see database/README.md to rebuild it"
+        )
+
+
+async def upgrade_building_data(dry_run: bool):
+    """Add footprint_area and orientation_deg and derive them for existing footprints"""
+
+    async with engine.begin() as conn:
+        missing = [
+            name for name in ("footprint_area", "orientation_deg")
+            if name not in await _columns(conn, "building_data")
+        ]
+        if dry_run:
+            print(f"Would add building_data columns: {', '.join(missing) or 'none'} and derive them from footprints")
+            return
+        for statement in BUILDING_COLUMNS_SQL:
+            await conn.execute(text(statement))
+
+        rows = (await conn.execute(UNDERIVED_FOOTPRINTS_SQL)).all()
+        if not rows:
+            return
+
+        # Imported here so plain table creation needs no shapely
+        import shapely
+        from app.db.load_buildings import exterior_ring
+        from app.services.buildings import footprint_attributes
+
+        ids, rings = [], []
+        for building_id, footprint in rows:
+            ring = exterior_ring(shapely.from_wkb(bytes(footprint)))
+            if ring is not None and len(ring) >= 4:
+                ids.append(building_id)
+                rings.append(ring)
+        if not rings:
+            return
+
+        areas, orientation, *_ = footprint_attributes(rings)
+        await conn.execute(SET_FOOTPRINT_ATTRIBUTES_SQL, [
+            {"id": building_id, "area": float(area), "orientation": float(angle)}
+            for building_id, area, angle in zip(ids, areas, orientation)
+        ])
+    print(f"Derived footprint area and orientation for {len(ids)} buildings")
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dry-run", action="store_true", help="only list the tables and upgrades that would be applied")
+    args = parser.parse_args(argv)
+
+    try:
+        async with engine.begin() as conn:
+            existing = set(await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names()))
+            missing = [name for name in Base.metadata.tables if name not in existing]
+            if not args.dry_run:
+                await conn.run_sync(Base.metadata.create_all)
+
+        verb = "Would create" if args.dry_run else "Created"
+        print(f"{verb} {len(missing)} tables{': ' + ', '.join(missing) if missing else ''}")
+
+        # create_all does not add triggers, so new tables need the upgrade too
+        if "weather_readings" in existing or not args.dry_run:
+            await upgrade_weather_readings(args.dry_run)
+        if "building_data" in existing:
+            await upgrade_building_data(args.dry_run)
+    finally:
+        await engine.dispose()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -28,10 +28,12 @@ class WeatherReading(Base):
     source = Column(String, nullable=False)  # 'official', 'crowdsourced', 'interpolated', 'ml-predicted'
     confidence = Column(Float, default=1.0)
     sensor_id = Column(String, index=True)
+    cell_id = Column(Integer)  # space partition, set from location by an insert trigger
     
     __table_args__ = (
         Index('idx_weather_location', 'location', postgresql_using='gist'),
         Index('idx_weather_time_location', 'timestamp', 'location'),
+        Index('idx_weather_cell_time', 'cell_id', 'timestamp'),
     )
 
 
@@ -106,8 +108,10 @@ class BuildingData(Base):
     floors = Column(Integer)
     facing = Column(String)  # 'north', 'south', 'east', 'west', 'mixed'
     
-    # Footprint
+    # Footprint and attributes derived from it
     footprint = Column(Geometry('POLYGON', srid=4326))
+    footprint_area = Column(Float)  # square meters
+    orientation_deg = Column(Float)  # long axis bearing, 0-180
     
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,69 @@
+from geoalchemy2.functions import (
+    ST_Distance,
+    ST_DWithin,
+    ST_MakeEnvelope,
+    ST_MakePoint,
+    ST_SetSRID,
+    ST_Transform,
+)
+from sqlalchemy import and_, true
+
+from app.core.config import settings
+from app.core.geo import PROJECTED_SRID, cells_in_bbox, degrees_for_meters
+
+
+def _projected_point(lng: float, lat: float):
+    return ST_Transform(ST_SetSRID(ST_MakePoint(lng, lat), 4326), PROJECTED_SRID)
+
+
+def projected_distance(location, lng: float, lat: float):
+    """SQL expression for the distance in metres from location to a point"""
+    return ST_Distance(ST_Transform(location, PROJECTED_SRID), _projected_point(lng, lat))
+
+
+def within_bbox(location, min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+    """Index-assisted bounding-box filter on a 4326 location column"""
+    return location.intersects(ST_MakeEnvelope(min_lng, min_lat, max_lng, max_lat, 4326))
+
+
+def in_cells(cell_id, min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+    """
+    Partition pruning filter: cell_id among the cells covering a bbox
+
+    Lets TimescaleDB exclude space partitions and use the cell index.
+    Boxes covering more than CELL_PRUNE_MAX_CELLS cells are not pruned.
+    """
+
+    cells = cells_in_bbox(min_lat, min_lng, max_lat, max_lng)
+    if len(cells) > settings.CELL_PRUNE_MAX_CELLS:
+        return true()
+    return cell_id.in_(cells.tolist())
+
+
+def within_meters(
+    location,
+    lng: float,
+    lat: float,
+    radius_meters: float,
+    cell_id=None
+):
+    """
+    SQL filter for locations within radius_meters of a point
+
+    A bounding-box test in degrees lets the GiST index on the 4326
+    column prune candidates; only those are transformed and measured
+    in projected metres. Pass the table's `cell_id` column to also
+    prune space partitions.
+    """
+
+    dlat, dlng = degrees_for_meters(radius_meters, lat)
+    box = (lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+    return and_(
+        in_cells(cell_id, *box) if cell_id is not None else true(),
+        within_bbox(location, *box),
+        ST_DWithin(
+            ST_Transform(location, PROJECTED_SRID),
+            _projected_point(lng, lat),
+            radius_meters
+        )
+    )
@@ -0,0 +1,123 @@
+from sqlalchemy import Float, Integer, column, func, select, table
+from sqlalchemy.sql import Select
+from geoalchemy2 import Geometry
+from typing import Optional, Tuple
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.db.spatial import within_meters
+
+# Averaged variables carried by every aggregate tier
+AGGREGATE_VARIABLES = ("temperature", "humidity", "rainfall", "wind_speed")
+
+
+class StorageTier:
+    """
+    One resolution of weather_readings data
+
+    The raw hypertable has no bucket; the continuous aggregates hold
+    per-bucket averages per ~100 m grid location. `retention` is None
+    when the tier is kept indefinitely.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        relation: str,
+        time_column: str,
+        bucket: Optional[timedelta],
+        retention: Optional[timedelta]
+    ):
+        self.name = name
+        self.relation = relation
+        self.time_column = time_column
+        self.bucket = bucket
+        self.retention = retention
+
+    def covers(self, start: datetime, now: datetime) -> bool:
+        """Whether data from `start` is still retained in this tier"""
+        return self.retention is None or start >= now - self.retention
+
+    def history_query(
+        self,
+        lat: float,
+        lng: float,
+        radius_meters: float,
+        since: datetime,
+        limit: int
+    ) -> Select:
+        """
+        Per-bucket weighted averages near a point, newest first
+
+        Aggregate rows are averaged across grid locations weighted by
+        their reading counts, giving one row per bucket.
+        """
+
+        view = table(
+            self.relation,
+            column(self.time_column),
+            column("grid_location", Geometry(srid=4326)),
+            column("reading_count", Integer),
+            *(column(f"avg_{v}", Float) for v in AGGREGATE_VARIABLES),
+        )
+        time = view.c[self.time_column]
+        count = view.c.reading_count
+        averages = (
+            (func.sum(view.c[f"avg_{v}"] * count) / func.sum(count, type_=Float)).label(v)
+            for v in AGGREGATE_VARIABLES
+        )
+
+        return (
+            select(time.label("timestamp"), *averages)
+            .where(time >= since)
+            .where(within_meters(view.c.grid_location, lng, lat, radius_meters))
+            .group_by(time)
+            .order_by(time.desc())
+            .limit(limit)
+        )
+
+
+RAW_TIER = StorageTier(
+    "raw", "weather_readings", "timestamp", None,
+    timedelta(days=settings.RAW_RETENTION_DAYS)
+)
+
+# Finest first; must match the continuous aggregates in database/init.sql
+TIERS: Tuple[StorageTier, ...] = (
+    RAW_TIER,
+    StorageTier(
+        "5min", "weather_5min", "bucket", timedelta(minutes=5),
+        timedelta(days=settings.FIVE_MIN_RETENTION_DAYS)
+    ),
+    StorageTier(
+        "hourly", "weather_hourly", "hour", timedelta(hours=1),
+        timedelta(days=settings.HOURLY_RETENTION_DAYS)
+    ),
+    StorageTier("daily", "weather_daily", "day", timedelta(days=1), None),
+)
+
+
+def select_tier(
+    start: datetime,
+    end: Optional[datetime] = None,
+    now: Optional[datetime] = None
+) -> StorageTier:
+    """
+    Pick the finest tier that still retains `start` and returns at most
+    TIER_MAX_POINTS buckets for the range
+
+    Raw readings are only used for ranges up to TIER_RAW_MAX_HOURS.
+    """
+
+    now = now or datetime.utcnow()
+    span = (end or now) - start
+
+    for tier in TIERS:
+        if not tier.covers(start, now):
+            continue
+        if tier.bucket is None:
+            if span <= timedelta(hours=settings.TIER_RAW_MAX_HOURS):
+                return tier
+        elif span / tier.bucket <= settings.TIER_MAX_POINTS:
+            return tier
+    return TIERS[-1]
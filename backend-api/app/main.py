@@ -1,13 +1,28 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from contextlib import asynccontextmanager
-import logging
+from app.core.startup import import_breakdown, import_timer
 
-from app.api.v1 import weather, alerts, sensors, forecasts, ml
-from app.core.config import settings
-from app.db.database import engine, Base
-from app.services.cache import RedisCache
+with import_timer("framework"):
+    from fastapi import FastAPI, HTTPException, Depends, Response
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, PlainTextResponse
+    from contextlib import asynccontextmanager
+    import asyncio
+    import logging
+
+with import_timer("config"):
+    from app.core.config import settings
+    from app.core.profiling import ProfilingMiddleware, render_metrics
+
+with import_timer("database"):
+    from app.db.database import dispose_engines, pool_stats
+
+with import_timer("services"):
+    from app.services.cache import RedisCache
+    from app.services.live_updates import live_hub
+    from app.services.tiles import raster_tile_cache
+    from app.services.warmup import warm_up
+
+with import_timer("routers"):
+    from app.api.v1 import weather, alerts, sensors, forecasts, ml, live, tiles, locations
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,22 +34,34 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     logger.info("Starting MicroClimate HK API...")
+    logger.info(f"Imports took {import_breakdown()}")
     
-    # Initialize database
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # The schema is created by `python -m app.db.migrate`, not per worker
     
     # Initialize Redis cache
     await RedisCache.initialize()
     
+    # Drop tile spill files of workers that are no longer running
+    await asyncio.to_thread(raster_tile_cache.remove_stale_spills)
+    
+    # Load heavy modules, indexes and caches in the background; /ready
+    # reports 503 until they are warm
+    warmup_task = asyncio.create_task(warm_up.run())
+    
+    # Start live update fan-out
+    live_task = asyncio.create_task(live_hub.run())
+    
     logger.info("API started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down API...")
+    live_task.cancel()
+    warmup_task.cancel()
     await RedisCache.close()
-    await engine.dispose()
+    await asyncio.to_thread(raster_tile_cache.remove_spills)
+    await dispose_engines()
     logger.info("API shutdown complete")
 
 
@@ -54,6 +81,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency, stage timings and on-demand profiles
+app.add_middleware(ProfilingMiddleware)
+
 
 # Health check
 @app.get("/health")
@@ -66,12 +96,35 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness check: 503 until models and indexes are warm"""
+    if not warm_up.ready:
+        response.status_code = 503
+    return warm_up.report()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/db")
+async def database_health():
+    """Connection pool utilization"""
+    return pool_stats()
+
+
 # API Routes
 app.include_router(weather.router, prefix="/api/weather", tags=["Weather"])
 app.include_router(alerts.router, prefix="/api/alerts", tags=["Alerts"])
 app.include_router(sensors.router, prefix="/api/sensors", tags=["Sensors"])
 app.include_router(forecasts.router, prefix="/api/forecasts", tags=["Forecasts"])
 app.include_router(ml.router, prefix="/api/ml", tags=["Machine Learning"])
+app.include_router(live.router, prefix="/api/live", tags=["Live Updates"])
+app.include_router(tiles.router, prefix="/api/tiles", tags=["Map Tiles"])
+app.include_router(locations.router, prefix="/api/locations", tags=["Locations"])
 
 
 @app.exception_handler(Exception)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Literal
+from typing import Dict, Optional, List, Literal, Tuple
 from datetime import datetime
 
 
@@ -37,11 +37,29 @@ class WeatherGridRequest(BaseModel):
     resolution: int = Field(100, ge=50, le=500)  # Grid size in meters
 
 
+class MorphologyRequest(BaseModel):
+    lats: List[float]
+    lngs: List[float]
+
+
+class MorphologyResponse(BaseModel):
+    resolution: float
+    features: Dict[str, List[Optional[float]]]  # null outside the grid
+
+
+class DerivedIndices(BaseModel):
+    heat_index: float
+    wind_chill: float
+    comfort_index: float
+    comfort_level: str
+
+
 class GridCell(BaseModel):
     coordinates: Coordinates
     weather: WeatherResponse
     confidence: float = Field(..., ge=0, le=1)
     source: Literal["official", "crowdsourced", "interpolated", "ml-predicted"]
+    indices: Optional[DerivedIndices] = None
 
 
 class WeatherGridResponse(BaseModel):
@@ -50,6 +68,48 @@ class WeatherGridResponse(BaseModel):
     data: List[GridCell]
 
 
+class ComparisonRequest(BaseModel):
+    locations: List[str] = Field(default_factory=list)  # location or group ids
+    points: List[Tuple[float, float]] = Field(default_factory=list)  # [lat, lng]
+    elevation: float = Field(0, ge=0, le=1000)
+    sort: Optional[str] = None
+    descending: bool = False
+    stream: bool = False
+
+
+class ComparisonEntry(BaseModel):
+    id: str
+    name: Optional[str]
+    name_zh: Optional[str]
+    location: Coordinates
+    reading_count: int
+    weather: Optional[WeatherResponse]  # null when no readings are in range
+    indices: Optional[DerivedIndices]
+
+
+class ComparisonResponse(BaseModel):
+    timestamp: datetime
+    comparison: List[ComparisonEntry]
+    unknown: List[str]  # ids that matched no location
+
+
+class PlaceResult(BaseModel):
+    id: str
+    name: Optional[str]
+    name_zh: Optional[str]
+    kind: str  # 'district', 'place', 'gazetteer' or 'building'
+    latitude: float
+    longitude: float
+    score: Optional[float] = None  # search results
+    distance_meters: Optional[float] = None  # reverse geocoding results
+
+
+class PlaceSearchResponse(BaseModel):
+    query: str
+    results: List[PlaceResult]
+    total: int
+
+
 class WeatherLayer(BaseModel):
     elevation_range: tuple[float, float]
     temperature: float
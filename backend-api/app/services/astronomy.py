@@ -0,0 +1,267 @@
+"""
+Sunrise/sunset and moon phase lookups
+
+Sun and moon events only vary by date and (coarsely) by location, so
+they are computed once per (local date, grid cell) and served from
+memory. A year of sun events for the Hong Kong bounding box is built up
+front with the vectorized NOAA solar algorithm; with ephem installed,
+events are computed by ephem instead and memoized per (date, cell).
+"""
+
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Optional, Tuple
+import logging
+
+import numpy as np
+
+from app.core.geo import HK_BOUNDS
+from app.services.ttl_cache import TTLCache
+
+try:
+    import ephem
+    EPHEM_AVAILABLE = True
+except ImportError:
+    EPHEM_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Hong Kong Time has no daylight saving
+HK_TIMEZONE = timezone(timedelta(hours=8), "HKT")
+
+# Lookup cell size; sunrise shifts ~12 s across a cell at HK latitudes
+CELL_SIZE_DEG = 0.05
+
+# Days of sun events precomputed from the first lookup date
+TABLE_DAYS = 366
+
+# Apparent sunrise/sunset: refraction plus the solar radius
+SUNRISE_ZENITH_DEG = 90.833
+
+# Mean synodic month and a reference new moon (2000-01-06 18:14 UTC)
+SYNODIC_MONTH_DAYS = 29.530588853
+REFERENCE_NEW_MOON = datetime(2000, 1, 6, 18, 14, tzinfo=timezone.utc)
+
+# Moon phase names by lunation fraction; principal phases span about a day either side
+MOON_PHASE_EDGES = np.array([1, 7.38, 8.38, 13.77, 15.77, 21.15, 22.15, 28.53]) / SYNODIC_MONTH_DAYS
+MOON_PHASES = (
+    ("New Moon", "🌑"),
+    ("Waxing Crescent", "🌒"),
+    ("First Quarter", "🌓"),
+    ("Waxing Gibbous", "🌔"),
+    ("Full Moon", "🌕"),
+    ("Waning Gibbous", "🌖"),
+    ("Last Quarter", "🌗"),
+    ("Waning Crescent", "🌘"),
+    ("New Moon", "🌑"),
+)
+
+# Memo bounds: least recently used (date, cell) entries are evicted past
+# either limit, and entries expire after a day, once their date has passed
+MEMO_MAX_ENTRIES = 4096
+MEMO_MAX_BYTES = 4 * 1024 * 1024
+MEMO_TTL_SECONDS = 86400
+
+
+def noaa_sun_events(days: np.ndarray, lats, lngs, utc_offset_hours: float = 8) -> Tuple[np.ndarray, ...]:
+    """
+    Sunrise, solar noon and sunset in local minutes after midnight
+
+    NOAA's general solar position approximation (fractional-year series
+    for the equation of time and declination), accurate to about a
+    minute. `days` are datetime64[D] local dates; days, lats and lngs
+    broadcast against each other.
+    """
+
+    days = np.asarray(days, dtype="datetime64[D]")
+    years = days.astype("datetime64[Y]")
+    day_of_year = (days - years).astype(np.float64) + 1
+    year_length = ((years + 1).astype("datetime64[D]") - years.astype("datetime64[D]")).astype(np.float64)
+
+    # Fractional year at local noon (UTC hour 12 - offset), in radians
+    gamma = 2 * np.pi / year_length * (day_of_year - 1 - utc_offset_hours / 24)
+    eq_time = 229.18 * (
+        0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma)
+    )
+    declination = (
+        0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma)
+    )
+
+    phi = np.radians(lats)
+    cos_hour_angle = (
+        np.cos(np.radians(SUNRISE_ZENITH_DEG)) / (np.cos(phi) * np.cos(declination))
+        - np.tan(phi) * np.tan(declination)
+    )
+    # Polar day/night clip to a 24 h / 0 h day
+    hour_angle = np.degrees(np.arccos(np.clip(cos_hour_angle, -1, 1)))
+
+    noon = 720 - 4 * np.asarray(lngs) - eq_time + 60 * utc_offset_hours
+    return noon - 4 * hour_angle, noon, noon + 4 * hour_angle
+
+
+def lunation_fraction(moments: np.ndarray) -> np.ndarray:
+    """Fraction of the mean synodic month elapsed since the last new moon"""
+    reference = np.datetime64(REFERENCE_NEW_MOON.replace(tzinfo=None), "s")
+    elapsed = (np.asarray(moments, dtype="datetime64[s]") - reference).astype(np.float64)
+    return (elapsed / 86400 / SYNODIC_MONTH_DAYS) % 1
+
+
+def moon_phase_name(fraction: float) -> Tuple[str, str]:
+    """(name, emoji) for a lunation fraction in [0, 1)"""
+    return MOON_PHASES[int(np.searchsorted(MOON_PHASE_EDGES, fraction, side="right"))]
+
+
+def _clock(minutes: float) -> str:
+    minutes = int(round(minutes)) % 1440
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _duration(minutes: float) -> str:
+    return str(timedelta(seconds=int(round(minutes * 60))))
+
+
+class AstronomyService:
+    """
+    Constant-time sun and moon lookups for Hong Kong
+
+    Locations are snapped to CELL_SIZE_DEG cells and dates to HKT
+    calendar days. Cells inside HK_BOUNDS are served from a precomputed
+    year table; others, and all ephem results, are memoized per
+    (date, cell) in bounded LRU caches.
+    """
+
+    def __init__(self, bounds: Tuple[float, float, float, float] = HK_BOUNDS):
+        self.bounds = bounds
+        min_lat, min_lng, max_lat, max_lng = bounds
+        self._row0, self._col0 = self._cell(min_lat, min_lng)
+        row1, col1 = self._cell(max_lat, max_lng)
+        self._rows = row1 - self._row0 + 1
+        self._cols = col1 - self._col0 + 1
+
+        self._table_start: date = date.min
+        self._table: np.ndarray = np.empty((0, 3, self._rows, self._cols))
+        self._sun_memo = TTLCache(MEMO_TTL_SECONDS, MEMO_MAX_BYTES, MEMO_MAX_ENTRIES)
+        self._moon_memo = TTLCache(MEMO_TTL_SECONDS, MEMO_MAX_BYTES, MEMO_MAX_ENTRIES)
+
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return int(np.floor(lat / CELL_SIZE_DEG)), int(np.floor(lng / CELL_SIZE_DEG))
+
+    @staticmethod
+    def _cell_centre(row: int, col: int) -> Tuple[float, float]:
+        return (row + 0.5) * CELL_SIZE_DEG, (col + 0.5) * CELL_SIZE_DEG
+
+    @staticmethod
+    def today() -> date:
+        return datetime.now(HK_TIMEZONE).date()
+
+    def _build_table(self, start: date):
+        """Vectorized NOAA sun events for TABLE_DAYS from start over every cell in bounds"""
+        days = np.datetime64(start, "D") + np.arange(TABLE_DAYS)
+        lats = (self._row0 + np.arange(self._rows) + 0.5) * CELL_SIZE_DEG
+        lngs = (self._col0 + np.arange(self._cols) + 0.5) * CELL_SIZE_DEG
+        events = noaa_sun_events(days[:, None, None], lats[None, :, None], lngs[None, None, :])
+        self._table = np.stack(np.broadcast_arrays(*events), axis=1)
+        self._table_start = start
+        logger.info(f"Built sun table for {TABLE_DAYS} days x {self._rows}x{self._cols} cells")
+
+    def _ephem_sun(self, day: date, lat: float, lng: float) -> Tuple[float, float]:
+        """Sunrise and sunset in local minutes after midnight, computed by ephem"""
+        midnight = datetime.combine(day, dt_time(), HK_TIMEZONE).astimezone(timezone.utc)
+        observer = ephem.Observer()
+        observer.lat = str(lat)
+        observer.lon = str(lng)
+        observer.elevation = 50
+        observer.pressure = 0
+        observer.horizon = "-0:34"
+        observer.date = ephem.Date(midnight.replace(tzinfo=None))
+
+        sun = ephem.Sun()
+        rising = observer.next_rising(sun).datetime().replace(tzinfo=timezone.utc)
+        setting = observer.next_setting(sun).datetime().replace(tzinfo=timezone.utc)
+        return (
+            (rising - midnight).total_seconds() / 60,
+            (setting - midnight).total_seconds() / 60,
+        )
+
+    def sun_minutes(self, lat: float, lng: float, day: Optional[date] = None) -> Tuple[float, float, str]:
+        """(sunrise, sunset, method), times in local minutes after midnight"""
+        day = day or self.today()
+        row, col = self._cell(lat, lng)
+        key = (day, row, col)
+
+        cached = self._sun_memo.get(key)
+        if cached is not None:
+            return cached
+
+        if EPHEM_AVAILABLE:
+            try:
+                sunrise, sunset = self._ephem_sun(day, *self._cell_centre(row, col))
+                cached = (sunrise, sunset, "ephem")
+                self._sun_memo.set(key, cached)
+                return cached
+            except (ephem.CircumpolarError, ValueError) as e:
+                logger.warning(f"ephem sun events failed, using NOAA: {e}")
+
+        index = (day - self._table_start).days
+        r, c = row - self._row0, col - self._col0
+        if 0 <= r < self._rows and 0 <= c < self._cols:
+            if not 0 <= index < TABLE_DAYS:
+                self._build_table(day)
+                index = 0
+            sunrise, _, sunset = self._table[index, :, r, c]
+            return float(sunrise), float(sunset), "noaa"
+
+        sunrise, _, sunset = noaa_sun_events(np.datetime64(day, "D"), *self._cell_centre(row, col))
+        cached = (float(sunrise), float(sunset), "noaa")
+        self._sun_memo.set(key, cached)
+        return cached
+
+    def sunrise_sunset(self, lat: float, lng: float, day: Optional[date] = None) -> dict:
+        """Sunrise and sunset (HKT) and day length for a location"""
+        sunrise, sunset, method = self.sun_minutes(lat, lng, day)
+        return {
+            "sunrise_time": _clock(sunrise),
+            "sunset_time": _clock(sunset),
+            "day_length": _duration(sunset - sunrise),
+            "method": method,
+        }
+
+    def _moon(self, day: date) -> Tuple[float, float, str]:
+        """(lunation fraction, illumination %, method) at local noon"""
+        noon = datetime.combine(day, dt_time(12), HK_TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+
+        if EPHEM_AVAILABLE:
+            try:
+                previous_new = ephem.previous_new_moon(noon).datetime()
+                next_new = ephem.next_new_moon(noon).datetime()
+                fraction = (noon - previous_new) / (next_new - previous_new)
+                return fraction, float(ephem.Moon(noon).phase), "ephem"
+            except ValueError as e:
+                logger.warning(f"ephem moon phase failed, using mean lunation: {e}")
+
+        fraction = float(lunation_fraction(np.datetime64(noon, "s")))
+        return fraction, float(50 * (1 - np.cos(2 * np.pi * fraction))), "mean-lunation"
+
+    def moon_phase(self, day: Optional[date] = None) -> dict:
+        """Moon phase name and illumination for a local date"""
+        day = day or self.today()
+        cached = self._moon_memo.get(day)
+        if cached is None:
+            cached = self._moon(day)
+            self._moon_memo.set(day, cached)
+
+        fraction, illumination, method = cached
+        name, emoji = moon_phase_name(fraction)
+        return {
+            "phase": name,
+            "illumination": round(illumination, 1),
+            "emoji": emoji,
+            "percentage": round(illumination),
+            "method": method,
+        }
+
+
+astronomy = AstronomyService()
@@ -0,0 +1,183 @@
+from sqlalchemy import select
+from geoalchemy2.functions import ST_AsBinary, ST_X, ST_Y
+from typing import List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import time
+
+import numpy as np
+import shapely
+
+from app.core.config import settings
+from app.core.geo import project, unproject
+from app.core.profiling import span
+from app.db.models import BuildingData
+
+logger = logging.getLogger(__name__)
+
+# Footprints less elongated than this have no dominant facade
+MIN_ELONGATION = 1.25
+
+
+def _compass(bearings: np.ndarray) -> np.ndarray:
+    names = np.array(["north", "east", "south", "west"])
+    return names[((bearings + 45) % 360 // 90).astype(int)]
+
+
+def footprint_attributes(
+    rings: Sequence[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Derived attributes of many footprints at once
+
+    `rings` are exterior rings as (n, 2) lng/lat arrays. Returns
+    (area_m2, orientation_deg, facing, centroid_lng, centroid_lat):
+    orientation is the bearing of the long axis of the minimum rotated
+    rectangle in [0, 180), and facing is the compass direction of the
+    long facade normal closest to south, or 'mixed' for compact shapes.
+    """
+
+    lengths = np.array([len(ring) for ring in rings])
+    lnglat = np.concatenate(rings)
+    ring_index = np.repeat(np.arange(len(rings)), lengths)
+
+    # Footprints in projected metres
+    xy = project(lnglat[:, 0], lnglat[:, 1])
+    polygons = shapely.polygons(shapely.linearrings(xy, indices=ring_index))
+    areas = shapely.area(polygons)
+    centroid_lng, centroid_lat = unproject(shapely.get_coordinates(shapely.centroid(polygons)))
+
+    # Long and short edges of each minimum rotated rectangle (closed
+    # 5-point rings); degenerate footprints collapse to lines or points
+    envelopes = shapely.oriented_envelope(polygons)
+    rectangular = shapely.get_num_coordinates(envelopes) == 5
+    corners = np.zeros((len(rings), 5, 2))
+    corners[rectangular] = shapely.get_coordinates(envelopes[rectangular]).reshape(-1, 5, 2)
+
+    edge_a = corners[:, 1] - corners[:, 0]
+    edge_b = corners[:, 2] - corners[:, 1]
+    len_a = np.hypot(edge_a[:, 0], edge_a[:, 1])
+    len_b = np.hypot(edge_b[:, 0], edge_b[:, 1])
+    long_edge = np.where((len_a >= len_b)[:, None], edge_a, edge_b)
+    orientation = np.degrees(np.arctan2(long_edge[:, 0], long_edge[:, 1])) % 180
+
+    # Of the two facade normals, take the one nearer south (sun side)
+    normal = (orientation + 90) % 360
+    normal = np.where(np.abs(normal - 180) <= 90, normal, (normal + 180) % 360)
+    elongation = np.maximum(len_a, len_b) / np.maximum(np.minimum(len_a, len_b), 1e-9)
+    compact = ~rectangular | (elongation < MIN_ELONGATION)
+    facing = np.where(compact, "mixed", _compass(normal))
+
+    return areas, orientation, facing, centroid_lng, centroid_lat
+
+
+class BuildingIndex:
+    """
+    Read-only building snapshot: packed attribute arrays plus an STR-tree
+
+    Footprints (or location points where a building has none) are held
+    in projected metres, so radius queries are plain metric distances.
+    """
+
+    def __init__(
+        self,
+        xy: np.ndarray,
+        heights: np.ndarray,
+        areas: np.ndarray,
+        orientations: np.ndarray,
+        geometries: np.ndarray
+    ):
+        self.xy = xy
+        self.heights = heights
+        self.areas = areas
+        self.orientations = orientations
+        self.geometries = geometries
+        self.tree = shapely.STRtree(geometries)
+
+    def __len__(self) -> int:
+        return len(self.heights)
+
+    def nearby(self, lat: float, lng: float, radius_meters: float) -> np.ndarray:
+        """Indices of buildings whose footprint lies within radius_meters"""
+        x, y = project(lng, lat)[0]
+        window = shapely.box(x - radius_meters, y - radius_meters, x + radius_meters, y + radius_meters)
+        candidates = self.tree.query(window)
+        if not len(candidates):
+            return candidates
+        distances = shapely.distance(self.geometries[candidates], shapely.points(x, y))
+        return candidates[distances <= radius_meters]
+
+
+class BuildingCache:
+    """
+    Lazily loaded, periodically refreshed BuildingIndex
+
+    Replaces per-request building_data queries; the snapshot is
+    rebuilt at most once per BUILDING_CACHE_TTL seconds.
+    """
+
+    def __init__(self):
+        self._index: Optional[BuildingIndex] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._index is not None and time.monotonic() - self._loaded_at < settings.BUILDING_CACHE_TTL
+
+    async def get(self) -> Optional[BuildingIndex]:
+        """Return the building index, loading it if missing or expired"""
+        if self._fresh():
+            return self._index
+
+        async with self._lock:
+            if self._fresh():
+                return self._index
+
+            # Imported here so the cache can be used by CLIs without the pools
+            from app.db.database import AsyncReadSessionLocal
+
+            stmt = select(
+                ST_X(BuildingData.location),
+                ST_Y(BuildingData.location),
+                BuildingData.height_meters,
+                BuildingData.orientation_deg,
+                ST_AsBinary(BuildingData.footprint),
+            )
+            with span("db_query"):
+                async with AsyncReadSessionLocal() as session:
+                    rows = (await session.execute(stmt)).all()
+
+            with span("index_build"):
+                self._index = await asyncio.to_thread(build_index, rows) if rows else None
+            self._loaded_at = time.monotonic()
+            logger.info(f"Loaded {len(rows)} buildings into the building cache")
+            return self._index
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+
+def build_index(rows: List[tuple]) -> BuildingIndex:
+    """Build a BuildingIndex from (lng, lat, height, orientation, footprint WKB) rows"""
+    lngs, lats, heights, orientations, footprints = zip(*rows)
+    xy = project(lngs, lats)
+
+    geometries = shapely.points(xy)
+    wkb = np.array([bytes(f) if f is not None else None for f in footprints], dtype=object)
+    has_footprint = np.array([f is not None for f in wkb])
+    if has_footprint.any():
+        polygons = shapely.from_wkb(wkb[has_footprint])
+        coords = shapely.get_coordinates(polygons)
+        projected = shapely.set_coordinates(polygons, project(coords[:, 0], coords[:, 1]))
+        geometries[has_footprint] = projected
+
+    return BuildingIndex(
+        xy,
+        np.asarray(heights, dtype=np.float64),
+        shapely.area(geometries),
+        np.array(orientations, dtype=np.float64),  # NaN where unknown
+        geometries
+    )
+
+
+building_cache = BuildingCache()
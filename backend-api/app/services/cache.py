@@ -1,7 +1,8 @@
 import redis.asyncio as redis
-from typing import Optional, Any
+from typing import Any, List, Optional
 import json
 from app.core.config import settings
+from app.core.profiling import span
 
 class RedisCache:
     """Redis cache service"""
@@ -29,7 +30,8 @@ class RedisCache:
         if not cls._client:
             return None
         
-        value = await cls._client.get(key)
+        with span("cache_get"):
+            value = await cls._client.get(key)
         if value:
             return json.loads(value)
         return None
@@ -40,11 +42,12 @@ class RedisCache:
         if not cls._client:
             return
         
-        await cls._client.set(
-            key,
-            json.dumps(value, default=str),
-            ex=ttl
-        )
+        with span("cache_set"):
+            await cls._client.set(
+                key,
+                json.dumps(value, default=str),
+                ex=ttl
+            )
     
     @classmethod
     async def delete(cls, key: str):
@@ -64,3 +67,24 @@ class RedisCache:
             channel,
             json.dumps(message, default=str)
         )
+    
+    @classmethod
+    async def publish_many(cls, channel: str, messages: List[Any]):
+        """Publish messages to channel in one pipelined round trip"""
+        if not cls._client or not messages:
+            return
+        
+        async with cls._client.pipeline(transaction=False) as pipe:
+            for message in messages:
+                pipe.publish(channel, json.dumps(message, default=str))
+            await pipe.execute()
+    
+    @classmethod
+    async def subscribe(cls, channel: str) -> Optional[redis.client.PubSub]:
+        """Subscribe to channel, returning the PubSub handle"""
+        if not cls._client:
+            return None
+        
+        pubsub = cls._client.pubsub()
+        await pubsub.subscribe(channel)
+        return pubsub
@@ -0,0 +1,98 @@
+from typing import Dict, Tuple
+import asyncio
+import hashlib
+import math
+import time
+
+from app.core.config import settings
+from app.core.geo import degrees_for_meters
+
+Cell = Tuple[int, int]
+
+
+class DataEpochs:
+    """
+    Tracks when a reading was last received per coarse spatial cell
+
+    The epoch of an area is the latest receive time in the cells it
+    touches combined with the current time window, so responses change
+    both when new readings arrive and when old ones age out of the
+    query windows. Receive times rather than reading timestamps are
+    used, so late backlog uploads and differently formatted timestamps
+    still advance it. Lookups are pure in-memory work and can run
+    before any DB query.
+
+    Readings must only advance epochs once they are committed, and with
+    a read replica only after it has had time to replay them; otherwise
+    a new ETag could be issued for a response still built from old rows
+    and stay pinned until the next reading or time window.
+    """
+
+    def __init__(
+        self,
+        cell_size: float = settings.EPOCH_CELL_SIZE_DEG,
+        window_seconds: int = settings.EPOCH_WINDOW_SECONDS,
+        replica_lag: float = (
+            settings.EPOCH_REPLICA_LAG_SECONDS if settings.DATABASE_READ_URL else 0.0
+        )
+    ):
+        self.cell_size = cell_size
+        self.window_seconds = window_seconds
+        self.replica_lag = replica_lag
+        self._cells: Dict[Cell, float] = {}
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def advance(self, lat: float, lng: float):
+        """Record that a reading was received now"""
+        cell = self._cell(lat, lng)
+        self._cells[cell] = max(time.time(), self._cells.get(cell, 0.0))
+
+    def advance_committed(self, lat: float, lng: float):
+        """Record a committed reading once every read pool can see it"""
+        if self.replica_lag <= 0:
+            self.advance(lat, lng)
+            return
+        asyncio.get_running_loop().call_later(self.replica_lag, self.advance, lat, lng)
+
+    def epoch(
+        self,
+        min_lat: float,
+        min_lng: float,
+        max_lat: float,
+        max_lng: float
+    ) -> str:
+        """Epoch of a bounding box, including the neighbouring cells"""
+        min_row, min_col = self._cell(min_lat, min_lng)
+        max_row, max_col = self._cell(max_lat, max_lng)
+        min_row, min_col, max_row, max_col = min_row - 1, min_col - 1, max_row + 1, max_col + 1
+
+        latest = 0.0
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            for (row, col), marker in self._cells.items():
+                if min_row <= row <= max_row and min_col <= col <= max_col and marker > latest:
+                    latest = marker
+        else:
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    marker = self._cells.get((row, col), 0.0)
+                    if marker > latest:
+                        latest = marker
+
+        window = int(time.time() // self.window_seconds)
+        return f"{latest:.6f}|{window}"
+
+    def epoch_near(self, lat: float, lng: float, radius_meters: float) -> str:
+        """Epoch of the area within radius_meters of a point"""
+        dlat, dlng = degrees_for_meters(radius_meters, lat)
+        return self.epoch(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+
+    @staticmethod
+    def etag(epoch: str, *parts: object) -> str:
+        """Strong ETag for a response derived from an epoch and request key"""
+        key = "|".join([epoch, *(str(p) for p in parts)])
+        return '"' + hashlib.sha1(key.encode()).hexdigest()[:24] + '"'
+
+
+data_epochs = DataEpochs()
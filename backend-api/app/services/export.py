@@ -0,0 +1,165 @@
+from sqlalchemy import and_
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+from datetime import datetime
+import csv
+import io
+import json
+import logging
+
+from app.core.config import settings
+from app.db.columns import COORDINATE_COLUMNS, MEASUREMENT_COLUMNS, reading_columns
+from app.db.database import AsyncReadSessionLocal
+from app.db.models import WeatherReading
+from app.db.spatial import in_cells, within_bbox
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Columns that can be exported, in default output order
+EXPORT_COLUMNS = (
+    "timestamp",
+    *COORDINATE_COLUMNS,
+    *MEASUREMENT_COLUMNS,
+    "source",
+    "confidence",
+    "sensor_id",
+)
+
+# Export format -> media type
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_statement(
+    columns: Sequence[str],
+    start: datetime,
+    end: datetime,
+    bbox: Optional[Tuple[float, float, float, float]] = None
+):
+    """Select `columns` of readings in [start, end), optionally within bbox, in time order"""
+    conditions = [WeatherReading.timestamp >= start, WeatherReading.timestamp < end]
+    if bbox is not None:
+        conditions.append(in_cells(WeatherReading.cell_id, *bbox))
+        conditions.append(within_bbox(WeatherReading.location, *bbox))
+    return (
+        reading_columns(*columns, coordinates=False)
+        .where(and_(*conditions))
+        .order_by(WeatherReading.timestamp)
+    )
+
+
+async def _batches(stmt, batch_size: int) -> AsyncIterator[List[tuple]]:
+    """
+    Row batches from a server-side cursor
+
+    The session is owned by the generator rather than a request
+    dependency, so it stays open for as long as the response streams.
+    """
+    async with AsyncReadSessionLocal() as session:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _ndjson_chunk(columns: Sequence[str], rows: Iterable[tuple]) -> bytes:
+    lines = (
+        json.dumps({c: _jsonable(v) for c, v in zip(columns, row)}, separators=(",", ":"))
+        for row in rows
+    )
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _csv_chunk(rows: Iterable[tuple]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_jsonable(v) for v in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the caller"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(columns: Sequence[str]):
+    types: Dict[str, object] = {"timestamp": pa.timestamp("us")}
+    for name in ("source", "sensor_id"):
+        types[name] = pa.string()
+    return pa.schema([(c, types.get(c, pa.float64())) for c in columns])
+
+
+async def stream_export(
+    columns: Sequence[str],
+    start: datetime,
+    end: datetime,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    fmt: str = "ndjson",
+    batch_size: int = settings.EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Stream readings as NDJSON, CSV or Parquet chunks
+
+    Memory is bounded by one batch of rows: each cursor batch becomes
+    one output chunk, or one Parquet row group.
+    """
+
+    if fmt == "parquet" and not PYARROW_AVAILABLE:
+        raise ValueError("Parquet export requires pyarrow")
+
+    stmt = export_statement(columns, start, end, bbox)
+    rows_written = 0
+
+    if fmt == "csv":
+        yield _csv_chunk([columns])
+    if fmt == "parquet":
+        sink = _ChunkSink()
+        schema = _arrow_schema(columns)
+        writer = pq.ParquetWriter(sink, schema)
+
+    async for rows in _batches(stmt, batch_size):
+        rows_written += len(rows)
+        if fmt == "ndjson":
+            yield _ndjson_chunk(columns, rows)
+        elif fmt == "csv":
+            yield _csv_chunk(rows)
+        else:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+
+    if fmt == "parquet":
+        writer.close()
+        yield sink.drain()
+
+    logger.info(f"Exported {rows_written} readings as {fmt}")
@@ -0,0 +1,159 @@
+"""
+Derived weather indices on whole arrays
+
+Heat index, wind chill, comfort, AQI, laundry drying time and mould
+risk, written as elementwise numpy expressions so a grid of cells costs
+about the same as a single point. Categories are looked up from
+breakpoint tables with searchsorted. Inputs broadcast against each
+other; scalars work too.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+# Rothfusz regression (degrees F, % relative humidity)
+HEAT_INDEX_COEFFICIENTS = (
+    -42.379, 2.04901523, 10.14333127, -0.22475541, -0.00683783,
+    -0.05481717, 0.00122874, 0.00085282, -0.00000199,
+)
+
+# Wind chill only applies below this temperature (degrees C)
+WIND_CHILL_MAX_TEMP = 10.0
+
+# Discomfort index (temp + 0.5 * humidity): levels start at each break
+COMFORT_BREAKS = np.array([20.0, 25.0, 30.0, 35.0])
+COMFORT_LEVELS = (
+    ("Comfortable", "😊"),
+    ("Fairly Comfortable", "🙂"),
+    ("Uncomfortably Warm", "😅"),
+    ("Very Uncomfortable", "😰"),
+    ("Dangerously Hot", "🥵"),
+)
+
+# PM2.5 (ug/m3) AQI segments: upper concentration bound of each category
+# (inclusive), and the concentration / index each segment starts from
+AQI_PM25_BREAKS = np.array([12.0, 35.4, 55.4, 150.4])
+AQI_PM25_LOW = np.array([0.0, 12.0, 35.4, 55.4, 150.4])
+AQI_PM25_SPAN = np.array([12.0, 23.4, 20.0, 95.0, 50.0])
+AQI_INDEX_LOW = np.array([0.0, 50.0, 100.0, 150.0, 200.0])
+AQI_INDEX_SPAN = np.array([50.0, 50.0, 50.0, 50.0, 100.0])
+AQI_MAX = 500
+AQI_CATEGORIES = (
+    ("Good", "#00E400"),
+    ("Moderate", "#FFFF00"),
+    ("Unhealthy for Sensitive Groups", "#FF7E00"),
+    ("Unhealthy", "#FF0000"),
+    ("Very Unhealthy", "#8F3F97"),
+)
+
+# Laundry: base drying time in poor conditions, and recommendation breaks (minutes)
+LAUNDRY_BASE_MINUTES = 180
+LAUNDRY_BREAKS = np.array([60, 120, 180, 300])
+LAUNDRY_RECOMMENDATIONS = ("excellent", "good", "fair", "poor", "avoid")
+
+# Mould risk levels: above 40 is medium, above 70 high
+MOULD_BREAKS = np.array([40, 70])
+MOULD_LEVELS = ("low", "medium", "high")
+
+
+def heat_index(temp_c, humidity) -> np.ndarray:
+    """Apparent temperature (degrees C) from temperature and relative humidity"""
+    c1, c2, c3, c4, c5, c6, c7, c8, c9 = HEAT_INDEX_COEFFICIENTS
+    t = np.asarray(temp_c, dtype=np.float64) * 9 / 5 + 32
+    h = np.asarray(humidity, dtype=np.float64)
+    hi = (
+        c1 + c2 * t + c3 * h + c4 * t * h + c5 * t * t + c6 * h * h
+        + c7 * t * t * h + c8 * t * h * h + c9 * t * t * h * h
+    )
+    return (hi - 32) * 5 / 9
+
+
+def wind_chill(temp_c, wind_speed) -> np.ndarray:
+    """Wind chill (degrees C) from temperature and wind speed in m/s; the temperature itself when warm"""
+    t = np.asarray(temp_c, dtype=np.float64)
+    v = (np.asarray(wind_speed, dtype=np.float64) * 3.6) ** 0.16  # km/h
+    return np.where(t < WIND_CHILL_MAX_TEMP, 13.12 + 0.6215 * t - 11.37 * v + 0.3965 * t * v, t)
+
+
+def discomfort_index(temp_c, humidity) -> np.ndarray:
+    return np.asarray(temp_c, dtype=np.float64) + 0.5 * np.asarray(humidity, dtype=np.float64)
+
+
+def comfort_level(index) -> np.ndarray:
+    """Index into COMFORT_LEVELS for each discomfort index"""
+    return np.searchsorted(COMFORT_BREAKS, index, side="right")
+
+
+def aqi(pm25) -> np.ndarray:
+    """US EPA style AQI from PM2.5, piecewise linear per category, capped at AQI_MAX"""
+    pm25 = np.asarray(pm25, dtype=np.float64)
+    category = aqi_category(pm25)
+    index = AQI_INDEX_LOW[category] + (pm25 - AQI_PM25_LOW[category]) / AQI_PM25_SPAN[category] * AQI_INDEX_SPAN[category]
+    return np.minimum(index, AQI_MAX)
+
+
+def aqi_category(pm25) -> np.ndarray:
+    """Index into AQI_CATEGORIES for each PM2.5 concentration"""
+    return np.searchsorted(AQI_PM25_BREAKS, pm25, side="left")
+
+
+def laundry_dry_time(temp_c, humidity, wind_speed) -> np.ndarray:
+    """Estimated drying time in whole minutes"""
+    temp_factor = np.maximum(0, (np.asarray(temp_c, dtype=np.float64) - 15) / 20)
+    humid_factor = 1 - np.asarray(humidity, dtype=np.float64) / 100
+    wind_factor = np.minimum(1, np.asarray(wind_speed, dtype=np.float64) / 20)
+    dry_factor = temp_factor * 0.4 + humid_factor * 0.4 + wind_factor * 0.2
+    return (LAUNDRY_BASE_MINUTES * (1 - dry_factor)).astype(np.int64)
+
+
+def laundry_recommendation(dry_time) -> np.ndarray:
+    """Index into LAUNDRY_RECOMMENDATIONS for each drying time"""
+    return np.searchsorted(LAUNDRY_BREAKS, dry_time, side="right")
+
+
+def mould_risk(temp_c, humidity, wind_speed) -> np.ndarray:
+    """Mould risk score, 0-100"""
+    t = np.asarray(temp_c, dtype=np.float64)
+    h = np.asarray(humidity, dtype=np.float64)
+    humid_risk = np.where(h > 60, (h - 60) / 40, 0)
+    temp_risk = np.where((t >= 20) & (t <= 30), 1, 0.5)
+    ventilation = 1 - np.minimum(1, np.asarray(wind_speed, dtype=np.float64) / 10)
+    score = ((humid_risk * 0.5 + temp_risk * 0.3 + ventilation * 0.2) * 100).astype(np.int64)
+    return np.clip(score, 0, 100)
+
+
+def mould_level(score) -> np.ndarray:
+    """Index into MOULD_LEVELS for each risk score"""
+    return np.searchsorted(MOULD_BREAKS, score, side="left")
+
+
+def derived_indices(temp_c, humidity, wind_speed) -> Dict[str, np.ndarray]:
+    """Heat index, wind chill and comfort for every cell at once"""
+    comfort = discomfort_index(temp_c, humidity)
+    return {
+        "heat_index": heat_index(temp_c, humidity),
+        "wind_chill": wind_chill(temp_c, wind_speed),
+        "comfort_index": comfort,
+        "comfort_level": comfort_level(comfort),
+    }
+
+
+def aqi_records(pm25) -> List[dict]:
+    """{"value", "category", "color"} per PM2.5 value, as served by the API"""
+    values = np.round(aqi(pm25)).ravel().tolist()
+    categories = aqi_category(pm25).ravel().tolist()
+    return [
+        {"value": value, "category": AQI_CATEGORIES[c][0], "color": AQI_CATEGORIES[c][1]}
+        for value, c in zip(values, categories)
+    ]
+
+
+def comfort_records(temp_c, humidity) -> List[dict]:
+    """{"index", "level", "emoji"} per point, as served by the API"""
+    index = discomfort_index(temp_c, humidity)
+    levels = comfort_level(index).ravel().tolist()
+    return [
+        {"index": value, "level": COMFORT_LEVELS[level][0], "emoji": COMFORT_LEVELS[level][1]}
+        for value, level in zip(np.round(index, 1).ravel().tolist(), levels)
+    ]
@@ -0,0 +1,110 @@
+"""
+Crowdsourced sensor reading ingestion
+
+Follows backend-ingest: readings outside plausible ranges or stamped
+more than SENSOR_MAX_CLOCK_SKEW_SECONDS in the future are dropped, the
+rest are inserted into weather_readings in one statement, advance
+the data epochs of their area, and are published on
+LIVE_READINGS_CHANNEL for the live update hub.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+import logging
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.profiling import span
+from app.db.columns import naive_utc
+from app.db.models import WeatherReading
+from app.schemas.weather import SensorReading
+from app.services.cache import RedisCache
+from app.services.epochs import data_epochs
+
+logger = logging.getLogger(__name__)
+
+# Accepted range per measurement; readings outside any are rejected
+PLAUSIBLE_RANGES = {
+    "temperature": (-50.0, 60.0),
+    "humidity": (0.0, 100.0),
+    "rainfall": (0.0, 500.0),
+    "wind_speed": (0.0, 100.0),
+    "wind_direction": (0.0, 360.0),
+    "pressure": (850.0, 1100.0),
+    "uv_index": (0.0, 20.0),
+}
+
+# NOT NULL measurement columns of weather_readings
+REQUIRED_MEASUREMENTS = ("temperature", "humidity", "wind_speed")
+
+
+def reading_values(reading: SensorReading) -> Optional[Dict[str, float]]:
+    """Measurements of a reading, or None if it is missing or out of range"""
+    values = {}
+    for name, (low, high) in PLAUSIBLE_RANGES.items():
+        value = reading.readings.get(name)
+        if value is None:
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        if not low <= value <= high:
+            return None
+        values[name] = value
+
+    if any(name not in values for name in REQUIRED_MEASUREMENTS):
+        return None
+    return values
+
+
+async def ingest_readings(db: AsyncSession, readings: Sequence[SensorReading]) -> int:
+    """Store the valid readings and notify live subscribers; returns how many were stored"""
+    accepted: List[SensorReading] = []
+    rows: List[Dict] = []
+    # A fast device clock would keep its reading in every recent-window query
+    latest = datetime.utcnow() + timedelta(seconds=settings.SENSOR_MAX_CLOCK_SKEW_SECONDS)
+    for reading in readings:
+        values = reading_values(reading)
+        timestamp = naive_utc(reading.timestamp)
+        if values is None or timestamp > latest:
+            continue
+        location = reading.location
+        rows.append({
+            "timestamp": timestamp,
+            "location": f"SRID=4326;POINTZ({location.longitude} {location.latitude} {location.elevation or 0.0})",
+            "rainfall": 0.0,
+            **values,
+            "source": "crowdsourced",
+            "confidence": reading.accuracy,
+            "sensor_id": reading.sensor_id,
+        })
+        accepted.append(reading)
+
+    if not rows:
+        return 0
+
+    with span("db_query"):
+        await db.execute(insert(WeatherReading), rows)
+        await db.commit()
+
+    messages = []
+    for reading, row in zip(accepted, rows):
+        location = reading.location
+        data_epochs.advance_committed(location.latitude, location.longitude)
+        messages.append({
+            "sensor_id": reading.sensor_id,
+            "timestamp": row["timestamp"].isoformat(),
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "elevation": location.elevation or 0.0,
+            **{name: row[name] for name in PLAUSIBLE_RANGES if name in row},
+            "device_type": reading.device_type,
+            "accuracy": reading.accuracy,
+        })
+    await RedisCache.publish_many(settings.LIVE_READINGS_CHANNEL, messages)
+
+    logger.debug(f"Ingested {len(rows)} of {len(readings)} sensor readings")
+    return len(rows)
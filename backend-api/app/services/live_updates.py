@@ -0,0 +1,229 @@
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+import asyncio
+import json
+import logging
+import math
+
+from app.core.config import settings
+from app.schemas.weather import GridBounds
+from app.services.cache import RedisCache
+from app.services.epochs import data_epochs
+
+logger = logging.getLogger(__name__)
+
+Bucket = Tuple[int, int]
+
+
+def bucket_for(lat: float, lng: float, size: float = settings.LIVE_BUCKET_SIZE_DEG) -> Bucket:
+    """Map a coordinate to its (row, col) subscription bucket"""
+    return (math.floor(lat / size), math.floor(lng / size))
+
+
+class ConnectionQueue:
+    """
+    Bounded queue of pending cell updates for one connection
+
+    Updates are keyed by bucket, so a newer payload for a cell replaces the
+    stale one still waiting to be sent. When a slow client lets the queue
+    fill up, the oldest pending cell is dropped.
+    """
+
+    def __init__(self, maxsize: int = settings.LIVE_QUEUE_MAXSIZE):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.merged = 0
+        self._pending: "OrderedDict[Bucket, str]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, bucket: Bucket, payload: str):
+        """Queue a payload, merging with or evicting stale updates"""
+        if bucket in self._pending:
+            del self._pending[bucket]
+            self.merged += 1
+        elif len(self._pending) >= self.maxsize:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+
+        self._pending[bucket] = payload
+        self._ready.set()
+
+    async def get(self) -> str:
+        """Wait for and return the oldest pending payload"""
+        while not self._pending:
+            self._ready.clear()
+            await self._ready.wait()
+
+        _, payload = self._pending.popitem(last=False)
+        return payload
+
+
+class SubscriptionIndex:
+    """
+    Grid-bucketed index from map buckets to subscribed connections
+
+    Each subscription is expanded to the buckets its bounds cover once, at
+    subscribe time, so matching a batch of changed cells costs one dict
+    lookup per cell regardless of how many clients are connected.
+    """
+
+    def __init__(
+        self,
+        bucket_size: float = settings.LIVE_BUCKET_SIZE_DEG,
+        max_buckets: int = settings.LIVE_MAX_SUBSCRIPTION_BUCKETS
+    ):
+        self.bucket_size = bucket_size
+        self.max_buckets = max_buckets
+        self._buckets: Dict[Bucket, Set[int]] = defaultdict(set)
+        self._subscriptions: Dict[int, List[Bucket]] = {}
+
+    def buckets_in(self, bounds: GridBounds) -> List[Bucket]:
+        """List the buckets covered by a bounding box"""
+        min_row, min_col = bucket_for(bounds.min_lat, bounds.min_lng, self.bucket_size)
+        max_row, max_col = bucket_for(bounds.max_lat, bounds.max_lng, self.bucket_size)
+
+        count = (max_row - min_row + 1) * (max_col - min_col + 1)
+        if count <= 0:
+            raise ValueError("Invalid subscription bounds")
+        if count > self.max_buckets:
+            raise ValueError(
+                f"Subscription covers {count} buckets (max {self.max_buckets})"
+            )
+
+        return [
+            (row, col)
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+        ]
+
+    def subscribe(self, conn_id: int, bounds: GridBounds):
+        """Replace a connection's subscription with new bounds"""
+        buckets = self.buckets_in(bounds)
+        self.unsubscribe(conn_id)
+
+        for bucket in buckets:
+            self._buckets[bucket].add(conn_id)
+        self._subscriptions[conn_id] = buckets
+
+    def unsubscribe(self, conn_id: int):
+        """Remove a connection from every bucket it watches"""
+        for bucket in self._subscriptions.pop(conn_id, []):
+            subscribers = self._buckets.get(bucket)
+            if subscribers is None:
+                continue
+            subscribers.discard(conn_id)
+            if not subscribers:
+                del self._buckets[bucket]
+
+    def match(self, buckets: Iterable[Bucket]) -> Dict[Bucket, Set[int]]:
+        """Return the subscribers for each changed bucket that has any"""
+        index = self._buckets
+        return {bucket: index[bucket] for bucket in buckets if bucket in index}
+
+
+class LiveUpdateHub:
+    """
+    Fans out live sensor readings to WebSocket subscribers
+
+    Readings arriving on the Redis channel are coalesced per bucket and
+    flushed every WEBSOCKET_UPDATE_INTERVAL seconds. Each changed cell is
+    serialized once and the same payload is queued for every subscriber.
+    """
+
+    def __init__(self):
+        self.index = SubscriptionIndex()
+        self._queues: Dict[int, ConnectionQueue] = {}
+        self._changed: Dict[Bucket, Dict[str, Any]] = {}
+        self._next_id = 0
+
+    def connect(self) -> Tuple[int, ConnectionQueue]:
+        """Register a new connection and return its id and queue"""
+        self._next_id += 1
+        queue = ConnectionQueue()
+        self._queues[self._next_id] = queue
+        return self._next_id, queue
+
+    def disconnect(self, conn_id: int):
+        """Forget a connection and its subscription"""
+        self.index.unsubscribe(conn_id)
+        self._queues.pop(conn_id, None)
+
+    def subscribe(self, conn_id: int, bounds: GridBounds):
+        """Subscribe a connection to updates inside bounds"""
+        self.index.subscribe(conn_id, bounds)
+
+    def unsubscribe(self, conn_id: int):
+        """Stop sending updates to a connection"""
+        self.index.unsubscribe(conn_id)
+
+    def ingest(self, reading: Dict[str, Any]):
+        """Record a reading; later readings for the same bucket win"""
+        try:
+            lat, lng = float(reading["latitude"]), float(reading["longitude"])
+        except (KeyError, TypeError, ValueError):
+            logger.debug("Ignoring reading without coordinates")
+            return
+
+        data_epochs.advance_committed(lat, lng)
+        self._changed[bucket_for(lat, lng, self.index.bucket_size)] = reading
+
+    def flush(self) -> int:
+        """Serialize changed cells once and queue them for subscribers"""
+        changed, self._changed = self._changed, {}
+        delivered = 0
+
+        for bucket, subscribers in self.index.match(changed).items():
+            payload = json.dumps(
+                {"type": "cell_update", "cell": bucket, "reading": changed[bucket]},
+                default=str
+            )
+            for conn_id in subscribers:
+                queue = self._queues.get(conn_id)
+                if queue is not None:
+                    queue.put(bucket, payload)
+                    delivered += 1
+
+        return delivered
+
+    def stats(self) -> Dict[str, int]:
+        """Connection and queue counters"""
+        queues = self._queues.values()
+        return {
+            "connections": len(self._queues),
+            "pending": sum(len(q) for q in queues),
+            "dropped": sum(q.dropped for q in queues),
+            "merged": sum(q.merged for q in queues),
+        }
+
+    async def _listen(self):
+        try:
+            pubsub = await RedisCache.subscribe(settings.LIVE_READINGS_CHANNEL)
+        except Exception as exc:
+            logger.warning(f"Redis subscribe failed, live updates disabled: {exc}")
+            return
+        if pubsub is None:
+            logger.warning("Redis unavailable, live updates disabled")
+            return
+
+        async for message in pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            try:
+                self.ingest(json.loads(message["data"]))
+            except ValueError:
+                logger.debug("Ignoring malformed live reading")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.WEBSOCKET_UPDATE_INTERVAL)
+            self.flush()
+
+    async def run(self):
+        """Consume the readings channel and flush updates until cancelled"""
+        await asyncio.gather(self._listen(), self._flush_loop())
+
+
+live_hub = LiveUpdateHub()
@@ -0,0 +1,309 @@
+"""
+In-memory place search and reverse geocoding
+
+Entries come from the named locations, an optional gazetteer CSV and
+building_data addresses. Names are normalised (NFKC, case-folded,
+punctuation to spaces) and indexed three ways:
+
+- prefix: a sorted array of keys, one per word start of the English
+  name and per character of the Chinese name; a prefix is one bisect
+  range, i.e. a trie flattened into sorted order
+- fuzzy: trigram postings, scored by the share of query trigrams matched
+- nearest: a KD-tree over projected coordinates
+"""
+
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import asyncio
+import csv
+import logging
+import re
+import unicodedata
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.geo import project
+from app.core.locations import NAMED_LOCATIONS
+from app.core.profiling import span
+
+logger = logging.getLogger(__name__)
+
+# Result ordering bonus per entry kind (named districts first)
+KIND_PRIORITY = {"district": 0.3, "place": 0.2, "gazetteer": 0.1, "building": 0.0}
+
+# Prefix match strength: whole name, then any word of it
+EXACT_MATCH = 3.0
+NAME_PREFIX = 2.0
+WORD_PREFIX = 1.0
+
+_CJK = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")  # CJK ideographs
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """NFKC, case-folded, runs of punctuation and space collapsed to one space"""
+    return _NON_WORD.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def split_bilingual(text: str) -> Tuple[str, str]:
+    """('English part', '中文部分') of a mixed address"""
+    chinese = "".join(_CJK.findall(text))
+    english = " ".join(_CJK.sub(" ", text).split())
+    return english, chinese
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaceEntry(NamedTuple):
+    id: str
+    name: str
+    name_zh: str
+    lat: float
+    lng: float
+    kind: str
+
+
+class LocationIndex:
+    """Immutable search index over a list of PlaceEntry"""
+
+    def __init__(self, entries: List[PlaceEntry]):
+        from scipy.spatial import cKDTree  # imported on first use, see app.services.warmup
+
+        self.entries = entries
+        n = len(entries)
+
+        keys: List[Tuple[str, int, float]] = []
+        grams: Dict[str, List[int]] = {}
+        gram_counts = np.zeros(n, dtype=np.int64)
+        self._priority = np.zeros(n)
+
+        for i, entry in enumerate(entries):
+            self._priority[i] = KIND_PRIORITY.get(entry.kind, 0.0) - len(entry.name or entry.name_zh) / 1000
+            english, chinese = normalize(entry.name), normalize(entry.name_zh)
+
+            if english:
+                words = english.split(" ")
+                keys.append((english, i, NAME_PREFIX))
+                for w in range(1, len(words)):
+                    keys.append((" ".join(words[w:]), i, WORD_PREFIX))
+            if chinese:
+                compact = chinese.replace(" ", "")
+                keys.append((compact, i, NAME_PREFIX))
+                for c in range(1, len(compact)):
+                    keys.append((compact[c:], i, WORD_PREFIX))
+
+            entry_grams = set()
+            for name in (english, chinese):
+                if name:
+                    entry_grams |= trigrams(name)
+            gram_counts[i] = len(entry_grams)
+            for gram in entry_grams:
+                grams.setdefault(gram, []).append(i)
+
+        keys.sort()
+        self._keys = [k for k, _, _ in keys]
+        self._key_entries = np.array([i for _, i, _ in keys], dtype=np.int64)
+        self._key_strength = np.array([s for _, _, s in keys])
+        self._key_lengths = np.array([len(k) for k in self._keys], dtype=np.int64)
+
+        self._grams = {gram: np.array(ids, dtype=np.int64) for gram, ids in grams.items()}
+        self._gram_counts = gram_counts
+
+        self._lats = np.array([e.lat for e in entries], dtype=np.float64)
+        self._lngs = np.array([e.lng for e in entries], dtype=np.float64)
+        self._tree = cKDTree(project(self._lngs, self._lats)) if n else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _best(self, ids: np.ndarray, scores: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        """Highest score per entry, best first"""
+        order = np.lexsort((ids, -scores))
+        ids, scores = ids[order], scores[order]
+        _, first = np.unique(ids, return_index=True)
+        first = np.sort(first)[:limit]
+        return list(zip(ids[first].tolist(), scores[first].tolist()))
+
+    def prefix(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """Entries with a name or word starting with query"""
+        lo = bisect_left(self._keys, query)
+        hi = bisect_left(self._keys, query + "\U0010ffff")
+        if lo == hi:
+            return []
+        strength = self._key_strength[lo:hi].copy()
+        exact = (self._key_lengths[lo:hi] == len(query)) & (strength == NAME_PREFIX)
+        strength[exact] = EXACT_MATCH
+        ids = self._key_entries[lo:hi]
+        return self._best(ids, strength + self._priority[ids], limit)
+
+    def fuzzy(
+        self,
+        query: str,
+        limit: int,
+        min_similarity: float = settings.LOCATION_FUZZY_MIN_SIMILARITY
+    ) -> List[Tuple[int, float]]:
+        """
+        Entries sharing at least min_similarity of the query's trigrams
+
+        Scored by that share, plus half the trigram Jaccard similarity so
+        names close in length to the query rank higher.
+        """
+        query_grams = trigrams(query)
+        postings = [self._grams[g] for g in query_grams if g in self._grams]
+        if not postings:
+            return []
+        hits = np.bincount(np.concatenate(postings), minlength=len(self.entries))
+        share = hits / len(query_grams)
+        ids = np.flatnonzero(share >= min_similarity)
+        jaccard = hits[ids] / (len(query_grams) + self._gram_counts[ids] - hits[ids])
+        return self._best(ids, share[ids] + 0.5 * jaccard + self._priority[ids], limit)
+
+    def search(self, text: str, limit: int = 10) -> List[dict]:
+        """Prefix matches first, topped up with fuzzy matches"""
+        query = normalize(text)
+        if not query:
+            return []
+
+        matches = self.prefix(query, limit)
+        if len(matches) < limit:
+            seen = {i for i, _ in matches}
+            matches += [(i, s) for i, s in self.fuzzy(query, limit) if i not in seen][:limit - len(matches)]
+        return [self.record(i, score=round(s, 3)) for i, s in matches]
+
+    def nearest(self, lat: float, lng: float, limit: int = 1, max_distance: float = np.inf) -> List[dict]:
+        """Closest entries to a point, within max_distance meters"""
+        if self._tree is None:
+            return []
+        k = min(limit, len(self.entries))
+        distances, ids = self._tree.query(project(lng, lat)[0], k=k, distance_upper_bound=max_distance)
+        distances, ids = np.atleast_1d(distances), np.atleast_1d(ids)
+        found = np.isfinite(distances)
+        return [
+            self.record(i, distance_meters=round(d, 1))
+            for i, d in zip(ids[found].tolist(), distances[found].tolist())
+        ]
+
+    def record(self, i: int, **extra) -> dict:
+        entry = self.entries[i]
+        return {
+            "id": entry.id,
+            "name": entry.name or None,
+            "name_zh": entry.name_zh or None,
+            "kind": entry.kind,
+            "latitude": entry.lat,
+            "longitude": entry.lng,
+            **extra,
+        }
+
+
+def named_entries() -> List[PlaceEntry]:
+    return [
+        PlaceEntry(key, loc.name, loc.name_zh, loc.lat, loc.lng, loc.kind)
+        for key, loc in NAMED_LOCATIONS.items()
+    ]
+
+
+def gazetteer_entries(path: Path) -> List[PlaceEntry]:
+    """
+    Rows of a gazetteer CSV with name, name_zh, lat, lng and optional
+    id and kind columns
+    """
+
+    entries = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for n, row in enumerate(csv.DictReader(f)):
+            try:
+                lat, lng = float(row["lat"]), float(row["lng"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            name, name_zh = (row.get("name") or "").strip(), (row.get("name_zh") or "").strip()
+            if name or name_zh:
+                entries.append(PlaceEntry(
+                    row.get("id") or f"gazetteer:{n}", name, name_zh, lat, lng, row.get("kind") or "gazetteer"
+                ))
+    return entries
+
+
+def address_entries(rows: Iterable[tuple]) -> List[PlaceEntry]:
+    """Building entries from (building_id, address, lat, lng), one per distinct address"""
+    entries, seen = [], set()
+    for building_id, address, lat, lng in rows:
+        key = normalize(address)
+        if key and key not in seen:
+            seen.add(key)
+            english, chinese = split_bilingual(address.strip())
+            entries.append(PlaceEntry(f"building:{building_id}", english, chinese, lat, lng, "building"))
+    return entries
+
+
+class LocationSearch:
+    """
+    Holder for the current LocationIndex
+
+    Starts with the named locations only, indexed on first use; load()
+    adds the gazetteer and building addresses and swaps the index in whole.
+    """
+
+    def __init__(self):
+        self._index: Optional[LocationIndex] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def index(self) -> LocationIndex:
+        if self._index is None:
+            self._index = LocationIndex(named_entries())
+        return self._index
+
+    async def load(self):
+        """
+        Rebuild the index from all sources
+
+        When building addresses cannot be read, the first load still
+        swaps in an index without them; the error propagates either way,
+        so the warm-up marks the step failed and retries it.
+        """
+        async with self._lock:
+            entries = named_entries()
+
+            path = Path(settings.GAZETTEER_PATH)
+            if path.exists():
+                entries += await asyncio.to_thread(gazetteer_entries, path)
+
+            try:
+                entries += await self._building_entries()
+            except Exception:
+                if self._index is None:
+                    await self._swap(entries)
+                raise
+            await self._swap(entries)
+
+    async def _swap(self, entries: List[PlaceEntry]):
+        with span("index_build"):
+            self._index = await asyncio.to_thread(LocationIndex, entries)
+        logger.info(f"Location search index built with {len(entries)} places")
+
+    async def _building_entries(self) -> List[PlaceEntry]:
+        # Imported here so the index can be used without the pools
+        from sqlalchemy import select
+        from geoalchemy2.functions import ST_X, ST_Y
+        from app.db.database import AsyncReadSessionLocal
+        from app.db.models import BuildingData
+
+        stmt = select(
+            BuildingData.building_id,
+            BuildingData.address,
+            ST_Y(BuildingData.location),
+            ST_X(BuildingData.location),
+        ).where(BuildingData.address.isnot(None))
+        with span("db_query"):
+            async with AsyncReadSessionLocal() as session:
+                rows = (await session.execute(stmt)).all()
+        return address_entries(rows)
+
+
+location_search = LocationSearch()
@@ -0,0 +1,221 @@
+from typing import Dict, Optional, Tuple
+import logging
+import os
+
+import numpy as np
+import shapely
+
+from app.core.config import settings
+from app.core.geo import degrees_for_meters, unproject
+from app.services.buildings import BuildingIndex
+
+logger = logging.getLogger(__name__)
+
+# Per-cell features, in band order
+MORPHOLOGY_FEATURES = (
+    "plan_area_index",  # building plan area / cell area
+    "frontal_area_index",  # frontal area averaged over wind directions / cell area
+    "mean_height",  # footprint-weighted, meters
+    "max_height",  # meters
+    "height_to_width",  # street canyon aspect ratio H/W
+    "sky_view_factor",  # at street level, 0-1
+    "street_orientation",  # dominant building axis, degrees 0-180 (NaN without buildings)
+)
+
+# Above this H/W the canyon model no longer means much
+MAX_HEIGHT_TO_WIDTH = 10.0
+
+
+class MorphologyGrid:
+    """
+    Urban morphology features on a regular lat/lng grid
+
+    `features` has shape (len(MORPHOLOGY_FEATURES), rows, cols); cell
+    (0, 0) starts at (min_lat, min_lng). Lookups are index arithmetic on
+    lat/lng, so batches of points cost microseconds.
+    """
+
+    def __init__(
+        self,
+        features: np.ndarray,
+        min_lat: float,
+        min_lng: float,
+        step_lat: float,
+        step_lng: float,
+        resolution: float
+    ):
+        self.features = features
+        self.min_lat = min_lat
+        self.min_lng = min_lng
+        self.step_lat = step_lat
+        self.step_lng = step_lng
+        self.resolution = resolution
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.features.shape[1], self.features.shape[2]
+
+    def _rows(self, lats) -> Tuple[np.ndarray, np.ndarray]:
+        r = np.floor((np.asarray(lats, dtype=np.float64) - self.min_lat) / self.step_lat)
+        valid = (r >= 0) & (r < self.shape[0])
+        return np.where(valid, r, 0).astype(np.intp), valid
+
+    def _cols(self, lngs) -> Tuple[np.ndarray, np.ndarray]:
+        c = np.floor((np.asarray(lngs, dtype=np.float64) - self.min_lng) / self.step_lng)
+        valid = (c >= 0) & (c < self.shape[1])
+        return np.where(valid, c, 0).astype(np.intp), valid
+
+    def lookup(self, lats, lngs) -> np.ndarray:
+        """(n, len(MORPHOLOGY_FEATURES)) features at each point, NaN outside the grid"""
+        rows, row_valid = self._rows(np.ravel(lats))
+        cols, col_valid = self._cols(np.ravel(lngs))
+        out = self.features[:, rows, cols].T.astype(np.float64)
+        out[~(row_valid & col_valid)] = np.nan
+        return out
+
+    def lookup_lattice(self, lats, lngs) -> np.ndarray:
+        """Features on the lattice lats x lngs, shape (n_features, len(lats), len(lngs))"""
+        rows, row_valid = self._rows(lats)
+        cols, col_valid = self._cols(lngs)
+        out = self.features[:, rows[:, None], cols[None, :]].astype(np.float64)
+        out[:, ~row_valid, :] = np.nan
+        out[:, :, ~col_valid] = np.nan
+        return out
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            features=self.features,
+            names=np.array(MORPHOLOGY_FEATURES),
+            lattice=np.array([self.min_lat, self.min_lng, self.step_lat, self.step_lng, self.resolution]),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "MorphologyGrid":
+        with np.load(path) as data:
+            if tuple(data["names"]) != MORPHOLOGY_FEATURES:
+                raise ValueError(f"{path} was built with different morphology features")
+            return cls(data["features"], *data["lattice"])
+
+
+def compute_morphology(
+    buildings: BuildingIndex,
+    bounds: Tuple[float, float, float, float],
+    resolution: float = settings.MORPHOLOGY_RESOLUTION
+) -> MorphologyGrid:
+    """
+    Aggregate building geometry into per-cell morphology features
+
+    Each building counts towards the cell holding its location point.
+    Frontal area uses the mean caliper width of the footprint
+    (perimeter / pi), i.e. the average over all wind directions, and
+    street width assumes a regular array of blocks of the cell's mean
+    footprint size. Empty cells have zero indices and a sky view factor
+    of 1.
+    """
+
+    min_lat, min_lng, max_lat, max_lng = bounds
+    step_lat, step_lng = degrees_for_meters(resolution, (min_lat + max_lat) / 2)
+    rows = int(np.ceil((max_lat - min_lat) / step_lat))
+    cols = int(np.ceil((max_lng - min_lng) / step_lng))
+    n_cells = rows * cols
+    cell_area = float(resolution) ** 2
+
+    lngs, lats = unproject(buildings.xy)
+    r = np.floor((lats - min_lat) / step_lat).astype(np.intp)
+    c = np.floor((lngs - min_lng) / step_lng).astype(np.intp)
+    inside = (r >= 0) & (r < rows) & (c >= 0) & (c < cols)
+    cell = r[inside] * cols + c[inside]
+
+    areas = buildings.areas[inside]
+    heights = buildings.heights[inside]
+    orientations = buildings.orientations[inside]
+    perimeters = shapely.length(buildings.geometries[inside])
+
+    def per_cell(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(cell, weights, minlength=n_cells)
+
+    plan_area = per_cell(areas)
+    plan_index = np.minimum(plan_area / cell_area, 1.0)
+    frontal_index = per_cell(heights * perimeters / np.pi) / cell_area
+
+    # Buildings without a footprint still count towards heights
+    weights = np.maximum(areas, 1.0)
+    weight_sum = per_cell(weights)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_height = np.where(weight_sum > 0, per_cell(weights * heights) / weight_sum, 0.0)
+    max_height = np.zeros(n_cells)
+    np.maximum.at(max_height, cell, heights)
+
+    # Street width between blocks of side sqrt(mean footprint) at this density
+    footprints = per_cell((areas > 0).astype(np.float64))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        side = np.sqrt(plan_area / footprints)
+        width = side * (1 / np.sqrt(plan_index) - 1)
+        height_to_width = np.where(
+            plan_index > 0,
+            np.clip(mean_height / width, 0, MAX_HEIGHT_TO_WIDTH),
+            0.0
+        )
+    height_to_width = np.nan_to_num(height_to_width, nan=MAX_HEIGHT_TO_WIDTH)
+
+    # Sky view factor at the centre of an infinite street canyon
+    sky_view = np.sqrt(height_to_width ** 2 + 1) - height_to_width
+
+    # Dominant axis: weighted circular mean of doubled orientation angles
+    known = np.isfinite(orientations)
+    doubled = np.radians(2 * orientations[known])
+    sin_sum = np.bincount(cell[known], weights[known] * np.sin(doubled), minlength=n_cells)
+    cos_sum = np.bincount(cell[known], weights[known] * np.cos(doubled), minlength=n_cells)
+    orientation = np.degrees(np.arctan2(sin_sum, cos_sum)) / 2 % 180
+    orientation[(sin_sum == 0) & (cos_sum == 0)] = np.nan
+
+    features = np.stack([
+        plan_index, frontal_index, mean_height, max_height,
+        height_to_width, sky_view, orientation,
+    ]).astype(np.float32)
+    return MorphologyGrid(
+        features.reshape(len(MORPHOLOGY_FEATURES), rows, cols),
+        min_lat, min_lng, step_lat, step_lng, resolution
+    )
+
+
+class MorphologyStore:
+    """
+    MorphologyGrid loaded from MORPHOLOGY_PATH
+
+    The file is written offline by `python -m app.db.build_morphology`
+    and reloaded whenever it changes; without it, lookups return None.
+    """
+
+    def __init__(self, path: str = settings.MORPHOLOGY_PATH):
+        self.path = path
+        self._grid: Optional[MorphologyGrid] = None
+        self._mtime: Optional[float] = None
+
+    def get(self) -> Optional[MorphologyGrid]:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+        if mtime != self._mtime:
+            try:
+                self._grid = MorphologyGrid.load(self.path)
+                logger.info(f"Loaded morphology grid {self._grid.shape} from {self.path}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Failed to load morphology grid: {e}")
+                self._grid = None
+            self._mtime = mtime
+        return self._grid
+
+    def features(self, lats, lngs) -> Optional[Dict[str, np.ndarray]]:
+        """Feature arrays for a batch of points, or None without a grid"""
+        grid = self.get()
+        if grid is None:
+            return None
+        values = grid.lookup(lats, lngs)
+        return {name: values[:, i] for i, name in enumerate(MORPHOLOGY_FEATURES)}
+
+
+morphology_store = MorphologyStore()
@@ -0,0 +1,363 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.geo import HK_BOUNDS, degrees_for_meters, project, projection_cache
+from app.core.profiling import span
+from app.db.columns import fetch_columns, latest_per_sensor, reading_columns
+from app.db.models import WeatherReading
+from app.db.spatial import in_cells
+from app.services.epochs import data_epochs
+from app.services.ml_service import canyon_corrections, idw_kernel, kriging_confidence, kriging_model
+from app.services.morphology import MORPHOLOGY_FEATURES, morphology_store
+
+logger = logging.getLogger(__name__)
+
+# Variables carried by the raster, in band order
+RASTER_VARIABLES = ("temperature", "humidity", "rainfall", "wind_speed")
+
+# Raster bands: the interpolated variables plus a 0-1 confidence score
+RASTER_BANDS = RASTER_VARIABLES + ("confidence",)
+
+# Raster cells per KD-tree query and IDW kernel pass
+IDW_CHUNK_CELLS = 65536
+
+
+class WeatherRaster:
+    """
+    Regular lat/lng raster of interpolated weather variables
+
+    `values` has shape (len(RASTER_BANDS), rows, cols); row 0 is min_lat
+    and column 0 is min_lng. Cells without data are NaN.
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        min_lat: float,
+        min_lng: float,
+        step_lat: float,
+        step_lng: float,
+        epoch: str = "",
+        resolution: float = settings.RASTER_RESOLUTION
+    ):
+        self.values = values
+        self.min_lat = min_lat
+        self.min_lng = min_lng
+        self.step_lat = step_lat
+        self.step_lng = step_lng
+        self.epoch = epoch
+        self.resolution = resolution
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape[1], self.values.shape[2]
+
+    def band(self, variable: str) -> np.ndarray:
+        """2D array for one band"""
+        return self.values[RASTER_BANDS.index(variable)]
+
+    def sample_grid(self, variable: str, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """
+        Bilinearly sample a variable on the grid lats x lngs
+
+        Returns an array of shape (len(lats), len(lngs)), NaN outside the
+        raster.
+        """
+
+        band = self.band(variable)
+        rows, cols = self.shape
+
+        r = (np.asarray(lats) - self.min_lat) / self.step_lat
+        c = (np.asarray(lngs) - self.min_lng) / self.step_lng
+        r_valid = (r >= 0) & (r <= rows - 1)
+        c_valid = (c >= 0) & (c <= cols - 1)
+
+        r0 = np.clip(np.floor(r).astype(np.intp), 0, max(rows - 2, 0))
+        c0 = np.clip(np.floor(c).astype(np.intp), 0, max(cols - 2, 0))
+        r1 = np.minimum(r0 + 1, rows - 1)
+        c1 = np.minimum(c0 + 1, cols - 1)
+        fr = np.clip(r - r0, 0, 1)[:, None]
+        fc = np.clip(c - c0, 0, 1)[None, :]
+
+        top = band[np.ix_(r0, c0)] * (1 - fc) + band[np.ix_(r0, c1)] * fc
+        bottom = band[np.ix_(r1, c0)] * (1 - fc) + band[np.ix_(r1, c1)] * fc
+        out = top * (1 - fr) + bottom * fr
+
+        out[~r_valid, :] = np.nan
+        out[:, ~c_valid] = np.nan
+        return out
+
+    def window(
+        self,
+        min_lat: float,
+        min_lng: float,
+        max_lat: float,
+        max_lng: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cells whose centres fall inside a bounding box
+
+        Returns (lats, lngs, values) where values has shape
+        (len(RASTER_BANDS), len(lats), len(lngs)).
+        """
+
+        rows, cols = self.shape
+        r0 = max(0, int(np.ceil((min_lat - self.min_lat) / self.step_lat)))
+        r1 = min(rows, int(np.floor((max_lat - self.min_lat) / self.step_lat)) + 1)
+        c0 = max(0, int(np.ceil((min_lng - self.min_lng) / self.step_lng)))
+        c1 = min(cols, int(np.floor((max_lng - self.min_lng) / self.step_lng)) + 1)
+        r1, c1 = max(r0, r1), max(c0, c1)
+
+        lats = self.min_lat + np.arange(r0, r1) * self.step_lat
+        lngs = self.min_lng + np.arange(c0, c1) * self.step_lng
+        return lats, lngs, self.values[:, r0:r1, c0:c1]
+
+    def cell_count(
+        self,
+        min_lat: float,
+        min_lng: float,
+        max_lat: float,
+        max_lng: float
+    ) -> int:
+        """Number of cells window() would return, without slicing"""
+        rows = max(0, int((max_lat - min_lat) / self.step_lat) + 1)
+        cols = max(0, int((max_lng - min_lng) / self.step_lng) + 1)
+        return rows * cols
+
+    def block_average(self, factor: int, resolution: float) -> "WeatherRaster":
+        """Coarser raster averaging factor x factor blocks, ignoring NaN"""
+        if factor == 1:
+            return self
+
+        n_vars, rows, cols = self.values.shape
+        out_rows, out_cols = -(-rows // factor), -(-cols // factor)
+        padded = np.full((n_vars, out_rows * factor, out_cols * factor), np.nan)
+        padded[:, :rows, :cols] = self.values
+
+        blocks = padded.reshape(n_vars, out_rows, factor, out_cols, factor)
+        valid = ~np.isnan(blocks)
+        counts = valid.sum(axis=(2, 4))
+        sums = np.where(valid, blocks, 0.0).sum(axis=(2, 4))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.where(counts > 0, sums / counts, np.nan)
+
+        # Block centres sit half a block in from the base lattice origin
+        offset = (factor - 1) / 2
+        return WeatherRaster(
+            values,
+            self.min_lat + offset * self.step_lat,
+            self.min_lng + offset * self.step_lng,
+            self.step_lat * factor,
+            self.step_lng * factor,
+            self.epoch,
+            resolution
+        )
+
+
+class WeatherPyramid:
+    """
+    Multi-resolution stack of rasters built from the finest level
+
+    Levels are block averages of the base raster at each resolution in
+    GRID_PYRAMID_LEVELS, so wide-area queries read a coarse level and
+    cost roughly the same regardless of the requested box size.
+    """
+
+    def __init__(self, base: WeatherRaster, levels: List[int] = settings.GRID_PYRAMID_LEVELS):
+        self.base = base
+        self.levels: Dict[int, WeatherRaster] = {}
+        for resolution in sorted(levels):
+            factor = max(1, round(resolution / base.resolution))
+            self.levels[resolution] = base.block_average(factor, resolution)
+
+    @property
+    def epoch(self) -> str:
+        return self.base.epoch
+
+    def select_level(
+        self,
+        bounds: Tuple[float, float, float, float],
+        resolution: int,
+        max_cells: int = settings.MAX_GRID_SIZE
+    ) -> WeatherRaster:
+        """
+        Pick the level to serve a grid request from
+
+        Starts at the coarsest level that still meets the requested
+        resolution, then moves to coarser levels until the bounding box
+        fits in max_cells.
+        """
+
+        resolutions = sorted(self.levels)
+        candidates = [r for r in resolutions if r <= resolution] or resolutions[:1]
+        index = resolutions.index(candidates[-1])
+
+        while (
+            index < len(resolutions) - 1
+            and self.levels[resolutions[index]].cell_count(*bounds) > max_cells
+        ):
+            index += 1
+        return self.levels[resolutions[index]]
+
+
+def build_raster(
+    lngs: np.ndarray,
+    lats: np.ndarray,
+    values: np.ndarray,
+    bounds: Tuple[float, float, float, float] = HK_BOUNDS,
+    resolution: float = settings.RASTER_RESOLUTION,
+    k: int = 8,
+    epoch: str = "",
+    method: str = settings.INTERPOLATION_METHOD
+) -> WeatherRaster:
+    """
+    Interpolate station values onto a regular raster
+
+    `values` has shape (n_stations, len(RASTER_VARIABLES)). With IDW the
+    confidence band is the constant IDW_CONFIDENCE; with ordinary kriging
+    it is derived from the per-cell kriging variance. Distances are in
+    projected UTM 50N metres.
+    """
+
+    min_lat, min_lng, max_lat, max_lng = bounds
+    step_lat, step_lng = degrees_for_meters(resolution, (min_lat + max_lat) / 2)
+
+    grid_lats = np.arange(min_lat, max_lat + step_lat / 2, step_lat)
+    grid_lngs = np.arange(min_lng, max_lng + step_lng / 2, step_lng)
+    rows, cols = len(grid_lats), len(grid_lngs)
+    qlng, qlat = np.meshgrid(grid_lngs, grid_lats)
+
+    if method == "kriging" and len(values) >= 3:
+        coarse = settings.KRIGING_RASTER_RESOLUTION
+        if resolution < coarse:
+            # The kriged field is smooth at this scale: krige a coarser
+            # lattice and bilinearly upsample it to the requested one
+            margin_lat, margin_lng = degrees_for_meters(coarse, (min_lat + max_lat) / 2)
+            padded = (min_lat - margin_lat, min_lng - margin_lng, max_lat + margin_lat, max_lng + margin_lng)
+            krige = build_raster(lngs, lats, values, padded, coarse, k, epoch, method)
+            bands = np.stack([krige.sample_grid(band, grid_lats, grid_lngs) for band in RASTER_BANDS])
+            return WeatherRaster(bands, min_lat, min_lng, step_lat, step_lng, epoch, resolution)
+
+        model = kriging_model(projection_cache.project(lngs, lats))
+        field, variance = model.predict(values, project(qlng, qlat))
+        confidence = kriging_confidence(variance)
+    else:
+        from scipy.spatial import cKDTree  # imported on first use, see app.services.warmup
+
+        stations = projection_cache.project(lngs, lats)
+        queries = projection_cache.project(qlng, qlat)
+        tree = cKDTree(stations)
+        k = min(k, len(stations))
+
+        # Query and weight in chunks: the (cells, k, variables) neighbour
+        # values of the whole base raster would take hundreds of MB
+        field = np.empty((len(queries), values.shape[1]))
+        for start in range(0, len(queries), IDW_CHUNK_CELLS):
+            chunk = slice(start, start + IDW_CHUNK_CELLS)
+            distances, indices = tree.query(queries[chunk], k=k)
+            if k == 1:
+                distances, indices = distances[:, None], indices[:, None]
+            field[chunk] = idw_kernel(values, distances, indices)
+        confidence = np.full(len(queries), settings.IDW_CONFIDENCE)
+
+    bands = np.column_stack([field, confidence]).T
+    return WeatherRaster(
+        bands.reshape(len(RASTER_BANDS), rows, cols),
+        min_lat, min_lng, step_lat, step_lng, epoch, resolution
+    )
+
+
+def apply_canyon_corrections(raster: WeatherRaster) -> WeatherRaster:
+    """Adjust temperature and wind speed in place for street canyon geometry"""
+    grid = morphology_store.get()
+    if grid is None:
+        return raster
+
+    rows, cols = raster.shape
+    features = grid.lookup_lattice(
+        raster.min_lat + np.arange(rows) * raster.step_lat,
+        raster.min_lng + np.arange(cols) * raster.step_lng
+    )
+    temperature, wind_factor = canyon_corrections(
+        features[MORPHOLOGY_FEATURES.index("sky_view_factor")],
+        features[MORPHOLOGY_FEATURES.index("frontal_area_index")]
+    )
+    raster.band("temperature")[:] += temperature
+    raster.band("wind_speed")[:] *= wind_factor
+    return raster
+
+
+def build_pyramid(
+    lngs: np.ndarray,
+    lats: np.ndarray,
+    values: np.ndarray,
+    epoch: str = ""
+) -> WeatherPyramid:
+    """Interpolate the finest raster, correct it for urban canyons and derive the coarser levels"""
+    return WeatherPyramid(apply_canyon_corrections(build_raster(lngs, lats, values, epoch=epoch)))
+
+
+class RasterStore:
+    """
+    Latest Hong Kong raster pyramid, rebuilt when the data epoch changes
+
+    Rebuilds are throttled to one per RASTER_MIN_REBUILD_SECONDS so a
+    steady stream of readings does not keep re-interpolating the base
+    raster; callers should key caches on the returned pyramid's epoch.
+    """
+
+    def __init__(self):
+        self._pyramid: Optional[WeatherPyramid] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, epoch: str) -> bool:
+        if self._pyramid is None:
+            return False
+        if self._pyramid.epoch == epoch:
+            return True
+        return time.monotonic() - self._built_at < settings.RASTER_MIN_REBUILD_SECONDS
+
+    async def get(self, db: AsyncSession) -> Optional[WeatherPyramid]:
+        """Return the current pyramid, rebuilding it from readings if stale"""
+        epoch = data_epochs.epoch(*HK_BOUNDS)
+        if self._fresh(epoch):
+            return self._pyramid
+
+        async with self._lock:
+            if self._fresh(epoch):
+                return self._pyramid
+
+            since = datetime.utcnow() - timedelta(minutes=30)
+            min_lat, min_lng, max_lat, max_lng = HK_BOUNDS
+            stmt = latest_per_sensor(reading_columns(*RASTER_VARIABLES).where(
+                WeatherReading.timestamp >= since,
+                in_cells(WeatherReading.cell_id, *HK_BOUNDS)
+            ))
+            readings = await fetch_columns(db, stmt)
+
+            lngs, lats = readings["lng"], readings["lat"]
+            inside = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+            if not inside.any():
+                return None
+            values = np.column_stack([readings[v][inside] for v in RASTER_VARIABLES])
+
+            with span("interpolate"):
+                self._pyramid = await asyncio.to_thread(
+                    build_pyramid, lngs[inside], lats[inside], np.nan_to_num(values), epoch
+                )
+            self._built_at = time.monotonic()
+            logger.info(
+                f"Rebuilt weather pyramid {self._pyramid.base.shape} from {len(values)} readings"
+            )
+            return self._pyramid
+
+
+raster_store = RasterStore()
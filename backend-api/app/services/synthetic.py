@@ -0,0 +1,116 @@
+"""
+Deterministic synthetic weather field
+
+Used by demo_server (and load tests) as a stand-in for real readings.
+Values are spatially smooth, reproducible for a given seed and time
+bucket, and evaluated for whole arrays of points at once.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional
+import time
+
+import numpy as np
+
+from app.core.geo import project
+
+# Urban heat island centre (Mong Kok)
+HEAT_ISLAND_CENTER = (22.3193, 114.1694)  # lat, lng
+
+# Noise lattice: generously covers Hong Kong, ~2 km between nodes;
+# points outside are clamped to the edge
+NOISE_BOUNDS = (21.9, 113.6, 22.8, 114.7)  # min_lat, min_lng, max_lat, max_lng
+NOISE_STEP_DEG = 0.02
+
+# One noise band per synthetic variable
+NOISE_BANDS = ("temperature", "humidity", "wind_speed", "wind_direction", "rainfall", "uv_index", "pm25")
+
+
+class SyntheticWeatherField:
+    """
+    Smooth synthetic weather for any set of points
+
+    Each time bucket gets its own seeded lattice of unit normal noise,
+    bilinearly interpolated between nodes, on top of deterministic
+    elevation and urban heat island terms. The same (seed, bucket,
+    point) always yields the same weather.
+    """
+
+    def __init__(self, seed: int = 0, bucket_seconds: int = 300, max_buckets: int = 4):
+        self.seed = seed
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self._noise: OrderedDict = OrderedDict()
+        self._center = project(HEAT_ISLAND_CENTER[1], HEAT_ISLAND_CENTER[0])[0]
+
+        min_lat, min_lng, max_lat, max_lng = NOISE_BOUNDS
+        self.rows = int(round((max_lat - min_lat) / NOISE_STEP_DEG)) + 1
+        self.cols = int(round((max_lng - min_lng) / NOISE_STEP_DEG)) + 1
+
+    def bucket(self, timestamp: Optional[float] = None) -> int:
+        return int((time.time() if timestamp is None else timestamp) // self.bucket_seconds)
+
+    def _lattice(self, bucket: int) -> np.ndarray:
+        """(len(NOISE_BANDS), rows, cols) noise for a time bucket, memoized"""
+        noise = self._noise.get(bucket)
+        if noise is None:
+            rng = np.random.default_rng([self.seed, bucket])
+            noise = rng.standard_normal((len(NOISE_BANDS), self.rows, self.cols))
+            self._noise[bucket] = noise
+            if len(self._noise) > self.max_buckets:
+                self._noise.popitem(last=False)
+        else:
+            self._noise.move_to_end(bucket)
+        return noise
+
+    def noise(self, lats: np.ndarray, lngs: np.ndarray, bucket: int) -> np.ndarray:
+        """Bilinearly interpolated noise, shape (len(NOISE_BANDS), *lats.shape)"""
+        r = np.clip((lats - NOISE_BOUNDS[0]) / NOISE_STEP_DEG, 0, self.rows - 1)
+        c = np.clip((lngs - NOISE_BOUNDS[1]) / NOISE_STEP_DEG, 0, self.cols - 1)
+        r0 = np.minimum(r.astype(np.intp), self.rows - 2)
+        c0 = np.minimum(c.astype(np.intp), self.cols - 2)
+        fr, fc = r - r0, c - c0
+
+        lattice = self._lattice(bucket)
+        top = lattice[:, r0, c0] * (1 - fc) + lattice[:, r0, c0 + 1] * fc
+        bottom = lattice[:, r0 + 1, c0] * (1 - fc) + lattice[:, r0 + 1, c0 + 1] * fc
+        return top * (1 - fr) + bottom * fr
+
+    def evaluate(
+        self,
+        lats,
+        lngs,
+        elevations=50.0,
+        timestamp: Optional[float] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Weather variables for broadcastable lat/lng/elevation arrays
+
+        Matches the ranges of the previous random demo values:
+        temperature ~24 degC, humidity ~70 %, PM2.5 ~35 ug/m3.
+        """
+
+        lats, lngs, elevations = np.broadcast_arrays(
+            np.asarray(lats, dtype=np.float64),
+            np.asarray(lngs, dtype=np.float64),
+            np.asarray(elevations, dtype=np.float64)
+        )
+        n = dict(zip(NOISE_BANDS, self.noise(lats, lngs, self.bucket(timestamp))))
+
+        # Elevation lapse rate (~0.6 degC per 100 m) and urban heat island
+        # (cooler away from downtown, ~2 degC per 111 km)
+        offsets = project(lngs, lats) - self._center
+        dist_km = np.hypot(offsets[:, 0], offsets[:, 1]).reshape(lats.shape) / 1000
+        temperature = 24.0 + 1.2 * n["temperature"] - (elevations / 100) * 0.6 - dist_km * 0.018
+        humidity = 70.0 + 6.0 * n["humidity"] - (elevations / 100) * 2
+
+        return {
+            "temperature": temperature,
+            "humidity": np.clip(humidity, 20, 100),
+            "pressure": 1013.25 - (elevations / 100) * 0.1,
+            "wind_speed": np.maximum(0, 6 + (elevations / 100) * 0.5 + 0.6 * n["wind_speed"]),
+            "wind_direction": (90 + 60 * n["wind_direction"]) % 360,
+            "rainfall": np.clip(2.5 + 1.5 * n["rainfall"], 0, 5),
+            "uv_index": np.clip(np.round(6 + 1.5 * n["uv_index"]), 3, 9),
+            "pm25": np.clip(37.5 + 7.0 * n["pm25"], 5, None),
+        }
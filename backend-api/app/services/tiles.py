@@ -0,0 +1,427 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import io
+import logging
+import math
+import os
+import shutil
+import struct
+import zlib
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.profiling import span
+from app.services.raster import HK_BOUNDS, WeatherRaster
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+
+# Web Mercator extent of one zoom-0 tile in meters
+WEB_MERCATOR_WIDTH = 40075016.685578488
+
+# Map layer name -> weather_hourly column (whitelist, interpolated into SQL)
+VECTOR_LAYERS = {
+    "temperature": "avg_temperature",
+    "humidity": "avg_humidity",
+    "rain": "avg_rainfall",
+    "wind": "avg_wind_speed",
+}
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Return (min_lat, min_lng, max_lat, max_lng) of an XYZ tile"""
+    n = 2 ** z
+
+    def lat_at(row: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (
+        lat_at(y + 1),
+        x / n * 360.0 - 180.0,
+        lat_at(y),
+        (x + 1) / n * 360.0 - 180.0,
+    )
+
+
+def validate_tile(z: int, x: int, y: int):
+    """Raise ValueError for tiles outside the served pyramid"""
+    if not settings.TILE_MIN_ZOOM <= z <= settings.TILE_MAX_ZOOM:
+        raise ValueError(
+            f"Zoom must be between {settings.TILE_MIN_ZOOM} and {settings.TILE_MAX_ZOOM}"
+        )
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError("Tile coordinates out of range")
+
+
+def tiles_covering(
+    bounds: Tuple[float, float, float, float],
+    z: int
+) -> Iterator[Tuple[int, int]]:
+    """Yield (x, y) of every tile at zoom z intersecting bounds"""
+    min_lat, min_lng, max_lat, max_lng = bounds
+    n = 2 ** z
+
+    def col(lng: float) -> int:
+        return int((lng + 180.0) / 360.0 * n)
+
+    def row(lat: float) -> int:
+        lat_rad = math.radians(lat)
+        return int((1 - math.asinh(math.tan(lat_rad)) / math.pi) / 2 * n)
+
+    for x in range(col(min_lng), col(max_lng) + 1):
+        for y in range(row(max_lat), row(min_lat) + 1):
+            yield x, y
+
+
+class TileCache:
+    """
+    LRU cache of encoded tiles with optional on-disk spill
+
+    With a spill directory, tiles evicted from memory are written to disk
+    and promoted back on the next hit; the disk tier is itself bounded
+    and evicts least recently spilled files. File I/O runs in worker
+    threads. Each process spills into its own subdirectory, removed on
+    shutdown; remove_stale_spills() clears those of dead processes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.TILE_CACHE_MAX_ENTRIES,
+        spill_dir: Optional[str] = None,
+        max_disk_entries: int = settings.TILE_DISK_CACHE_MAX_ENTRIES
+    ):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._tiles: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._spilled: "OrderedDict[Hashable, Path]" = OrderedDict()
+        self._spill_root = Path(spill_dir) if spill_dir else None
+        self._spill_dir = self._spill_root / str(os.getpid()) if spill_dir else None
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def _path(self, key: Hashable) -> Path:
+        return self._spill_dir / (hashlib.sha1(repr(key).encode()).hexdigest() + ".tile")
+
+    async def get(self, key: Hashable) -> Optional[bytes]:
+        """Get an encoded tile, marking it recently used"""
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+        path = self._spilled.pop(key, None)
+        if path is not None:
+            tile = await asyncio.to_thread(_take_file, path)
+            if tile is not None:
+                self.disk_hits += 1
+                await self.set(key, tile)
+                return tile
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: Hashable, tile: bytes):
+        """Store an encoded tile, evicting (or spilling) the least recently used"""
+        self._tiles[key] = tile
+        self._tiles.move_to_end(key)
+        evicted = []
+        while len(self._tiles) > self.max_entries:
+            evicted.append(self._tiles.popitem(last=False))
+        if evicted and self._spill_dir is not None:
+            await self._spill(evicted)
+
+    async def _spill(self, tiles: List[Tuple[Hashable, bytes]]):
+        paths = [self._path(key) for key, _ in tiles]
+        try:
+            await asyncio.to_thread(_write_files, self._spill_dir, paths, [tile for _, tile in tiles])
+        except OSError as exc:
+            logger.warning(f"Tile spill failed: {exc}")
+            return
+
+        for (key, _), path in zip(tiles, paths):
+            self._spilled[key] = path
+        stale = []
+        while len(self._spilled) > self.max_disk_entries:
+            stale.append(self._spilled.popitem(last=False)[1])
+        if stale:
+            await asyncio.to_thread(_remove_files, stale)
+
+    def remove_stale_spills(self):
+        """Delete spill directories (and loose files) left by processes no longer running"""
+        if self._spill_root is None or not self._spill_root.is_dir():
+            return
+        removed = 0
+        for path in self._spill_root.iterdir():
+            if path.is_dir() and path.name.isdigit():
+                if path != self._spill_dir and _process_alive(int(path.name)):
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+            elif path.suffix == ".tile":
+                path.unlink(missing_ok=True)
+            else:
+                continue
+            removed += 1
+        if removed:
+            logger.info(f"Removed {removed} stale tile spill entries from {self._spill_root}")
+
+    def remove_spills(self):
+        """Delete this process's spill directory"""
+        self._spilled.clear()
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters"""
+        return {
+            "entries": len(self._tiles),
+            "spilled": len(self._spilled),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+def _take_file(path: Path) -> Optional[bytes]:
+    """Read and delete a spilled tile; None if it is gone"""
+    try:
+        tile = path.read_bytes()
+        path.unlink(missing_ok=True)
+    except OSError:
+        return None
+    return tile
+
+
+def _write_files(directory: Path, paths: List[Path], tiles: List[bytes]):
+    directory.mkdir(parents=True, exist_ok=True)
+    for path, tile in zip(paths, tiles):
+        path.write_bytes(tile)
+
+
+def _remove_files(paths: List[Path]):
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+vector_tile_cache = TileCache()
+raster_tile_cache = TileCache(spill_dir=settings.TILE_CACHE_DIR)
+
+
+def build_lut(
+    stops: List[Tuple[float, Tuple[int, int, int, int]]],
+    size: int = 256
+) -> np.ndarray:
+    """
+    Precompute a (size + 1, 4) RGBA lookup table from colour stops
+
+    Stops are (position in [0, 1], rgba) pairs. The extra last entry is
+    fully transparent and used for cells without data.
+    """
+
+    positions = np.array([p for p, _ in stops])
+    colours = np.array([c for _, c in stops], dtype=np.float64)
+    x = np.linspace(0, 1, size)
+
+    lut = np.zeros((size + 1, 4), dtype=np.uint8)
+    for channel in range(4):
+        lut[:size, channel] = np.round(np.interp(x, positions, colours[:, channel]))
+    return lut
+
+
+# Heatmap layer -> (raster variable, value range, colour LUT)
+HEATMAP_LAYERS = {
+    "temperature": ("temperature", (5.0, 38.0), build_lut([
+        (0.0, (49, 54, 149, 180)),
+        (0.25, (116, 173, 209, 180)),
+        (0.5, (255, 255, 191, 180)),
+        (0.75, (244, 109, 67, 180)),
+        (1.0, (165, 0, 38, 200)),
+    ])),
+    "humidity": ("humidity", (30.0, 100.0), build_lut([
+        (0.0, (255, 255, 204, 120)),
+        (0.5, (65, 182, 196, 170)),
+        (1.0, (12, 44, 132, 200)),
+    ])),
+    "rain": ("rainfall", (0.0, 50.0), build_lut([
+        (0.0, (255, 255, 255, 0)),
+        (0.02, (158, 202, 225, 140)),
+        (0.4, (33, 113, 181, 180)),
+        (1.0, (106, 81, 163, 220)),
+    ])),
+    "wind": ("wind_speed", (0.0, 30.0), build_lut([
+        (0.0, (237, 248, 233, 100)),
+        (0.5, (116, 196, 118, 170)),
+        (1.0, (0, 68, 27, 210)),
+    ])),
+}
+
+RASTER_FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+
+def encode_png(rgba: np.ndarray, level: int = 6) -> bytes:
+    """Encode an (h, w, 4) uint8 array as a PNG without third-party libraries"""
+    height, width, _ = rgba.shape
+
+    scanlines = np.zeros((height, width * 4 + 1), dtype=np.uint8)  # filter byte 0
+    scanlines[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data)) + tag + data
+            + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), level))
+        + chunk(b"IEND", b"")
+    )
+
+
+def encode_tile(rgba: np.ndarray, fmt: str) -> bytes:
+    """Encode RGBA pixels as png or webp"""
+    if fmt == "png":
+        return encode_png(rgba)
+    if fmt == "webp":
+        if not PIL_AVAILABLE:
+            raise ValueError("WebP tiles require Pillow")
+        buffer = io.BytesIO()
+        Image.fromarray(rgba, "RGBA").save(buffer, format="WEBP", quality=80)
+        return buffer.getvalue()
+    raise ValueError(f"Unsupported tile format '{fmt}'")
+
+
+def pixel_centres(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitudes (top to bottom) and longitudes of a tile's pixel centres"""
+    n = 2 ** z
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lngs = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return lats, lngs
+
+
+def render_heatmap_tile(raster: WeatherRaster, layer: str, z: int, x: int, y: int) -> np.ndarray:
+    """Colour a tile of the raster through the layer's LUT"""
+    variable, (low, high), lut = HEATMAP_LAYERS[layer]
+    lats, lngs = pixel_centres(z, x, y)
+    values = raster.sample_grid(variable, lats, lngs)
+
+    size = len(lut) - 1
+    scaled = (values - low) * ((size - 1) / (high - low))
+    index = np.clip(np.nan_to_num(scaled, nan=-1), 0, size - 1).astype(np.intp)
+    index[np.isnan(values)] = size  # transparent
+    return lut[index]
+
+
+def heatmap_tile(raster: WeatherRaster, layer: str, z: int, x: int, y: int, fmt: str) -> bytes:
+    """Render and encode a heatmap tile; CPU-bound, run it in a worker thread"""
+    return encode_tile(render_heatmap_tile(raster, layer, z, x, y), fmt)
+
+
+async def render_zoom_level(
+    raster: WeatherRaster,
+    layer: str,
+    z: int,
+    fmt: str = "png",
+    bounds: Tuple[float, float, float, float] = HK_BOUNDS,
+    cache: TileCache = raster_tile_cache
+) -> int:
+    """Pre-render every tile of a zoom level over bounds into the cache"""
+    count = 0
+    for x, y in tiles_covering(bounds, z):
+        key = (layer, fmt, z, x, y, raster.epoch)
+        if await cache.get(key) is None:
+            await cache.set(key, await asyncio.to_thread(heatmap_tile, raster, layer, z, x, y, fmt))
+        count += 1
+    return count
+
+
+class VectorTileService:
+    """Renders weather layers as Mapbox Vector Tiles with PostGIS"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def render(self, layer: str, z: int, x: int, y: int) -> bytes:
+        """
+        Render the latest hourly aggregates inside a tile
+
+        Aggregate points are snapped to roughly one pixel of a 256 px tile
+        and averaged, so low zoom tiles stay small.
+        """
+
+        column = VECTOR_LAYERS[layer]
+        cell_size = WEB_MERCATOR_WIDTH / (2 ** z) / 256
+
+        stmt = text(f"""
+            WITH bounds AS (
+                SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+            ),
+            latest AS (
+                SELECT DISTINCT ON (grid_location) grid_location, {column} AS value
+                FROM weather_hourly
+                WHERE hour >= :since
+                  AND grid_location && ST_Transform((SELECT geom FROM bounds), 4326)
+                ORDER BY grid_location, hour DESC
+            ),
+            cells AS (
+                SELECT
+                    ST_SnapToGrid(ST_Transform(ST_Force2D(grid_location), 3857), :cell_size) AS geom,
+                    AVG(value) AS value,
+                    COUNT(*) AS stations
+                FROM latest
+                GROUP BY 1
+            ),
+            mvtgeom AS (
+                SELECT
+                    ST_AsMVTGeom(cells.geom, bounds.geom, 4096, 64, true) AS geom,
+                    ROUND(cells.value::numeric, 2)::float8 AS value,
+                    cells.stations
+                FROM cells, bounds
+            )
+            SELECT ST_AsMVT(mvtgeom.*, :layer) FROM mvtgeom
+        """)
+
+        with span("db_query"):
+            result = await self.db.execute(stmt, {
+                "z": z,
+                "x": x,
+                "y": y,
+                "since": datetime.utcnow() - timedelta(hours=settings.TILE_DATA_HOURS),
+                "cell_size": cell_size,
+                "layer": layer,
+            })
+            tile = result.scalar()
+
+        return bytes(tile) if tile else b""
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import asyncio
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-entry bookkeeping (OrderedDict node plus _Entry), added to the
+# measured key and value sizes
+ENTRY_OVERHEAD = 160
+
+
+def estimate_size(obj: Any) -> int:
+    """Approximate bytes held by obj, following tuples, lists and dicts"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+        size += sum(estimate_size(item) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+class TTLCache:
+    """
+    In-process LRU cache bounded in bytes, with per-entry expiry
+
+    Expired entries are dropped when read and by a periodic sweep
+    (`run_expiry`), so memory tracks the live working set rather than
+    every key ever seen. Values should be compact (tuples rather than
+    dicts); sizes are estimated once, on insert.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_bytes: int,
+        max_entries: Optional[int] = None,
+        size_of: Callable[[Any], int] = estimate_size
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size_of = size_of
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> _Entry:
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        return entry
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a live value, marking it recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expired += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting least recently used entries past the limits"""
+        size = self.size_of(key) + self.size_of(value) + ENTRY_OVERHEAD
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = _Entry(value, expires_at, size)
+        self.bytes += size
+
+        while self.bytes > self.max_bytes or (
+            self.max_entries is not None and len(self._entries) > self.max_entries
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evicted += 1
+
+    def delete(self, key: Hashable):
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def expire(self) -> int:
+        """Drop every expired entry; returns how many were removed"""
+        now = time.monotonic()
+        stale = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in stale:
+            self._remove(key)
+        self.expired += len(stale)
+        return len(stale)
+
+    async def run_expiry(self, interval: float):
+        """Sweep expired entries every `interval` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            removed = self.expire()
+            if removed:
+                logger.debug(f"Expired {removed} cache entries, {len(self._entries)} left")
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters and memory use"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
@@ -0,0 +1,117 @@
+"""
+Background warm-up and readiness
+
+Workers accept requests as soon as the app is imported; heavy modules,
+indexes and caches are loaded afterwards by `warm_up.run()`, started
+from the lifespan. `GET /ready` answers 503 until every step has
+succeeded, so load balancers only route to warm workers while `/health`
+keeps reporting liveness. Failed steps (e.g. the database not reachable
+yet) are retried every WARMUP_RETRY_SECONDS.
+"""
+
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import importlib
+import logging
+import time
+
+from app.core.config import settings
+from app.db.database import AsyncReadSessionLocal
+from app.services.buildings import building_cache
+from app.services.location_search import location_search
+from app.services.morphology import morphology_store
+from app.services.raster import raster_store
+
+logger = logging.getLogger(__name__)
+
+
+async def import_modules():
+    """Import WARMUP_MODULES off the event loop; missing ones are only logged"""
+    timings = []
+    for name in settings.WARMUP_MODULES:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except ImportError as e:
+            logger.warning(f"Warm-up module {name} not available: {e}")
+            continue
+        timings.append(f"{name} {(time.perf_counter() - started) * 1000:.0f} ms")
+    if timings:
+        logger.info(f"Warm-up imports: {', '.join(timings)}")
+
+
+async def load_morphology():
+    await asyncio.to_thread(morphology_store.get)
+
+
+async def load_raster():
+    async with AsyncReadSessionLocal() as session:
+        await raster_store.get(session)
+
+
+class WarmUp:
+    """Runs the warm-up steps in order and tracks their status"""
+
+    def __init__(self, steps: Dict[str, Callable[[], Awaitable]]):
+        self.steps = steps
+        self.status: Dict[str, str] = {name: "pending" for name in steps}
+        self.seconds: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return all(status == "ok" for status in self.status.values())
+
+    async def _step(self, name: str) -> bool:
+        self.status[name] = "running"
+        started = time.perf_counter()
+        try:
+            await self.steps[name]()
+        except Exception as e:
+            self.status[name] = "failed"
+            self.errors[name] = str(e)
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            return False
+        self.seconds[name] = time.perf_counter() - started
+        self.status[name] = "ok"
+        self.errors.pop(name, None)
+        return True
+
+    async def run(self):
+        """Run every step, retrying failed ones until all succeed"""
+        self.started = time.perf_counter()
+        while True:
+            for name in self.steps:
+                if self.status[name] != "ok":
+                    await self._step(name)
+            if self.ready:
+                break
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+
+        self.finished = time.perf_counter()
+        steps = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.seconds.items())
+        logger.info(f"Ready after {self.finished - self.started:.1f}s ({steps})")
+
+    def report(self) -> Dict:
+        return {
+            "status": "ready" if self.ready else "warming",
+            "steps": {
+                name: {
+                    "status": status,
+                    **({"seconds": round(self.seconds[name], 3)} if name in self.seconds else {}),
+                    **({"error": self.errors[name]} if name in self.errors else {}),
+                }
+                for name, status in self.status.items()
+            },
+        }
+
+
+warm_up = WarmUp({
+    "modules": import_modules,
+    "morphology": load_morphology,
+    "buildings": building_cache.get,
+    "locations": location_search.load,
+    "raster": load_raster,
+})
@@ -1,22 +1,34 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from geoalchemy2.functions import ST_Distance, ST_MakePoint, ST_SetSRID, ST_Z
-from typing import Optional, List, Dict
+from sqlalchemy import and_
+from geoalchemy2.functions import ST_Z
+from typing import Optional, List, Dict, Sequence, Tuple
 from datetime import datetime, timedelta
 import numpy as np
-from scipy.interpolate import griddata
 
+from app.core.config import settings
+from app.core.geo import degrees_for_meters
+from app.core.locations import NamedLocation
+from app.core.profiling import span
 from app.db.models import WeatherReading, SensorStation, BuildingData
+from app.db.columns import MEASUREMENT_COLUMNS, fetch_columns, latest_per_sensor, optional_float, reading_columns
+from app.db.spatial import in_cells, projected_distance, within_bbox, within_meters
+from app.db.tiers import AGGREGATE_VARIABLES, RAW_TIER, select_tier
 from app.schemas.weather import (
     WeatherResponse, 
     Coordinates, 
     WeatherGridResponse, 
     GridCell,
     GridBounds,
+    DerivedIndices,
     VerticalProfileResponse,
     WeatherLayer
 )
+from app.services import indices
 from app.services.ml_service import MLService
+from app.services.raster import RASTER_BANDS, WeatherPyramid, raster_store
+
+# Values a location comparison can be ordered by
+COMPARISON_SORT_KEYS = (*MEASUREMENT_COLUMNS, "heat_index", "wind_chill", "comfort_index")
 
 
 class WeatherService:
@@ -34,44 +46,41 @@ class WeatherService:
     ) -> Optional[WeatherResponse]:
         """Get current weather for a location"""
         
-        # Create point geometry
         elev = elevation or 0
-        point = ST_SetSRID(ST_MakePoint(lng, lat, elev), 4326)
         
         # Find nearest weather reading (within last 30 minutes)
         since = datetime.utcnow() - timedelta(minutes=30)
         
-        stmt = select(WeatherReading).where(
+        latest = latest_per_sensor(reading_columns(*MEASUREMENT_COLUMNS).add_columns(
+            projected_distance(WeatherReading.location, lng, lat).label("distance")
+        ).where(
             and_(
                 WeatherReading.timestamp >= since,
-                ST_Distance(WeatherReading.location, point) < 5000  # Within 5km
+                within_meters(
+                    WeatherReading.location, lng, lat, settings.CURRENT_RADIUS_METERS,
+                    cell_id=WeatherReading.cell_id
+                )
             )
-        ).order_by(
-            ST_Distance(WeatherReading.location, point)
-        ).limit(10)
+        ))
+        stmt = latest.order_by(latest.selected_columns.distance).limit(10)
         
-        result = await self.db.execute(stmt)
-        readings = result.scalars().all()
+        readings = await fetch_columns(self.db, stmt)
+        count = len(readings["lng"])
         
-        if not readings:
+        if not count:
             return None
         
         # Use ML model to interpolate/predict for exact location
-        if len(readings) >= 3:
-            weather_data = await self.ml_service.interpolate_weather(
-                readings, lat, lng, elev
-            )
+        if count >= 3:
+            with span("interpolate"):
+                weather_data = await self.ml_service.interpolate_weather(
+                    readings, lat, lng, elev
+                )
         else:
             # Use nearest reading
-            reading = readings[0]
             weather_data = {
-                "temperature": reading.temperature,
-                "humidity": reading.humidity,
-                "rainfall": reading.rainfall,
-                "wind_speed": reading.wind_speed,
-                "wind_direction": reading.wind_direction,
-                "pressure": reading.pressure,
-                "uv_index": reading.uv_index
+                name: optional_float(readings[name][0])
+                for name in MEASUREMENT_COLUMNS
             }
         
         return WeatherResponse(
@@ -88,67 +97,186 @@ class WeatherService:
     async def generate_weather_grid(
         self,
         bounds: GridBounds,
-        resolution: int = 100
+        resolution: int = 100,
+        pyramid: Optional[WeatherPyramid] = None
     ) -> WeatherGridResponse:
-        """Generate weather grid for a bounding box"""
+        """
+        Generate weather grid for a bounding box
         
-        # Calculate grid points
-        lat_points = np.arange(bounds.min_lat, bounds.max_lat, resolution / 111000)  # ~111km per degree
-        lng_points = np.arange(bounds.min_lng, bounds.max_lng, resolution / (111000 * np.cos(np.radians(bounds.min_lat))))
+        Cells are read from the precomputed raster pyramid level that best
+        matches the requested resolution within MAX_GRID_SIZE, so the cost
+        does not grow with the size of the box. Callers that tag the
+        response with the pyramid's epoch pass the pyramid they fetched.
+        """
         
         grid_cells: List[GridCell] = []
         
-        # Fetch all readings in the area
-        since = datetime.utcnow() - timedelta(minutes=30)
-        
-        bbox = f"POLYGON(({bounds.min_lng} {bounds.min_lat}, {bounds.max_lng} {bounds.min_lat}, {bounds.max_lng} {bounds.max_lat}, {bounds.min_lng} {bounds.max_lat}, {bounds.min_lng} {bounds.min_lat}))"
-        
-        stmt = select(WeatherReading).where(
-            and_(
-                WeatherReading.timestamp >= since,
-                WeatherReading.location.ST_Within(ST_SetSRID(ST_GeomFromText(bbox), 4326))
+        if pyramid is None:
+            pyramid = await raster_store.get(self.db)
+        if pyramid is None:
+            return WeatherGridResponse(bounds=bounds, resolution=resolution, data=grid_cells)
+        
+        box = (bounds.min_lat, bounds.min_lng, bounds.max_lat, bounds.max_lng)
+        level = pyramid.select_level(box, resolution)
+        lats, lngs, values = level.window(*box)
+        
+        now = datetime.utcnow()
+        temps, humids, rains, winds, confidence = (values[RASTER_BANDS.index(v)] for v in (
+            "temperature", "humidity", "rainfall", "wind_speed", "confidence"
+        ))
+        derived = indices.derived_indices(temps, humids, winds)
+        
+        for i, j in zip(*np.nonzero(~np.isnan(temps))):
+            lat, lng = float(lats[i]), float(lngs[j])
+            weather = WeatherResponse(
+                location=Coordinates(latitude=lat, longitude=lng, elevation=0),
+                timestamp=now,
+                temperature=float(temps[i, j]),
+                humidity=float(humids[i, j]),
+                rainfall=float(rains[i, j]),
+                wind_speed=float(winds[i, j]),
+                wind_direction=None,
+                pressure=None,
+                uv_index=None,
+                elevation=0.0
             )
-        )
-        
-        result = await self.db.execute(stmt)
-        readings = result.scalars().all()
-        
-        if readings:
-            # Interpolate weather data across grid
-            points = np.array([[r.location.x, r.location.y] for r in readings])
-            temps = np.array([r.temperature for r in readings])
-            humidity_vals = np.array([r.humidity for r in readings])
             
-            for lat in lat_points[:20]:  # Limit for demo
-                for lng in lng_points[:20]:
-                    # Interpolate values
-                    temp = griddata(points, temps, (lng, lat), method='linear')
-                    humid = griddata(points, humidity_vals, (lng, lat), method='linear')
-                    
-                    if not np.isnan(temp):
-                        weather = WeatherResponse(
-                            location=Coordinates(latitude=lat, longitude=lng, elevation=0),
-                            timestamp=datetime.utcnow(),
-                            temperature=float(temp),
-                            humidity=float(humid),
-                            rainfall=0.0,
-                            wind_speed=0.0,
-                            elevation=0.0
-                        )
-                        
-                        grid_cells.append(GridCell(
-                            coordinates=Coordinates(latitude=lat, longitude=lng),
-                            weather=weather,
-                            confidence=0.8,
-                            source="interpolated"
-                        ))
+            grid_cells.append(GridCell(
+                coordinates=Coordinates(latitude=lat, longitude=lng),
+                weather=weather,
+                confidence=float(min(1.0, max(0.0, confidence[i, j]))),
+                source="interpolated",
+                indices=DerivedIndices(
+                    heat_index=float(derived["heat_index"][i, j]),
+                    wind_chill=float(derived["wind_chill"][i, j]),
+                    comfort_index=float(derived["comfort_index"][i, j]),
+                    comfort_level=indices.COMFORT_LEVELS[derived["comfort_level"][i, j]][0]
+                )
+            ))
         
         return WeatherGridResponse(
             bounds=bounds,
-            resolution=resolution,
+            resolution=int(level.resolution),
             data=grid_cells
         )
     
+    async def compare_locations(
+        self,
+        targets: Sequence[Tuple[str, NamedLocation]],
+        elevation: float = 0.0,
+        sort: Optional[str] = None,
+        descending: bool = False
+    ) -> List[Dict]:
+        """
+        Current weather and derived indices for many locations at once
+
+        Readings for every target come from one query over the targets'
+        padded bounding box; interpolation and indices are computed for
+        all targets together. Entries keep the target order unless
+        `sort` names a COMPARISON_SORT_KEYS value; targets without
+        readings in range have null weather and sort last.
+        """
+        
+        if not targets:
+            return []
+        
+        lats = np.array([loc.lat for _, loc in targets])
+        lngs = np.array([loc.lng for _, loc in targets])
+        dlat, dlng = degrees_for_meters(settings.CURRENT_RADIUS_METERS, float(np.abs(lats).max()))
+        box = (lats.min() - dlat, lngs.min() - dlng, lats.max() + dlat, lngs.max() + dlng)
+        
+        since = datetime.utcnow() - timedelta(minutes=30)
+        stmt = latest_per_sensor(reading_columns(*MEASUREMENT_COLUMNS).where(
+            and_(
+                WeatherReading.timestamp >= since,
+                in_cells(WeatherReading.cell_id, *box),
+                within_bbox(WeatherReading.location, *box)
+            )
+        ))
+        readings = await fetch_columns(self.db, stmt)
+        
+        with span("interpolate"):
+            weather, counts = await self.ml_service.interpolate_points(readings, lats, lngs, elevation)
+        derived = indices.derived_indices(weather["temperature"], weather["humidity"], weather["wind_speed"])
+        
+        order = np.arange(len(targets))
+        if sort is not None:
+            key = derived[sort] if sort in derived else weather[sort]
+            order = np.argsort(-key if descending else key, kind="stable")
+        
+        now = datetime.utcnow().isoformat()
+        available = (counts > 0) & np.isfinite(weather["temperature"])
+        columns = {name: weather[name].tolist() for name in MEASUREMENT_COLUMNS}
+        derived_columns = {name: values.tolist() for name, values in derived.items()}
+        
+        entries = []
+        for i in order.tolist():
+            key, loc = targets[i]
+            location = {"latitude": loc.lat, "longitude": loc.lng, "elevation": elevation}
+            entry = {
+                "id": key,
+                "name": loc.name or None,
+                "name_zh": loc.name_zh or None,
+                "location": location,
+                "reading_count": int(counts[i]),
+                "weather": None,
+                "indices": None,
+            }
+            if available[i]:
+                entry["weather"] = {
+                    "location": location,
+                    "timestamp": now,
+                    "elevation": elevation,
+                    **{name: optional_float(values[i]) for name, values in columns.items()},
+                }
+                entry["indices"] = {
+                    "heat_index": derived_columns["heat_index"][i],
+                    "wind_chill": derived_columns["wind_chill"][i],
+                    "comfort_index": derived_columns["comfort_index"][i],
+                    "comfort_level": indices.COMFORT_LEVELS[derived_columns["comfort_level"][i]][0],
+                }
+            entries.append(entry)
+        
+        return entries
+    
+    async def get_weather_history(
+        self,
+        lat: float,
+        lng: float,
+        hours: int = 24,
+        limit: int = 1000
+    ) -> List[Dict]:
+        """
+        Weather near a location over the last `hours`, newest first
+        
+        Short ranges return raw readings; longer ones read the coarsest
+        continuous aggregate that still resolves the range (see
+        app.db.tiers), one row per time bucket.
+        """
+        
+        since = datetime.utcnow() - timedelta(hours=hours)
+        tier = select_tier(since)
+        radius = settings.HISTORY_RADIUS_METERS
+        
+        if tier is RAW_TIER:
+            # Plain rows of the needed columns, no ORM objects or geometry
+            stmt = reading_columns("timestamp", *AGGREGATE_VARIABLES, coordinates=False).where(
+                and_(
+                    WeatherReading.timestamp >= since,
+                    within_meters(WeatherReading.location, lng, lat, radius, cell_id=WeatherReading.cell_id)
+                )
+            ).order_by(WeatherReading.timestamp.desc()).limit(limit)
+        else:
+            stmt = tier.history_query(lat, lng, radius, since, limit)
+        
+        with span("db_query"):
+            rows = (await self.db.execute(stmt)).all()
+        
+        return [
+            {"timestamp": timestamp.isoformat(), **dict(zip(AGGREGATE_VARIABLES, values))}
+            for timestamp, *values in rows
+        ]
+    
     async def get_vertical_profile(
         self,
         lat: float,
@@ -214,29 +342,8 @@ class WeatherService:
         
         # Simple laundry index calculation
         # Real implementation would use ML model
-        
-        # Base dry time calculation
-        temp_factor = max(0, (weather.temperature - 15) / 20)  # 0 to 1
-        humid_factor = 1 - (weather.humidity / 100)
-        wind_factor = min(1, weather.wind_speed / 20)
-        
-        # Combined factor
-        dry_factor = (temp_factor * 0.4 + humid_factor * 0.4 + wind_factor * 0.2)
-        
-        # Dry time in minutes (base 180 minutes in poor conditions)
-        dry_time = int(180 * (1 - dry_factor))
-        
-        # Recommendation
-        if dry_time < 60:
-            recommendation = "excellent"
-        elif dry_time < 120:
-            recommendation = "good"
-        elif dry_time < 180:
-            recommendation = "fair"
-        elif dry_time < 300:
-            recommendation = "poor"
-        else:
-            recommendation = "avoid"
+        dry_time = int(indices.laundry_dry_time(weather.temperature, weather.humidity, weather.wind_speed))
+        recommendation = indices.LAUNDRY_RECOMMENDATIONS[indices.laundry_recommendation(dry_time)]
         
         return {
             "location": {"latitude": lat, "longitude": lng},
@@ -264,19 +371,14 @@ class WeatherService:
         if not weather:
             return {"error": "No weather data available"}
         
-        # Mould risk factors
-        humid_risk = (weather.humidity - 60) / 40 if weather.humidity > 60 else 0
-        temp_risk = 1 if 20 <= weather.temperature <= 30 else 0.5
-        ventilation_factor = 1 - min(1, weather.wind_speed / 10)
-        
         # Combined mould risk (0-100)
-        mould_risk = int((humid_risk * 0.5 + temp_risk * 0.3 + ventilation_factor * 0.2) * 100)
+        mould_risk = int(indices.mould_risk(weather.temperature, weather.humidity, weather.wind_speed))
         
         return {
             "location": {"latitude": lat, "longitude": lng},
             "timestamp": datetime.utcnow().isoformat(),
-            "mould_risk_score": min(100, max(0, mould_risk)),
-            "risk_level": "high" if mould_risk > 70 else "medium" if mould_risk > 40 else "low",
+            "mould_risk_score": mould_risk,
+            "risk_level": indices.MOULD_LEVELS[indices.mould_level(mould_risk)],
             "factors": {
                 "humidity": weather.humidity,
                 "temperature": weather.temperature,
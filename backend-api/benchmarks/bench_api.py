@@ -0,0 +1,264 @@
+"""
+Benchmark: API endpoint latency and throughput on synthetic readings
+
+Generates reproducible Hong Kong sensor readings (benchmarks.dataset)
+and drives the app in-process over ASGI: /current, /grid at several
+resolutions, /vertical, /history on the raw and aggregate tiers, the
+laundry and mould indices, plus MLService.interpolate_weather alone.
+Each scenario reports p50/p90/p99 latency from a sequential run and
+throughput from a concurrent one.
+
+With --db fake (default) queries are answered in memory by
+benchmarks.fake_db, so results isolate the Python side. With --db
+postgres the readings are COPYed into weather_readings at DATABASE_URL
+(the aggregate views need a refresh for /history beyond the raw tier)
+and deleted afterwards unless --keep is given. Redis is not
+initialised, so every request misses the cache.
+
+Usage (from backend-api/):
+    python -m benchmarks.bench_api [--db fake|postgres] [--readings 100000]
+        [--requests 200] [--concurrency 8] [--output results.json]
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+import numpy as np
+from scipy.spatial import cKDTree
+
+from app.core.config import settings
+from app.core.geo import degrees_for_meters, project
+from app.db import database
+from app.db.columns import MEASUREMENT_COLUMNS
+from app.main import app
+from app.services.ml_service import MLService
+from benchmarks.dataset import remove_seeded, seed_postgres, synthetic_readings
+from benchmarks.fake_db import FakeDatabase
+from benchmarks.results import environment, summarize
+
+GRID_RESOLUTIONS = (50, 100, 200, 500)
+GRID_BOX_DEGREES = 0.1
+SCENARIOS = (
+    "current", "grid", "vertical", "history_raw", "history_aggregate",
+    "laundry", "mould", "interpolate",
+)
+
+# Query point jitter around a sensor, so requests land where data is
+JITTER_METERS = 300
+
+# One request: (path, query params)
+Request = Tuple[str, Dict[str, float]]
+
+
+class PointSampler:
+    """Random query points near sensors that reported in the last 30 minutes"""
+
+    def __init__(self, readings, rng: np.random.Generator):
+        recent = readings["timestamp"] >= np.datetime64(datetime.utcnow(), "us") - np.timedelta64(30, "m")
+        self.lats, self.lngs = readings["lat"][recent], readings["lng"][recent]
+        self.rng = rng
+
+    def __call__(self) -> Tuple[float, float]:
+        i = self.rng.integers(len(self.lats))
+        dlat, dlng = degrees_for_meters(JITTER_METERS, self.lats[i])
+        return (
+            round(float(self.lats[i] + self.rng.uniform(-dlat, dlat)), 6),
+            round(float(self.lngs[i] + self.rng.uniform(-dlng, dlng)), 6),
+        )
+
+
+def endpoint_scenarios(point: PointSampler, resolutions) -> Dict[str, Callable[[], Request]]:
+    """Scenario name -> generator of random requests"""
+
+    def at(path: str, **params) -> Callable[[], Request]:
+        def request() -> Request:
+            lat, lng = point()
+            return path, {"lat": lat, "lng": lng, **params}
+        return request
+
+    def grid(resolution: int) -> Callable[[], Request]:
+        def request() -> Request:
+            lat, lng = point()
+            half = GRID_BOX_DEGREES / 2
+            return "/api/weather/grid", {
+                "min_lat": lat - half, "max_lat": lat + half,
+                "min_lng": lng - half, "max_lng": lng + half,
+                "resolution": resolution,
+            }
+        return request
+
+    scenarios = {
+        "current": at("/api/weather/current"),
+        "vertical": at("/api/weather/vertical"),
+        "history_raw": at("/api/weather/history", hours=settings.TIER_RAW_MAX_HOURS),
+        "history_aggregate": at("/api/weather/history", hours=72),
+        "laundry": at("/api/weather/laundry-index"),
+        "mould": at("/api/weather/mould-risk"),
+    }
+    for resolution in resolutions:
+        scenarios[f"grid_{resolution}"] = grid(resolution)
+    return scenarios
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    make_request: Callable[[], Request],
+    requests: int,
+    warmup: int,
+    concurrency: int
+) -> Dict:
+    """Sequential latency run, then the same number of requests concurrently"""
+
+    async def send() -> Tuple[float, int]:
+        path, params = make_request()
+        start = time.perf_counter()
+        response = await client.get(path, params=params)
+        return time.perf_counter() - start, response.status_code
+
+    for _ in range(warmup):
+        await send()
+
+    timings, statuses = [], []
+    for _ in range(requests):
+        seconds, status = await send()
+        timings.append(seconds)
+        statuses.append(status)
+    result = summarize(timings, sum(s >= 400 for s in statuses))
+
+    remaining = requests
+
+    async def worker() -> List[Tuple[float, int]]:
+        nonlocal remaining
+        done = []
+        while remaining > 0:
+            remaining -= 1
+            done.append(await send())
+        return done
+
+    start = time.perf_counter()
+    batches = await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    concurrent = [r for batch in batches for r in batch]
+    result["concurrency"] = concurrency
+    result["throughput_rps"] = round(len(concurrent) / elapsed, 1)
+    result["concurrent_p99_ms"] = round(float(np.percentile([s for s, _ in concurrent], 99)) * 1e3, 3)
+    result["errors"] += sum(status >= 400 for _, status in concurrent)
+    result["statuses"] = {str(s): statuses.count(s) for s in sorted(set(statuses))}
+    return result
+
+
+async def run_interpolation(readings, point: PointSampler, method: str, requests: int, warmup: int) -> Dict:
+    """interpolate_weather on the 10 nearest recent readings, as /current passes it"""
+    recent = readings["timestamp"] >= np.datetime64(datetime.utcnow(), "us") - np.timedelta64(30, "m")
+    columns = {name: readings[name][recent] for name in ("lng", "lat", "elevation", *MEASUREMENT_COLUMNS)}
+    tree = cKDTree(project(columns["lng"], columns["lat"]))
+
+    cases = []
+    for _ in range(warmup + requests):
+        lat, lng = point()
+        _, nearest = tree.query(project(lng, lat)[0], k=min(10, len(columns["lng"])))
+        cases.append(({name: values[nearest] for name, values in columns.items()}, lat, lng))
+
+    ml_service = MLService()
+    timings = []
+    for n, (subset, lat, lng) in enumerate(cases):
+        start = time.perf_counter()
+        await ml_service.interpolate_weather(subset, lat, lng, 0.0, method=method)
+        if n >= warmup:
+            timings.append(time.perf_counter() - start)
+    return summarize(timings, 0, elapsed=sum(timings))
+
+
+def print_table(results: Dict[str, Dict]):
+    print(f"{'scenario':<26} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'rps':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(
+            f"{name:<26} {result['p50_ms']:>9.2f} {result['p90_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['throughput_rps']:>9.1f} {result['errors']:>7}"
+        )
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", choices=("fake", "postgres"), default="fake")
+    parser.add_argument("--readings", type=int, default=100_000)
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--grid-resolutions", default=",".join(map(str, GRID_RESOLUTIONS)))
+    parser.add_argument("--method", choices=("idw", "kriging"), default=settings.INTERPOLATION_METHOD)
+    parser.add_argument("--keep", action="store_true", help="leave seeded readings in Postgres")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    selected = set(args.scenarios.split(","))
+    unknown = selected - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    settings.INTERPOLATION_METHOD = args.method
+
+    start = time.perf_counter()
+    readings = synthetic_readings(args.readings, args.sensors, args.hours, args.seed)
+    print(f"Generated {args.readings} readings from {args.sensors} sensors in {time.perf_counter() - start:.1f}s")
+
+    if args.db == "fake":
+        fake = FakeDatabase(readings)
+
+        async def fake_session():
+            yield fake.session()
+
+        app.dependency_overrides[database.get_db] = fake_session
+        app.dependency_overrides[database.get_read_db] = fake_session
+        database.AsyncSessionLocal = database.AsyncReadSessionLocal = fake.session
+    else:
+        async with database.engine.connect() as conn:
+            driver = (await conn.get_raw_connection()).driver_connection
+            start = time.perf_counter()
+            status = await seed_postgres(readings, driver)
+        print(f"Seeded Postgres ({status}) in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(args.seed)
+    point = PointSampler(readings, rng)
+    resolutions = [int(r) for r in args.grid_resolutions.split(",")]
+    scenarios = endpoint_scenarios(point, resolutions)
+
+    results: Dict[str, Dict] = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, make_request in scenarios.items():
+                if name.split("_")[0] in selected or name in selected:
+                    results[name] = await run_endpoint(
+                        client, make_request, args.requests, args.warmup, args.concurrency
+                    )
+        if "interpolate" in selected:
+            for method in ("idw", "kriging"):
+                results[f"interpolate_weather_{method}"] = await run_interpolation(
+                    readings, point, method, args.requests, args.warmup
+                )
+    finally:
+        if args.db == "postgres" and not args.keep:
+            async with database.engine.connect() as conn:
+                await remove_seeded((await conn.get_raw_connection()).driver_connection)
+        await database.dispose_engines()
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(args), "results": results}, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,93 @@
+"""
+Benchmark: fetching readings through the ORM vs the column fast path
+
+Seeds a temporary weather_readings table (it shadows the real one for
+this connection only) and times loading every row as WeatherReading
+objects with WKB coordinate parsing, against `reading_columns` +
+`fetch_columns`. Needs a PostGIS database at DATABASE_URL and shapely
+for the ORM path.
+
+Usage (from backend-api/):
+    python -m benchmarks.bench_fetch [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from geoalchemy2.shape import to_shape
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.db.columns import MEASUREMENT_COLUMNS, fetch_columns, reading_columns
+from app.db.models import WeatherReading
+
+SEED_SQL = """
+CREATE TEMP TABLE weather_readings AS
+SELECT
+    gen_random_uuid() AS id,
+    now() - (n || ' seconds')::interval AS timestamp,
+    ST_SetSRID(ST_MakePoint(
+        113.82 + random() * 0.63, 22.15 + random() * 0.43, random() * 300
+    ), 4326) AS location,
+    18 + random() * 16 AS temperature,
+    50 + random() * 50 AS humidity,
+    random() * 30 AS rainfall,
+    random() * 15 AS wind_speed,
+    random() * 360 AS wind_direction,
+    1000 + random() * 20 AS pressure,
+    random() * 11 AS uv_index,
+    'crowdsourced'::varchar AS source,
+    1.0::double precision AS confidence,
+    'bench-' || (n % 500) AS sensor_id
+FROM generate_series(1, :rows) AS n
+"""
+
+
+async def orm_fetch(db: AsyncSession):
+    """Previous path: ORM objects, then coordinates parsed from WKB"""
+    readings = (await db.execute(select(WeatherReading))).scalars().all()
+    points = [to_shape(r.location) for r in readings]
+    coords = np.array([[p.x, p.y, p.z] for p in points], dtype=np.float64)
+    values = np.array([[getattr(r, c) for c in MEASUREMENT_COLUMNS] for r in readings], dtype=np.float64)
+    return coords, values
+
+
+async def column_fetch(db: AsyncSession):
+    return await fetch_columns(db, reading_columns(*MEASUREMENT_COLUMNS))
+
+
+async def best_of(fn, db, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn(db)
+        timings.append(time.perf_counter() - start)
+        db.expunge_all()
+    return min(timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+    async with AsyncSession(engine) as db:
+        await db.execute(text(SEED_SQL), {"rows": args.rows})
+
+        orm = await best_of(orm_fetch, db, args.repeat)
+        columns = await best_of(column_fetch, db, args.repeat)
+        await db.rollback()
+    await engine.dispose()
+
+    print(f"{'rows':>8} {'orm ms':>10} {'columns ms':>11} {'speedup':>8}")
+    print(f"{args.rows:>8} {orm * 1e3:>10.1f} {columns * 1e3:>11.1f} {orm / columns:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
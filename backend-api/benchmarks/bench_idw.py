@@ -0,0 +1,94 @@
+"""
+Micro-benchmark: IDW interpolation kernel
+
+Compares the previous per-variable Python weighted sums against
+`idw_kernel` at 1, 100 and 10k query points, both with the same
+inverse distance power (IDW_POWER by default).
+
+Usage (from backend-api/):
+    python -m benchmarks.bench_idw [--stations 500] [--repeat 5] [--power 1]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from app.core.config import settings
+from app.core.geo import project
+from app.services.ml_service import idw_kernel
+
+QUERY_COUNTS = (1, 100, 10_000)
+K = 5
+
+
+def legacy_idw(points, temps, humids, rains, winds, targets, power):
+    """Per-query, per-variable Python sums (pre-kernel implementation)"""
+    tree = cKDTree(points)
+    out = []
+    for target in targets:
+        distances, indices = tree.query(target[None, :], k=K)
+        weights = 1 / (distances[0] + 1e-6) ** power
+        weights = weights / weights.sum()
+        out.append((
+            sum(temps[i] * w for i, w in zip(indices[0], weights)),
+            sum(humids[i] * w for i, w in zip(indices[0], weights)),
+            sum(rains[i] * w for i, w in zip(indices[0], weights)),
+            sum(winds[i] * w for i, w in zip(indices[0], weights)),
+        ))
+    return out
+
+
+def kernel_idw(points, values, targets, power):
+    distances, indices = cKDTree(points).query(targets, k=K)
+    return idw_kernel(values, distances, indices, power)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--power", type=float, default=settings.IDW_POWER)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    lngs = rng.uniform(113.82, 114.45, args.stations)
+    lats = rng.uniform(22.15, 22.58, args.stations)
+    elevs = rng.uniform(0, 300, args.stations)
+    values = np.column_stack([
+        rng.uniform(18, 34, args.stations),
+        rng.uniform(50, 100, args.stations),
+        rng.uniform(0, 30, args.stations),
+        rng.uniform(0, 15, args.stations),
+    ])
+    points = np.column_stack([project(lngs, lats), elevs])
+    columns = [list(values[:, v]) for v in range(values.shape[1])]
+
+    print(f"{'queries':>8} {'legacy ms':>11} {'kernel ms':>11} {'speedup':>8}")
+    for count in QUERY_COUNTS:
+        targets = np.column_stack([
+            project(rng.uniform(113.82, 114.45, count), rng.uniform(22.15, 22.58, count)),
+            rng.uniform(0, 300, count),
+        ])
+
+        assert np.allclose(
+            legacy_idw(points, *columns, targets, args.power),
+            kernel_idw(points, values, targets, args.power)
+        ), "kernel and legacy IDW disagree"
+        legacy = best_of(lambda: legacy_idw(points, *columns, targets, args.power), args.repeat)
+        kernel = best_of(lambda: kernel_idw(points, values, targets, args.power), args.repeat)
+        print(f"{count:>8} {legacy * 1e3:>11.3f} {kernel * 1e3:>11.3f} {legacy / kernel:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: pre-rendering heatmap tiles with render_zoom_level
+
+Interpolates a weather pyramid from synthetic Hong Kong stations
+(benchmarks.dataset) and renders every heatmap tile over HK_BOUNDS at
+each zoom level into an empty in-memory TileCache, then once more
+with every tile cached. Reports tile count, cold and warm time, time
+per tile and encoded size.
+
+Usage (from backend-api/):
+    python -m benchmarks.bench_tiles [--zooms 10,11,12,13,14] [--layer temperature]
+        [--format png] [--stations 500]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from app.services.raster import RASTER_VARIABLES, build_pyramid
+from app.services.tiles import HEATMAP_LAYERS, RASTER_FORMATS, TileCache, render_zoom_level
+from benchmarks.dataset import synthetic_readings
+
+
+class MeasuredTileCache(TileCache):
+    """In-memory TileCache that totals the size of the tiles stored"""
+
+    def __init__(self):
+        super().__init__(max_entries=sys.maxsize)
+        self.bytes = 0
+
+    async def set(self, key, tile: bytes):
+        self.bytes += len(tile)
+        await super().set(key, tile)
+
+
+async def timed_render(raster, layer: str, z: int, fmt: str, cache: TileCache):
+    start = time.perf_counter()
+    count = await render_zoom_level(raster, layer, z, fmt, cache=cache)
+    return count, time.perf_counter() - start
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zooms", default="10,11,12,13,14", help="comma-separated zoom levels")
+    parser.add_argument("--layer", default="temperature", choices=sorted(HEATMAP_LAYERS))
+    parser.add_argument("--format", default="png", choices=sorted(RASTER_FORMATS))
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    readings = synthetic_readings(args.stations, args.stations, hours=0.5, seed=args.seed)
+    values = np.nan_to_num(np.column_stack([readings[v] for v in RASTER_VARIABLES]))
+    start = time.perf_counter()
+    raster = build_pyramid(readings["lng"], readings["lat"], values, epoch="bench").base
+    print(f"Built {raster.shape} raster from {args.stations} stations in {time.perf_counter() - start:.2f} s")
+
+    print(f"{'zoom':>4} {'tiles':>7} {'cold s':>8} {'ms/tile':>8} {'warm ms':>8} {'KiB':>9}")
+    for z in (int(z) for z in args.zooms.split(",")):
+        cache = MeasuredTileCache()
+        count, cold = await timed_render(raster, args.layer, z, args.format, cache)
+        _, warm = await timed_render(raster, args.layer, z, args.format, cache)
+        print(
+            f"{z:>4} {count:>7} {cold:>8.2f} {cold / count * 1e3:>8.2f} "
+            f"{warm * 1e3:>8.1f} {cache.bytes / 1024:>9.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,135 @@
+"""
+Synthetic Hong Kong sensor readings for benchmarks
+
+Sensors are scattered over HK_BOUNDS at ground to high-rise elevations
+and report round-robin over the last `hours`, so every sensor has a
+reading within any window longer than its reporting interval. Values
+come from the seeded SyntheticWeatherField plus per-reading noise, so
+a given (count, sensors, hours, seed) is reproducible.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from app.core.geo import HK_BOUNDS
+from app.db.columns import Columns, MEASUREMENT_COLUMNS
+from app.services.synthetic import SyntheticWeatherField
+
+# Rows tagged with this sensor_id prefix are removed after a benchmark
+SENSOR_PREFIX = "bench-"
+
+# Per-reading sensor noise added to the smooth field
+NOISE = {"temperature": 0.3, "humidity": 2.0, "wind_speed": 0.5, "pressure": 0.5}
+
+STAGING_SQL = """
+CREATE TEMP TABLE bench_staging (
+    timestamp TIMESTAMPTZ,
+    lng DOUBLE PRECISION,
+    lat DOUBLE PRECISION,
+    elevation DOUBLE PRECISION,
+    temperature DOUBLE PRECISION,
+    humidity DOUBLE PRECISION,
+    rainfall DOUBLE PRECISION,
+    wind_speed DOUBLE PRECISION,
+    wind_direction DOUBLE PRECISION,
+    pressure DOUBLE PRECISION,
+    uv_index DOUBLE PRECISION,
+    sensor_id TEXT
+) ON COMMIT DROP
+"""
+
+INSERT_SQL = """
+INSERT INTO weather_readings (
+    timestamp, location, temperature, humidity, rainfall, wind_speed,
+    wind_direction, pressure, uv_index, source, confidence, sensor_id
+)
+SELECT
+    timestamp, ST_SetSRID(ST_MakePoint(lng, lat, elevation), 4326), temperature,
+    humidity, rainfall, wind_speed, wind_direction, pressure, uv_index,
+    'crowdsourced', 0.8, sensor_id
+FROM bench_staging
+"""
+
+STAGING_COLUMNS = (
+    "timestamp", "lng", "lat", "elevation", *MEASUREMENT_COLUMNS, "sensor_id",
+)
+
+
+def synthetic_readings(
+    count: int,
+    sensors: int,
+    hours: float = 24.0,
+    seed: int = 0,
+    now: Optional[datetime] = None
+) -> Columns:
+    """
+    `count` readings as fetch_columns-style arrays, oldest first
+
+    Includes "timestamp" (datetime64[us], naive UTC) and "sensor_id"
+    besides the coordinate and measurement columns.
+    """
+
+    rng = np.random.default_rng(seed)
+    now = now or datetime.utcnow()
+    sensors = max(1, min(sensors, count))
+
+    min_lat, min_lng, max_lat, max_lng = HK_BOUNDS
+    sensor_lats = rng.uniform(min_lat, max_lat, sensors)
+    sensor_lngs = rng.uniform(min_lng, max_lng, sensors)
+    sensor_elevs = np.round(rng.exponential(30, sensors).clip(0, 300), 1)
+
+    sensor = np.arange(count) % sensors
+    span = np.timedelta64(int(hours * 3600e6), "us")
+    start = np.datetime64(now - timedelta(hours=hours), "us")
+    timestamps = start + (np.arange(1, count + 1) * (span / count)).astype("timedelta64[us]")
+
+    lats, lngs, elevs = sensor_lats[sensor], sensor_lngs[sensor], sensor_elevs[sensor]
+    columns: Columns = {name: np.empty(count) for name in MEASUREMENT_COLUMNS}
+
+    field = SyntheticWeatherField(seed=seed)
+    epoch_seconds = (timestamps - np.datetime64(0, "s")) / np.timedelta64(1, "s")
+    buckets = (epoch_seconds // field.bucket_seconds).astype(np.int64)
+    for bucket in np.unique(buckets):
+        rows = np.flatnonzero(buckets == bucket)
+        values = field.evaluate(lats[rows], lngs[rows], elevs[rows], timestamp=bucket * field.bucket_seconds)
+        for name in MEASUREMENT_COLUMNS:
+            columns[name][rows] = values[name]
+
+    for name, scale in NOISE.items():
+        columns[name] += rng.normal(0, scale, count)
+    columns["humidity"] = columns["humidity"].clip(0, 100)
+    columns["wind_speed"] = columns["wind_speed"].clip(0, None)
+
+    return {
+        "timestamp": timestamps,
+        "lng": lngs,
+        "lat": lats,
+        "elevation": elevs,
+        **columns,
+        "sensor_id": np.char.add(SENSOR_PREFIX, sensor.astype(str)),
+    }
+
+
+async def copy_readings(readings: Columns, driver) -> str:
+    """COPY readings into weather_readings through an asyncpg connection"""
+    timestamps = readings["timestamp"].astype(datetime).tolist()
+    columns = [timestamps] + [readings[name].tolist() for name in STAGING_COLUMNS[1:]]
+    async with driver.transaction():
+        await driver.execute("SET LOCAL statement_timeout = 0")
+        await driver.execute(STAGING_SQL)
+        await driver.copy_records_to_table("bench_staging", records=zip(*columns), columns=STAGING_COLUMNS)
+        return await driver.execute(INSERT_SQL)
+
+
+async def seed_postgres(readings: Columns, driver) -> str:
+    """copy_readings, then refresh planner statistics"""
+    status = await copy_readings(readings, driver)
+    await driver.execute("ANALYZE weather_readings")
+    return status
+
+
+async def remove_seeded(driver) -> str:
+    """Delete every reading written with SENSOR_PREFIX sensor ids"""
+    return await driver.execute(f"DELETE FROM weather_readings WHERE sensor_id LIKE '{SENSOR_PREFIX}%'")
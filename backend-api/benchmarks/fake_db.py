@@ -0,0 +1,223 @@
+"""
+In-process stand-in for the database, for benchmarking the API alone
+
+FakeDatabase answers the SELECTs the weather endpoints issue against
+weather_readings and the tier views from in-memory synthetic readings.
+It reads the filters off the SQLAlchemy statement rather than the SQL
+text: the time bound, the ST_MakeEnvelope bbox, the ST_DWithin radius
+around its ST_MakePoint, ORDER BY distance or time, LIMIT, GROUP BY
+bucket on the aggregate views, and the DISTINCT ON (sensor) subquery of
+latest_per_sensor. Other tables (building_data, sensor
+stations) come back empty.
+
+Timings against it cover routing, validation, interpolation and
+serialization, not query planning or I/O.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.sql import Select, Subquery, operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, UnaryExpression
+from sqlalchemy.sql.functions import FunctionElement
+
+from app.core.geo import project
+from app.db.columns import Columns
+from app.db.tiers import AGGREGATE_VARIABLES, TIERS
+
+# Views of weather_readings: relation -> bucket width (None for raw rows)
+RELATIONS = {tier.relation: tier.bucket for tier in TIERS}
+TIME_COLUMNS = {tier.time_column for tier in TIERS}
+
+
+class FakeResult:
+    def __init__(self, keys: List[str], rows: List[tuple]):
+        self._keys = keys
+        self._rows = rows
+
+    def keys(self) -> List[str]:
+        return self._keys
+
+    def all(self) -> List[tuple]:
+        return self._rows
+
+    def scalar(self) -> Any:
+        return self._rows[0][0] if self._rows else None
+
+    def scalars(self) -> "FakeResult":
+        return FakeResult(self._keys[:1], [row[0] for row in self._rows])
+
+
+class FakeSession:
+    """The AsyncSession surface the endpoints use"""
+
+    def __init__(self, database: "FakeDatabase"):
+        self.database = database
+
+    async def execute(self, stmt, params: Optional[dict] = None) -> FakeResult:
+        return self.database.execute(stmt)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def expunge_all(self):
+        pass
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+def _value(clause) -> Any:
+    return clause.value if isinstance(clause, BindParameter) else None
+
+
+def _arguments(function: FunctionElement) -> List[Any]:
+    return [_value(arg) for arg in function.clauses.clauses]
+
+
+class _Query:
+    """
+    Filters, ordering and limit recovered from a SELECT
+
+    For a latest_per_sensor select, filters come from the DISTINCT ON
+    subquery and ordering and limit from the outer select.
+    """
+
+    def __init__(self, stmt: Select):
+        self.since = self.until = self.bbox = self.centre = self.radius = None
+        self.by_distance = self.descending = False
+        self.limit = _value(stmt._limit_clause) if stmt._limit_clause is not None else None
+
+        subquery = next((f for f in stmt.get_final_froms() if isinstance(f, Subquery)), None)
+        self.latest = subquery is not None
+        self.inner = subquery.element if subquery is not None else stmt
+
+        if self.inner.whereclause is not None:
+            for element in visitors.iterate(self.inner.whereclause):
+                self._visit(element)
+
+        for clause in stmt._order_by_clauses:
+            if isinstance(clause, UnaryExpression) and clause.modifier is operators.desc_op:
+                self.descending = True
+            for element in visitors.iterate(clause):
+                if isinstance(element, FunctionElement) and element.name.lower() == "st_distance":
+                    self.by_distance = True
+                    self._visit_points(element)
+                elif self.latest and getattr(element, "name", None) == "distance":
+                    self.by_distance = True
+
+    def _visit(self, element):
+        if isinstance(element, FunctionElement):
+            name = element.name.lower()
+            if name == "st_makeenvelope":
+                self.bbox = _arguments(element)[:4]
+            elif name == "st_dwithin":
+                self.radius = _value(element.clauses.clauses[2])
+                self._visit_points(element)
+        elif (
+            isinstance(element, BinaryExpression)
+            and getattr(element.left, "name", None) in TIME_COLUMNS
+            and isinstance(element.right, BindParameter)
+        ):
+            if element.operator in (operators.ge, operators.gt):
+                self.since = element.right.value
+            elif element.operator in (operators.lt, operators.le):
+                self.until = element.right.value
+
+    def _visit_points(self, function: FunctionElement):
+        for element in visitors.iterate(function):
+            if isinstance(element, FunctionElement) and element.name.lower() == "st_makepoint":
+                self.centre = _arguments(element)[:2]
+
+
+class FakeDatabase:
+    """
+    Synthetic readings (see benchmarks.dataset) served as query results
+
+    Readings must be sorted by timestamp; time bounds are one binary
+    search, the spatial filters vectorized masks over that slice.
+    """
+
+    def __init__(self, readings: Columns):
+        self.readings = readings
+        self.statements = 0
+
+    def session(self) -> FakeSession:
+        return FakeSession(self)
+
+    def execute(self, stmt) -> FakeResult:
+        self.statements += 1
+        if not isinstance(stmt, Select):
+            return FakeResult([], [])
+
+        keys = [column.name for column in stmt.selected_columns]
+        query = _Query(stmt)
+        relations = {getattr(f, "name", None) for f in query.inner.get_final_froms()}
+        relation = next((r for r in relations if r in RELATIONS), None)
+        if relation is None:
+            return FakeResult(keys, [])
+
+        rows = self._matching(query)
+        bucket = RELATIONS[relation]
+        if bucket is None:
+            if query.latest:
+                rows = self._latest(rows)
+            if query.by_distance and query.centre:
+                rows = rows[np.argsort(self._distances(rows, *query.centre), kind="stable")]
+            elif query.descending:
+                rows = rows[::-1]
+            columns = {
+                key: self._distances(rows, *query.centre) if key == "distance" else self.readings[key][rows]
+                for key in keys
+            }
+        else:
+            columns = self._bucketed(rows, bucket.total_seconds())
+            if query.descending:
+                columns = {key: values[::-1] for key, values in columns.items()}
+
+        values = [columns[key][:query.limit].tolist() for key in keys]
+        return FakeResult(keys, list(zip(*values)))
+
+    def _matching(self, query: _Query) -> np.ndarray:
+        """Indices of readings passing the time and spatial filters, oldest first"""
+        timestamps = self.readings["timestamp"]
+        lo = np.searchsorted(timestamps, np.datetime64(query.since, "us")) if query.since else 0
+        hi = np.searchsorted(timestamps, np.datetime64(query.until, "us")) if query.until else len(timestamps)
+        rows = np.arange(lo, hi)
+
+        if query.bbox:
+            min_lng, min_lat, max_lng, max_lat = query.bbox
+            lngs, lats = self.readings["lng"][rows], self.readings["lat"][rows]
+            rows = rows[(lngs >= min_lng) & (lngs <= max_lng) & (lats >= min_lat) & (lats <= max_lat)]
+        if query.radius is not None and query.centre:
+            rows = rows[self._distances(rows, *query.centre) <= query.radius]
+        return rows
+
+    def _latest(self, rows: np.ndarray) -> np.ndarray:
+        """The newest of rows per sensor, oldest first"""
+        _, last = np.unique(self.readings["sensor_id"][rows][::-1], return_index=True)
+        return np.sort(rows[len(rows) - 1 - last])
+
+    def _distances(self, rows: np.ndarray, lng: float, lat: float) -> np.ndarray:
+        xy = project(self.readings["lng"][rows], self.readings["lat"][rows])
+        return np.hypot(*(xy - project(lng, lat)[0]).T)
+
+    def _bucketed(self, rows: np.ndarray, seconds: float) -> Dict[str, np.ndarray]:
+        """Per-bucket averages of rows, oldest bucket first"""
+        step = int(seconds)
+        buckets = self.readings["timestamp"][rows].astype("datetime64[s]").astype(np.int64) // step
+        starts, inverse = np.unique(buckets, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(starts))
+        columns = {"timestamp": (starts * step).astype("datetime64[s]").astype("datetime64[us]")}
+        for name in AGGREGATE_VARIABLES:
+            columns[name] = np.bincount(inverse, self.readings[name][rows], len(starts)) / counts
+        return columns
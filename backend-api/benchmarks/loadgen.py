@@ -0,0 +1,428 @@
+"""
+Load generator: simulated crowdsourced sensor network
+
+Simulates --devices crowdsourced devices scattered over Hong Kong that
+together report --rate readings per second. Each device has its own
+noise level and a calibration bias drifting as a random walk; devices
+drop offline for a while, keep what they measured meanwhile and upload
+it in one burst when they reconnect (some lose it instead), and a
+--faulty share of readings carry an implausible spike.
+
+Readings are POSTed to /api/sensors/readings at --url (or to the app
+in-process with --in-process), or with --mode copy written straight
+into weather_readings at DATABASE_URL. Every --probe-interval seconds a
+probe reading with a marker temperature is sent at a fresh location and
+/current is polled there until it reports the marker, which gives the
+end-to-end lag from submission to visibility. Poll coordinates differ
+by a fraction of a millimetre so response caches are bypassed.
+
+Usage (from backend-api/):
+    python -m benchmarks.loadgen [--url http://localhost:8000] [--mode http|copy]
+        [--devices 2000] [--rate 500] [--duration 60] [--batch 1] [--output load.json]
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+import numpy as np
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.geo import HK_BOUNDS
+from app.db.columns import Columns, MEASUREMENT_COLUMNS
+from app.services.ingest import PLAUSIBLE_RANGES
+from app.services.synthetic import SyntheticWeatherField
+from benchmarks.dataset import NOISE, SENSOR_PREFIX, copy_readings, remove_seeded
+from benchmarks.results import environment, summarize
+
+READINGS_PATH = "/api/sensors/readings"
+CURRENT_PATH = "/api/weather/current"
+
+TICK_SECONDS = 0.1
+REPORT_SECONDS = 5.0
+
+# Device behaviour
+MEAN_ONLINE_SECONDS = 600.0
+MEAN_OFFLINE_SECONDS = 120.0
+BACKLOG_LOSS = 0.3  # share of dropouts whose readings are never uploaded
+MAX_BACKLOG = 50  # readings a device keeps while offline
+DRIFT_PER_HOUR = {"temperature": 0.5, "humidity": 3.0, "pressure": 1.0}  # random walk scale
+DEVICE_TYPES = ("bluetooth-thermometer", "weather-station", "smartphone")
+
+# Probe marker temperatures, well above the simulated field
+MARKER_RANGE = (50.0, 59.0)
+MARKER_TOLERANCE = 0.05
+POLL_OFFSET_DEG = 1e-9
+
+
+class DeviceFleet:
+    """State of every simulated device, advanced one tick at a time"""
+
+    def __init__(self, count: int, seed: int = 0, faulty: float = 0.0):
+        self.count = count
+        self.faulty = faulty
+        self.rng = np.random.default_rng(seed)
+        self.field = SyntheticWeatherField(seed=seed)
+
+        min_lat, min_lng, max_lat, max_lng = HK_BOUNDS
+        self.lats = self.rng.uniform(min_lat, max_lat, count)
+        self.lngs = self.rng.uniform(min_lng, max_lng, count)
+        self.elevations = np.round(self.rng.exponential(30, count).clip(0, 300), 1)
+        self.sensor_ids = np.char.add(f"{SENSOR_PREFIX}device-", np.arange(count).astype(str))
+        self.device_types = self.rng.integers(len(DEVICE_TYPES), size=count)
+        self.accuracy = np.round(self.rng.uniform(0.5, 0.95, count), 2)
+
+        # Per-device noise multiplier and drifting calibration bias
+        self.quality = self.rng.lognormal(0, 0.5, count)
+        self.bias = {name: self.rng.normal(0, scale, count) for name, scale in DRIFT_PER_HOUR.items()}
+
+        self.online = np.ones(count, dtype=bool)
+        self.offline_since = np.zeros(count)
+        self.offline_until = np.zeros(count)
+        self.keeps_backlog = np.ones(count, dtype=bool)
+        self.backlog = np.zeros(count, dtype=np.int64)
+
+    def step(self, now: float, dt: float, rate: float) -> Optional[Columns]:
+        """Readings uploaded during the dt seconds up to `now` (epoch seconds)"""
+        rng = self.rng
+        for name, scale in DRIFT_PER_HOUR.items():
+            self.bias[name] += rng.normal(0, scale * np.sqrt(dt / 3600), self.count)
+
+        # Reconnecting devices upload their backlog, spread over the time offline
+        back = np.flatnonzero(~self.online & (self.offline_until <= now))
+        self.online[back] = True
+        burst = np.repeat(back, self.backlog[back])
+        burst_times = rng.uniform(self.offline_since[burst], now)
+        self.backlog[back] = 0
+
+        dropped = np.flatnonzero(self.online & (rng.random(self.count) < dt / MEAN_ONLINE_SECONDS))
+        self.online[dropped] = False
+        self.offline_since[dropped] = now
+        self.offline_until[dropped] = now + rng.exponential(MEAN_OFFLINE_SECONDS, len(dropped))
+        self.keeps_backlog[dropped] = rng.random(len(dropped)) >= BACKLOG_LOSS
+
+        due = rng.integers(self.count, size=rng.poisson(rate * dt))
+        offline = due[~self.online[due] & self.keeps_backlog[due]]
+        np.add.at(self.backlog, offline, 1)
+        np.minimum(self.backlog, MAX_BACKLOG, out=self.backlog)
+
+        devices = np.concatenate([due[self.online[due]], burst])
+        if not len(devices):
+            return None
+        times = np.concatenate([np.full(len(devices) - len(burst), now), burst_times])
+        return self.readings(devices, times, now)
+
+    def readings(self, devices: np.ndarray, times: np.ndarray, now: float) -> Columns:
+        n = len(devices)
+        lats, lngs, elevations = self.lats[devices], self.lngs[devices], self.elevations[devices]
+        values = self.field.evaluate(lats, lngs, elevations, timestamp=now)
+
+        columns: Columns = {}
+        for name in MEASUREMENT_COLUMNS:
+            column = np.broadcast_to(values[name], (n,)).astype(np.float64)
+            if name in self.bias:
+                column = column + self.bias[name][devices]
+            if name in NOISE:
+                column = column + self.rng.normal(0, NOISE[name], n) * self.quality[devices]
+            low, high = PLAUSIBLE_RANGES[name]
+            columns[name] = column.clip(low, high)
+
+        spikes = self.rng.random(n) < self.faulty
+        columns["temperature"][spikes] += 80.0
+
+        return {
+            "timestamp": (times * 1e6).astype(np.int64).astype("datetime64[us]"),
+            "lng": lngs,
+            "lat": lats,
+            "elevation": elevations,
+            **columns,
+            "sensor_id": self.sensor_ids[devices],
+            "device_type": self.device_types[devices],
+            "accuracy": self.accuracy[devices],
+        }
+
+
+def sensor_payloads(readings: Columns) -> List[Dict]:
+    """SensorReading request bodies for a batch of readings"""
+    timestamps = readings["timestamp"].astype(datetime).tolist()
+    rows = zip(*(readings[name].tolist() for name in (
+        "sensor_id", "lat", "lng", "elevation", "device_type", "accuracy", *MEASUREMENT_COLUMNS
+    )))
+    return [
+        {
+            "sensor_id": sensor_id,
+            "location": {"latitude": lat, "longitude": lng, "elevation": elevation},
+            "timestamp": timestamp.isoformat() + "Z",
+            "readings": dict(zip(MEASUREMENT_COLUMNS, values)),
+            "device_type": DEVICE_TYPES[device_type],
+            "accuracy": accuracy,
+        }
+        for timestamp, (sensor_id, lat, lng, elevation, device_type, accuracy, *values)
+        in zip(timestamps, rows)
+    ]
+
+
+class LoadStats:
+    def __init__(self):
+        self.offered = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.failed = 0  # readings in failed requests
+        self.requests = 0
+        self.errors: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.lags: List[float] = []
+        self.probes = 0
+        self.probes_not_visible = 0
+
+    def error(self, kind: str, readings: int):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+        self.failed += readings
+
+    def progress(self, elapsed: float) -> str:
+        lag = f"{np.percentile(self.lags, 50) * 1e3:.0f} ms" if self.lags else "-"
+        return (
+            f"{elapsed:7.1f}s  offered {self.offered / elapsed:8.1f}/s  "
+            f"accepted {self.accepted / elapsed:8.1f}/s  errors {sum(self.errors.values()):5d}  "
+            f"lag p50 {lag}"
+        )
+
+    def summary(self, elapsed: float, target_rate: float) -> Dict:
+        requests = max(self.requests, 1)
+        result = {
+            "duration_s": round(elapsed, 2),
+            "target_rps": target_rate,
+            "offered_rps": round(self.offered / elapsed, 1),
+            "achieved_rps": round(self.accepted / elapsed, 1),
+            "offered": self.offered,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(sum(self.errors.values()) / requests, 4),
+            "probes": self.probes,
+            "probes_not_visible": self.probes_not_visible,
+        }
+        if self.latencies:
+            result["request_latency"] = summarize(self.latencies, sum(self.errors.values()))
+        if self.lags:
+            lags = summarize(self.lags, self.probes_not_visible)
+            result["lag"] = {key: value for key, value in lags.items() if key.endswith("_ms")}
+        return result
+
+
+class HttpSink:
+    """POSTs readings in batches, at most `concurrency` requests in flight"""
+
+    def __init__(self, client: httpx.AsyncClient, stats: LoadStats, batch: int, concurrency: int):
+        self.client = client
+        self.stats = stats
+        self.batch = batch
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending: Set[asyncio.Task] = set()
+
+    async def send(self, readings: Columns):
+        payloads = sensor_payloads(readings)
+        for start in range(0, len(payloads), self.batch):
+            chunk = payloads[start:start + self.batch]
+            await self._slots.acquire()
+            task = asyncio.create_task(self._post(chunk[0] if self.batch == 1 else chunk, len(chunk)))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _post(self, body, count: int):
+        stats = self.stats
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(READINGS_PATH, json=body)
+            stats.requests += 1
+            stats.latencies.append(time.perf_counter() - start)
+            if response.status_code == 202:
+                result = response.json()
+                stats.accepted += result["accepted"]
+                stats.rejected += result["rejected"]
+            else:
+                stats.error(str(response.status_code), count)
+        except httpx.HTTPError as e:
+            stats.requests += 1
+            stats.error(type(e).__name__, count)
+        finally:
+            self._slots.release()
+
+    async def drain(self):
+        await asyncio.gather(*self._pending)
+
+
+class CopySink:
+    """Writes each tick's readings with one COPY, bypassing the API"""
+
+    def __init__(self, driver, stats: LoadStats):
+        self.driver = driver
+        self.stats = stats
+        self._lock = asyncio.Lock()
+
+    async def send(self, readings: Columns):
+        count = len(readings["lng"])
+        start = time.perf_counter()
+        async with self._lock:
+            try:
+                status = await copy_readings(readings, self.driver)
+            except Exception as e:
+                self.stats.requests += 1
+                self.stats.error(type(e).__name__, count)
+                return
+        self.stats.requests += 1
+        self.stats.latencies.append(time.perf_counter() - start)
+        self.stats.accepted += int(status.split()[-1])
+
+    async def drain(self):
+        pass
+
+
+class LagProbe:
+    """Sends marker readings and times how long until /current reports them"""
+
+    def __init__(self, fleet: DeviceFleet, sink, client: httpx.AsyncClient, stats: LoadStats, timeout: float, poll: float):
+        self.fleet = fleet
+        self.sink = sink
+        self.client = client
+        self.stats = stats
+        self.timeout = timeout
+        self.poll = poll
+        self.rng = np.random.default_rng(fleet.count)
+        self._pending: Set[asyncio.Task] = set()
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            task = asyncio.create_task(self.probe())
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def probe(self):
+        self.stats.probes += 1
+        device = self.rng.integers(self.fleet.count)
+        now = time.time()
+        readings = self.fleet.readings(np.array([device]), np.array([now]), now)
+        min_lat, min_lng, max_lat, max_lng = HK_BOUNDS
+        lat, lng = self.rng.uniform(min_lat, max_lat), self.rng.uniform(min_lng, max_lng)
+        marker = round(float(self.rng.uniform(*MARKER_RANGE)), 3)
+        readings.update({
+            "lat": np.array([lat]), "lng": np.array([lng]), "elevation": np.zeros(1),
+            "temperature": np.array([marker]),
+            "sensor_id": np.array([f"{SENSOR_PREFIX}probe-{self.stats.probes}"]),
+        })
+
+        start = time.perf_counter()
+        await self.sink.send(readings)
+        polls = 0
+        while time.perf_counter() - start < self.timeout:
+            polls += 1
+            params = {"lat": lat + polls * POLL_OFFSET_DEG, "lng": lng, "elevation": 0}
+            try:
+                response = await self.client.get(CURRENT_PATH, params=params)
+                if response.status_code == 200 and abs(response.json()["temperature"] - marker) < MARKER_TOLERANCE:
+                    self.stats.lags.append(time.perf_counter() - start)
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(self.poll)
+        self.stats.probes_not_visible += 1
+
+    async def drain(self):
+        await asyncio.gather(*self._pending)
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="drive the app over ASGI instead of --url")
+    parser.add_argument("--mode", choices=("http", "copy"), default="http")
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500.0, help="target readings per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--batch", type=int, default=1, help="readings per request")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight")
+    parser.add_argument("--faulty", type=float, default=0.01, help="share of implausible readings")
+    parser.add_argument("--probe-interval", type=float, default=2.0, help="seconds, 0 disables lag probes")
+    parser.add_argument("--probe-timeout", type=float, default=30.0)
+    parser.add_argument("--probe-poll", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cleanup", action="store_true", help="delete generated readings from DATABASE_URL")
+    parser.add_argument("--output", help="write the summary as JSON to this path")
+    args = parser.parse_args()
+
+    if not 1 <= args.batch <= settings.SENSOR_BATCH_SIZE:
+        parser.error(f"--batch must be between 1 and {settings.SENSOR_BATCH_SIZE}")
+
+    if args.in_process:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadgen")
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency + 8)
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.probe_timeout)
+
+    engine = conn = None
+    if args.mode == "copy" or args.cleanup:
+        engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+        conn = await engine.connect()
+        driver = (await conn.get_raw_connection()).driver_connection
+
+    stats = LoadStats()
+    fleet = DeviceFleet(args.devices, args.seed, args.faulty)
+    if args.mode == "copy":
+        sink = CopySink(driver, stats)
+    else:
+        sink = HttpSink(client, stats, args.batch, args.concurrency)
+
+    probe = LagProbe(fleet, sink, client, stats, args.probe_timeout, args.probe_poll)
+    probing = asyncio.create_task(probe.run(args.probe_interval)) if args.probe_interval > 0 else None
+
+    print(f"{args.devices} devices, {args.rate:g} readings/s for {args.duration:g}s ({args.mode})")
+    started = last = time.time()
+    next_report = started + REPORT_SECONDS
+    try:
+        while (now := time.time()) < started + args.duration:
+            readings = fleet.step(now, now - last, args.rate)
+            last = now
+            if readings is not None:
+                stats.offered += len(readings["lng"])
+                await sink.send(readings)
+            if now >= next_report:
+                print(stats.progress(now - started))
+                next_report += REPORT_SECONDS
+            await asyncio.sleep(max(0.0, TICK_SECONDS - (time.time() - now)))
+
+        await sink.drain()
+        elapsed = time.time() - started
+        if probing is not None:
+            probing.cancel()
+            await probe.drain()
+    finally:
+        if args.cleanup:
+            print(f"Removed generated readings ({await remove_seeded(driver)})")
+        if conn is not None:
+            await conn.close()
+            await engine.dispose()
+        await client.aclose()
+
+    summary = stats.summary(elapsed, args.rate)
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(args), "results": summary}, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
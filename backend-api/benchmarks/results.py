@@ -0,0 +1,42 @@
+"""
+Result summaries shared by the benchmark scripts
+"""
+
+from datetime import datetime
+from typing import Dict, List
+import argparse
+import platform
+import subprocess
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def summarize(timings: List[float], errors: int, elapsed: float = None) -> Dict:
+    ms = np.array(timings) * 1e3
+    summary = {
+        "requests": len(timings),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+    if elapsed is not None:
+        summary["throughput_rps"] = round(len(timings) / elapsed, 1)
+    return summary
+
+
+def environment(args: argparse.Namespace) -> Dict:
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": commit.stdout.strip() or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "interpolation_method": settings.INTERPOLATION_METHOD,
+        "args": vars(args),
+    }
@@ -4,25 +4,50 @@ Provides sample weather data for visualization
 """
 
 from fastapi import FastAPI, Query
+from contextlib import asynccontextmanager
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timedelta
 import math
 import random
 import json
-from typing import Dict, Optional
-import hashlib
-try:
-    from ephem import next_full_moon, previous_full_moon, Moon, Observer
-    EPHEM_AVAILABLE = True
-except ImportError:
-    EPHEM_AVAILABLE = False
-    next_full_moon = previous_full_moon = Moon = Observer = None
+from typing import Dict, Optional, Tuple
+import asyncio
+import os
+
+import numpy as np
+
+from app.services import indices
+from app.services.astronomy import astronomy
+from app.services.location_search import location_search
+from app.services.synthetic import SyntheticWeatherField
+from app.services.ttl_cache import TTLCache
+
+# Cache for weather data: LRU bounded in bytes, entries expire after
+# CACHE_DURATION and are swept in the background
+CACHE_DURATION = 300  # 5 minutes in seconds
+CACHE_MAX_BYTES = int(os.environ.get("DEMO_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+CACHE_EXPIRY_INTERVAL = 30  # seconds between expiry sweeps
+WEATHER_CACHE = TTLCache(ttl=CACHE_DURATION, max_bytes=CACHE_MAX_BYTES)
+
+# Cached weather is stored as a tuple of these fields
+WEATHER_FIELDS = (
+    "temperature", "humidity", "pressure", "wind_speed",
+    "wind_direction", "rainfall", "uv_index", "pm25",
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the cache expiry sweep for the lifetime of the server"""
+    expiry_task = asyncio.create_task(WEATHER_CACHE.run_expiry(CACHE_EXPIRY_INTERVAL))
+    yield
+    expiry_task.cancel()
 
 app = FastAPI(
     title="MicroClimate HK API",
     description="Hyperlocal weather prediction for Hong Kong",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -40,9 +65,14 @@ HONG_KONG_CENTER = {
     "lon": 114.1694,
 }
 
-# Cache for weather data (simple in-memory cache)
-WEATHER_CACHE: Dict[str, tuple] = {}
-CACHE_DURATION = 300  # 5 minutes in seconds
+# Synthetic weather, reproducible per seed and CACHE_DURATION time bucket
+WEATHER_FIELD = SyntheticWeatherField(
+    seed=int(os.environ.get("DEMO_SEED", "0")),
+    bucket_seconds=CACHE_DURATION
+)
+
+# Grid spacing of the grid endpoints, in degrees
+GRID_STEP = 0.05
 
 # Popular locations in Hong Kong
 LOCATIONS = {
@@ -56,190 +86,33 @@ LOCATIONS = {
     "victoria-peak": {"lat": 22.3165, "lon": 114.1526, "name": "Victoria Peak"},
 }
 
-def get_cache_key(lat: float, lon: float, elevation: float) -> str:
-    """Generate cache key for weather data"""
-    return hashlib.md5(f"{lat:.4f},{lon:.4f},{elevation}".encode()).hexdigest()
+def get_cache_key(lat: float, lon: float, elevation: float) -> tuple:
+    """Generate cache key for weather data (~10 m, 1 m elevation resolution)"""
+    return (round(lat * 1e4), round(lon * 1e4), round(elevation))
 
 def calculate_aqi(pm25: float) -> dict:
     """Calculate Air Quality Index from PM2.5"""
-    # AQI scale based on PM2.5 concentration (μg/m³)
-    if pm25 <= 12:
-        aqi = (pm25 / 12) * 50
-        category = "Good"
-        color = "#00E400"
-    elif pm25 <= 35.4:
-        aqi = 50 + ((pm25 - 12) / 23.4) * 50
-        category = "Moderate"
-        color = "#FFFF00"
-    elif pm25 <= 55.4:
-        aqi = 100 + ((pm25 - 35.4) / 20) * 50
-        category = "Unhealthy for Sensitive Groups"
-        color = "#FF7E00"
-    elif pm25 <= 150.4:
-        aqi = 150 + ((pm25 - 55.4) / 95) * 50
-        category = "Unhealthy"
-        color = "#FF0000"
-    else:
-        aqi = 200 + ((pm25 - 150.4) / 50) * 100
-        category = "Very Unhealthy"
-        color = "#8F3F97"
-    
-    return {
-        "value": round(min(500, aqi), 0),
-        "category": category,
-        "color": color
-    }
+    return indices.aqi_records(pm25)[0]
 
 def calculate_heat_index(temp_c: float, humidity: float) -> float:
     """Calculate heat index using temperature in Celsius and humidity percentage"""
-    # Convert to Fahrenheit for calculation
-    temp_f = (temp_c * 9/5) + 32
-    
-    # Heat index formula
-    c1 = -42.379
-    c2 = 2.04901523
-    c3 = 10.14333127
-    c4 = -0.22475541
-    c5 = -0.00683783
-    c6 = -0.05481717
-    c7 = 0.00122874
-    c8 = 0.00085282
-    c9 = -0.00000199
-    
-    hi = (c1 + c2*temp_f + c3*humidity + c4*temp_f*humidity + 
-          c5*temp_f*temp_f + c6*humidity*humidity + 
-          c7*temp_f*temp_f*humidity + c8*temp_f*humidity*humidity + 
-          c9*temp_f*temp_f*humidity*humidity)
-    
-    # Convert back to Celsius
-    return round((hi - 32) * 5/9, 1)
+    return round(float(indices.heat_index(temp_c, humidity)), 1)
 
 def calculate_wind_chill(temp_c: float, wind_speed: float) -> float:
     """Calculate wind chill using temperature in Celsius and wind speed in m/s"""
-    # Convert m/s to km/h
-    wind_kmh = wind_speed * 3.6
-    
-    # Wind chill formula (only applies when temp < 10°C)
-    if temp_c < 10:
-        wc = 13.12 + 0.6215*temp_c - 11.37*(wind_kmh**0.16) + 0.3965*(temp_c)*(wind_kmh**0.16)
-        return round(wc, 1)
-    return round(temp_c, 1)
+    return round(float(indices.wind_chill(temp_c, wind_speed)), 1)
 
 def calculate_comfort_index(temp_c: float, humidity: float) -> dict:
     """Calculate humidity comfort index (discomfort index)"""
-    # Discomfort Index (DI) = temp + 0.5 * humidity
-    di = temp_c + (0.5 * humidity)
-    
-    if di < 20:
-        level = "Comfortable"
-        emoji = "😊"
-    elif di < 25:
-        level = "Fairly Comfortable"
-        emoji = "🙂"
-    elif di < 30:
-        level = "Uncomfortably Warm"
-        emoji = "😅"
-    elif di < 35:
-        level = "Very Uncomfortable"
-        emoji = "😰"
-    else:
-        level = "Dangerously Hot"
-        emoji = "🥵"
-    
-    return {
-        "index": round(di, 1),
-        "level": level,
-        "emoji": emoji
-    }
+    return indices.comfort_records(temp_c, humidity)[0]
 
 def get_sunrise_sunset(lat: float, lon: float):
-    """Calculate sunrise and sunset times for a location"""
-    """Calculate sunrise and sunset times with graceful fallback when ephem is unavailable"""
-    if not EPHEM_AVAILABLE:
-        sunrise = datetime.utcnow().replace(hour=6, minute=30, second=0, microsecond=0)
-        sunset = datetime.utcnow().replace(hour=18, minute=30, second=0, microsecond=0)
-        return {
-            "sunrise_time": sunrise.strftime("%H:%M"),
-            "sunset_time": sunset.strftime("%H:%M"),
-            "day_length": "12:00:00",
-            "method": "fallback",
-        }
-
-    try:
-        obs = Observer()
-        obs.lat = str(lat)
-        obs.lon = str(lon)
-        obs.elevation = 50
-        obs.date = datetime.utcnow()
-        obs.pressure = 0
-        obs.horizon = '-0:34'
-        sunrise = obs.next_rising(next_full_moon(obs.date)).datetime()
-        sunset = obs.next_setting(next_full_moon(obs.date)).datetime()
-        return {
-            "sunrise_time": sunrise.strftime("%H:%M"),
-            "sunset_time": sunset.strftime("%H:%M"),
-            "day_length": str(sunset - sunrise),
-            "method": "ephem",
-        }
-    except Exception:
-        sunrise = datetime.utcnow().replace(hour=6, minute=30, second=0, microsecond=0)
-        sunset = datetime.utcnow().replace(hour=18, minute=30, second=0, microsecond=0)
-        return {
-            "sunrise_time": sunrise.strftime("%H:%M"),
-            "sunset_time": sunset.strftime("%H:%M"),
-            "day_length": "12:00:00",
-            "method": "fallback",
-        }
+    """Sunrise and sunset times (HKT) for a location, memoized per date and ~5 km cell"""
+    return astronomy.sunrise_sunset(lat, lon)
 
 def get_moon_phase():
-    """Get current moon phase"""
-    """Calculate moon phase and illumination with optional ephem support"""
-    if not EPHEM_AVAILABLE:
-        return {
-            "phase": "Waxing Gibbous",
-            "illumination": 75.0,
-            "emoji": "🌔",
-            "percentage": 75,
-            "method": "fallback",
-        }
-
-    try:
-        moon = Moon()
-        moon.compute()
-        phase = moon.phase / 100
-        if phase < 0.03:
-            moon_name = "New Moon"
-            emoji = "🌑"
-        elif phase < 0.25:
-            moon_name = "Waxing Crescent"
-            emoji = "🌒"
-        elif phase < 0.5:
-            moon_name = "First Quarter"
-            emoji = "🌓"
-        elif phase < 0.75:
-            moon_name = "Waxing Gibbous"
-            emoji = "🌔"
-        else:
-            moon_name = "Full Moon"
-            emoji = "🌕"
-
-        phase_pct = round((1 - phase) * 100) if phase > 0.5 else round(phase * 100)
-
-        return {
-            "phase": moon_name,
-            "illumination": round(moon.phase, 1),
-            "emoji": emoji,
-            "percentage": phase_pct,
-            "method": "ephem",
-        }
-    except Exception:
-        return {
-            "phase": "Waxing Gibbous",
-            "illumination": 75.0,
-            "emoji": "🌔",
-            "percentage": 75,
-            "method": "fallback",
-        }
+    """Current moon phase and illumination, memoized per date"""
+    return astronomy.moon_phase()
 
 def get_wind_direction_name(degrees: int) -> str:
     """Convert wind direction degrees to compass direction"""
@@ -248,50 +121,60 @@ def get_wind_direction_name(degrees: int) -> str:
     idx = round(degrees / 22.5) % 16
     return directions[idx]
 
+def weather_records(values: Dict[str, np.ndarray]) -> list:
+    """Per-point weather dicts from synthetic field arrays, rounded for display"""
+    columns = {
+        "temperature": np.round(values["temperature"], 1).ravel().tolist(),
+        "humidity": np.round(values["humidity"], 1).ravel().tolist(),
+        "pressure": np.round(values["pressure"], 2).ravel().tolist(),
+        "wind_speed": np.round(values["wind_speed"], 1).ravel().tolist(),
+        "wind_direction": values["wind_direction"].astype(int).ravel().tolist(),
+        "rainfall": np.round(values["rainfall"], 1).ravel().tolist(),
+        "uv_index": values["uv_index"].astype(int).ravel().tolist(),
+        "pm25": np.round(values["pm25"], 1).ravel().tolist(),
+    }
+    return [
+        {**dict(zip(columns, row)), "aqi": aqi}
+        for row, aqi in zip(zip(*columns.values()), indices.aqi_records(columns["pm25"]))
+    ]
+
 def generate_weather_at_location(lat: float, lon: float, elevation: float = 50, use_cache: bool = True) -> dict:
     """Generate mock weather data for a location based on distance and elevation"""
     
     cache_key = get_cache_key(lat, lon, elevation)
     
     # Check cache
-    if use_cache and cache_key in WEATHER_CACHE:
-        cached_data, cached_time = WEATHER_CACHE[cache_key]
-        if (datetime.utcnow() - cached_time).total_seconds() < CACHE_DURATION:
-            return cached_data
-    
-    # Base weather
-    base_temp = 24.0 + random.uniform(-2, 2)
-    base_humidity = 70.0 + random.uniform(-10, 10)
-    
-    # Elevation effect (~0.6°C per 100m)
-    elevation_effect = -(elevation / 100) * 0.6
-    
-    # Distance from center effect (urban heat island)
-    dist = math.sqrt((lat - HONG_KONG_CENTER["lat"])**2 + (lon - HONG_KONG_CENTER["lon"])**2)
-    distance_effect = dist * 2  # Cooler farther from downtown
-    
-    temperature = base_temp + elevation_effect + distance_effect
-    humidity = base_humidity - (elevation / 100) * 2  # Lower humidity at higher elevations
-    pm25 = 35 + random.uniform(-10, 15)
-    
-    data = {
-        "temperature": round(temperature, 1),
-        "humidity": round(max(20, min(100, humidity)), 1),
-        "pressure": round(1013.25 - (elevation / 100) * 0.1, 2),
-        "wind_speed": round(5 + (elevation / 100) * 0.5 + random.uniform(0, 2), 1),
-        "wind_direction": random.randint(0, 360),
-        "rainfall": round(random.uniform(0, 5), 1),
-        "uv_index": random.randint(3, 9),
-        "pm25": round(pm25, 1),
-        "aqi": calculate_aqi(pm25),
-    }
+    cached = WEATHER_CACHE.get(cache_key) if use_cache else None
+    if cached is not None:
+        data = dict(zip(WEATHER_FIELDS, cached))
+        data["aqi"] = calculate_aqi(data["pm25"])
+        return data
+    
+    data = weather_records(WEATHER_FIELD.evaluate(lat, lon, elevation))[0]
     
     # Cache the data
     if use_cache:
-        WEATHER_CACHE[cache_key] = (data, datetime.utcnow())
+        WEATHER_CACHE.set(cache_key, tuple(data[field] for field in WEATHER_FIELDS))
     
     return data
 
+def parse_bounds(bounds: str) -> Tuple[float, float, float, float]:
+    """min_lat,min_lon,max_lat,max_lon from a query string, defaulting to central HK"""
+    try:
+        min_lat, min_lon, max_lat, max_lon = map(float, bounds.split(","))
+    except ValueError:
+        min_lat, min_lon, max_lat, max_lon = 22.2, 114.1, 22.4, 114.3
+    return min_lat, min_lon, max_lat, max_lon
+
+def grid_weather(min_lat: float, min_lon: float, max_lat: float, max_lon: float, step: float = GRID_STEP):
+    """Grid point coordinates and synthetic weather for a bounding box in one evaluation"""
+    # Integer point counts, so the grid does not drift with float accumulation
+    lats = min_lat + np.arange(max(0, int(np.floor((max_lat - min_lat) / step + 1e-9)) + 1)) * step
+    lons = min_lon + np.arange(max(0, int(np.floor((max_lon - min_lon) / step + 1e-9)) + 1)) * step
+    grid_lats, grid_lons = np.meshgrid(np.round(lats, 6), np.round(lons, 6), indexing="ij")
+    values = WEATHER_FIELD.evaluate(grid_lats, grid_lons, 50)
+    return grid_lats.ravel().tolist(), grid_lons.ravel().tolist(), values
+
 @app.get("/")
 async def root():
     """Welcome endpoint"""
@@ -327,29 +210,25 @@ async def get_weather_grid(
     bounds: str = Query("22.2,114.1,22.4,114.3", description="Bounds as min_lat,min_lon,max_lat,max_lon")
 ):
     """Get weather grid for map visualization"""
-    try:
-        parts = bounds.split(",")
-        min_lat, min_lon, max_lat, max_lon = map(float, parts)
-    except:
-        min_lat, min_lon, max_lat, max_lon = 22.2, 114.1, 22.4, 114.3
+    min_lat, min_lon, max_lat, max_lon = parse_bounds(bounds)
+    lats, lons, values = grid_weather(min_lat, min_lon, max_lat, max_lon)
     
-    grid_points = []
-    step = 0.05
-    
-    lat = min_lat
-    while lat <= max_lat:
-        lon = min_lon
-        while lon <= max_lon:
-            weather = generate_weather_at_location(lat, lon, 50)
-            grid_points.append({
-                "lat": lat,
-                "lon": lon,
-                "temperature": weather["temperature"],
-                "humidity": weather["humidity"],
-                "wind_speed": weather["wind_speed"],
-            })
-            lon += step
-        lat += step
+    grid_points = [
+        {
+            "lat": lat,
+            "lon": lon,
+            "temperature": temperature,
+            "humidity": humidity,
+            "wind_speed": wind_speed,
+        }
+        for lat, lon, temperature, humidity, wind_speed in zip(
+            lats,
+            lons,
+            np.round(values["temperature"], 1).ravel().tolist(),
+            np.round(values["humidity"], 1).ravel().tolist(),
+            np.round(values["wind_speed"], 1).ravel().tolist(),
+        )
+    ]
     
     return {
         "grid_points": grid_points,
@@ -526,20 +405,18 @@ async def get_active_alerts():
 @app.get("/api/v1/locations/search")
 async def search_locations(query: str = Query("", description="Location search query")):
     """Search for locations in Hong Kong"""
-    results = []
-    query_lower = query.lower()
-    
-    for key, location in LOCATIONS.items():
-        if query_lower in key or query_lower in location["name"].lower():
-            results.append({
-                "id": key,
-                "name": location["name"],
-                "latitude": location["lat"],
-                "longitude": location["lon"],
-            })
-    
-    # If no results, return all locations
-    if not results and not query:
+    if query:
+        results = [
+            {
+                "id": place["id"],
+                "name": place["name"] or place["name_zh"],
+                "latitude": place["latitude"],
+                "longitude": place["longitude"],
+            }
+            for place in location_search.index.search(query, limit=20)
+        ]
+    else:
+        # No query: return all locations
         results = [
             {
                 "id": key,
@@ -640,27 +517,35 @@ async def compare_weather(
     locations: str = Query("central,mong-kok,shatin", description="Comma-separated location IDs")
 ):
     """Compare weather across multiple locations"""
-    location_ids = locations.split(",")
-    comparison = []
-    
-    for loc_id in location_ids:
-        if loc_id.strip() in LOCATIONS:
-            loc = LOCATIONS[loc_id.strip()]
-            weather = generate_weather_at_location(loc["lat"], loc["lon"], 50)
-            heat_index = calculate_heat_index(weather["temperature"], weather["humidity"])
-            wind_chill = calculate_wind_chill(weather["temperature"], weather["wind_speed"])
-            comfort = calculate_comfort_index(weather["temperature"], weather["humidity"])
-            
-            comparison.append({
-                "id": loc_id.strip(),
-                "name": loc["name"],
-                "latitude": loc["lat"],
-                "longitude": loc["lon"],
-                "weather": weather,
-                "heat_index": heat_index,
-                "wind_chill": wind_chill,
-                "comfort_index": comfort,
-            })
+    location_ids = [loc_id.strip() for loc_id in locations.split(",") if loc_id.strip() in LOCATIONS]
+    weathers = [
+        generate_weather_at_location(LOCATIONS[loc_id]["lat"], LOCATIONS[loc_id]["lon"], 50)
+        for loc_id in location_ids
+    ]
+    
+    # Indices for all locations in one pass
+    temps = np.array([w["temperature"] for w in weathers])
+    humids = np.array([w["humidity"] for w in weathers])
+    winds = np.array([w["wind_speed"] for w in weathers])
+    heat_indices = np.round(indices.heat_index(temps, humids), 1).tolist()
+    wind_chills = np.round(indices.wind_chill(temps, winds), 1).tolist()
+    comforts = indices.comfort_records(temps, humids)
+    
+    comparison = [
+        {
+            "id": loc_id,
+            "name": LOCATIONS[loc_id]["name"],
+            "latitude": LOCATIONS[loc_id]["lat"],
+            "longitude": LOCATIONS[loc_id]["lon"],
+            "weather": weather,
+            "heat_index": heat_index,
+            "wind_chill": wind_chill,
+            "comfort_index": comfort,
+        }
+        for loc_id, weather, heat_index, wind_chill, comfort in zip(
+            location_ids, weathers, heat_indices, wind_chills, comforts
+        )
+    ]
     
     return {
         "comparison": comparison,
@@ -672,29 +557,25 @@ async def get_heatmap_grid(
     bounds: str = Query("22.2,114.1,22.4,114.3", description="Bounds as min_lat,min_lon,max_lat,max_lon")
 ):
     """Get precipitation probability heatmap grid"""
-    try:
-        parts = bounds.split(",")
-        min_lat, min_lon, max_lat, max_lon = map(float, parts)
-    except:
-        min_lat, min_lon, max_lat, max_lon = 22.2, 114.1, 22.4, 114.3
+    min_lat, min_lon, max_lat, max_lon = parse_bounds(bounds)
+    lats, lons, values = grid_weather(min_lat, min_lon, max_lat, max_lon)
     
-    grid_points = []
-    step = 0.05
-    
-    lat = min_lat
-    while lat <= max_lat:
-        lon = min_lon
-        while lon <= max_lon:
-            weather = generate_weather_at_location(lat, lon, 50)
-            grid_points.append({
-                "lat": lat,
-                "lon": lon,
-                "rainfall_probability": weather["rainfall"] * 10,  # 0-50%
-                "temperature": weather["temperature"],
-                "aqi": calculate_aqi(weather["pm25"])["value"],
-            })
-            lon += step
-        lat += step
+    grid_points = [
+        {
+            "lat": lat,
+            "lon": lon,
+            "rainfall_probability": rainfall * 10,  # 0-50%
+            "temperature": temperature,
+            "aqi": aqi,
+        }
+        for lat, lon, rainfall, temperature, aqi in zip(
+            lats,
+            lons,
+            np.round(values["rainfall"], 1).ravel().tolist(),
+            np.round(values["temperature"], 1).ravel().tolist(),
+            np.round(indices.aqi(np.round(values["pm25"], 1))).ravel().tolist(),
+        )
+    ]
     
     return {
         "grid_points": grid_points,
@@ -707,6 +588,11 @@ async def get_heatmap_grid(
         "timestamp": datetime.utcnow().isoformat() + "Z",
     }
 
+@app.get("/debug/cache")
+async def get_cache_stats():
+    """Weather cache size, limits and hit/eviction counters"""
+    return WEATHER_CACHE.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
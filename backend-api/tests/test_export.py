@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from app.api.v1 import weather
+
+
+@pytest.fixture
+def export_calls(monkeypatch):
+    """Capture the arguments of stream_export instead of querying the database"""
+    calls = []
+
+    async def fake_stream_export(columns, start, end, bbox, fmt):
+        calls.append((start, end))
+        yield b""
+
+    monkeypatch.setattr(weather, "stream_export", fake_stream_export)
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(weather.router, prefix="/api/weather")
+    return TestClient(app)
+
+
+def test_export_accepts_utc_designator(client, export_calls):
+    day = (datetime.utcnow() - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    response = client.get("/api/weather/export", params={"start": day.strftime("%Y-%m-%dT%H:%M:%SZ")})
+
+    assert response.status_code == 200
+    start, end = export_calls[0]
+    assert start == day
+    assert start.tzinfo is None and end.tzinfo is None
+
+
+def test_export_mixes_aware_and_naive_bounds(client, export_calls):
+    response = client.get(
+        "/api/weather/export",
+        params={"start": "2024-01-01T08:00:00+08:00", "end": "2024-01-02T00:00:00"},
+    )
+
+    assert response.status_code == 200
+    assert export_calls == [(datetime(2024, 1, 1), datetime(2024, 1, 2))]
+
+
+def test_export_rejects_end_before_start_across_offsets(client, export_calls):
+    response = client.get(
+        "/api/weather/export",
+        params={"start": "2024-01-01T00:00:00Z", "end": "2024-01-01T07:00:00+08:00"},
+    )
+
+    assert response.status_code == 400
+    assert export_calls == []
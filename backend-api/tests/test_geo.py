@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from app.core.geo import distance_meters, project, unproject
+
+# EPSG:32650 (UTM zone 50N) coordinates from PROJ
+IFC = (114.1580, 22.2855, 207151.037041, 2467184.192834)
+ICC = (114.1636, 22.3045, 207767.983479, 2469278.292212)
+
+
+@pytest.mark.parametrize("lng, lat, easting, northing", [IFC, ICC, (117.0, 0.0, 500000.0, 0.0)])
+def test_project_matches_utm_50n(lng, lat, easting, northing):
+    x, y = project(lng, lat)[0]
+
+    assert x == pytest.approx(easting, abs=1e-3)
+    assert y == pytest.approx(northing, abs=1e-3)
+
+
+def test_distance_meters_between_known_pair():
+    expected = np.hypot(IFC[2] - ICC[2], IFC[3] - ICC[3])
+
+    assert distance_meters(IFC[0], IFC[1], ICC[0], ICC[1]) == pytest.approx(expected, abs=1e-3)
+    assert expected == pytest.approx(2183.088, abs=1e-3)
+
+
+def test_unproject_inverts_project():
+    lngs, lats = np.array([113.9, 114.17, 114.4]), np.array([22.2, 22.3, 22.5])
+
+    back_lngs, back_lats = unproject(project(lngs, lats))
+
+    np.testing.assert_allclose(back_lngs, lngs, atol=1e-9)
+    np.testing.assert_allclose(back_lats, lats, atol=1e-9)
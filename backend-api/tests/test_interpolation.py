@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from app.services.ml_service import OrdinaryKriging, idw_kernel
+
+STATIONS = np.array([[0.0, 0.0], [3000.0, 0.0], [0.0, 4000.0], [5000.0, 5000.0], [1500.0, 2500.0]])
+VALUES = np.array([
+    [25.0, 80.0],
+    [27.5, 70.0],
+    [24.0, 90.0],
+    [29.0, 60.0],
+    [26.0, 75.0],
+])
+
+
+def test_idw_kernel_matches_hand_computed_weights():
+    values = np.array([[10.0, 100.0], [20.0, 200.0]])
+    distances = np.array([[1.0, 3.0]])
+    indices = np.array([[0, 1]])
+
+    # Weights 1/1 and 1/3, normalised to 0.75 and 0.25
+    assert idw_kernel(values, distances, indices, power=1) == pytest.approx(np.array([[12.5, 125.0]]), rel=1e-5)
+    # Weights 1/1 and 1/9, normalised to 0.9 and 0.1
+    assert idw_kernel(values, distances, indices, power=2) == pytest.approx(np.array([[11.0, 110.0]]), rel=1e-5)
+
+
+@pytest.mark.parametrize("max_global", [64, 0])
+def test_kriging_reproduces_station_values(max_global):
+    model = OrdinaryKriging(STATIONS, nugget=0.0, max_global=max_global, neighbours=4)
+
+    estimates, variance = model.predict(VALUES, STATIONS)
+
+    np.testing.assert_allclose(estimates, VALUES, atol=1e-6)
+    np.testing.assert_allclose(variance, 0.0, atol=1e-6)
+
+
+def test_kriging_per_point_neighbourhoods_reproduce_station_values():
+    model = OrdinaryKriging(STATIONS, nugget=0.0, max_global=0)
+    # Each station with two or three others; len(STATIONS) pads short rows
+    neighbourhoods = np.array([[0, 1, 2, 5], [1, 3, 4, 5], [2, 0, 4, 3], [3, 4, 1, 5], [4, 0, 1, 2]])
+
+    estimates, _ = model.predict_each(VALUES, STATIONS, neighbourhoods)
+
+    np.testing.assert_allclose(estimates, VALUES, atol=1e-6)
@@ -0,0 +1,41 @@
+import pytest
+
+from app.services.location_search import LocationIndex, PlaceEntry
+
+
+@pytest.fixture
+def index():
+    return LocationIndex([
+        PlaceEntry("central", "Central", "中環", 22.2820, 114.1588, "district"),
+        PlaceEntry("mong-kok", "Mong Kok", "旺角", 22.3193, 114.1694, "district"),
+        PlaceEntry("ifc", "International Finance Centre", "國際金融中心", 22.2855, 114.1580, "building"),
+        PlaceEntry("peak", "The Peak Tower", "凌霄閣", 22.2708, 114.1497, "place"),
+    ])
+
+
+def test_prefix_matches_name_and_word_starts(index):
+    assert [r["id"] for r in index.search("cen")] == ["central", "ifc"]
+    assert [r["id"] for r in index.search("pea")] == ["peak"]
+    assert [r["id"] for r in index.search("旺")] == ["mong-kok"]
+
+
+def test_exact_name_ranks_first(index):
+    results = index.search("Central")
+
+    assert results[0]["id"] == "central"
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_fuzzy_matches_misspelling(index):
+    assert [r["id"] for r in index.search("mongkok")] == ["mong-kok"]
+
+
+def test_nearest_orders_by_distance(index):
+    results = index.nearest(22.2856, 114.1581, limit=2)
+
+    assert [r["id"] for r in results] == ["ifc", "central"]
+    assert results[0]["distance_meters"] < 20
+
+
+def test_nearest_respects_max_distance(index):
+    assert index.nearest(22.40, 114.30, limit=3, max_distance=1000) == []
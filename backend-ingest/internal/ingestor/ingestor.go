@@ -120,13 +120,17 @@ func (i *Ingestor) processReading(ctx context.Context, reading *models.SensorRea
 		return nil
 	}
 
+	// Save to database first: subscribers treat a published reading as
+	// committed and advance their cache epochs on it
+	if err := i.saveReading(ctx, calibrated); err != nil {
+		return err
+	}
+
 	// Publish to Redis for real-time updates
 	if err := i.publishReading(ctx, calibrated); err != nil {
 		i.logger.Error("Failed to publish reading", zap.Error(err))
 	}
-
-	// Save to database (batched)
-	return i.saveReading(ctx, calibrated)
+	return nil
 }
 
 func (i *Ingestor) calibrateReading(reading *models.SensorReading) *models.SensorReading {
@@ -3,6 +3,14 @@ CREATE EXTENSION IF NOT EXISTS timescaledb;
 CREATE EXTENSION IF NOT EXISTS postgis;
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Spatial partition cell of a point: a global 0.02 degree (~2 km) grid,
+-- row-major from (-90, -180). Must match cell_ids() in app/core/geo.py.
+CREATE OR REPLACE FUNCTION weather_cell_id(lat DOUBLE PRECISION, lng DOUBLE PRECISION)
+RETURNS INTEGER
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+    SELECT floor((lat + 90) / 0.02)::integer * 18000 + floor((lng + 180) / 0.02)::integer
+$$;
+
 -- Weather Readings Table (TimescaleDB Hypertable)
 CREATE TABLE IF NOT EXISTS weather_readings (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -21,16 +29,40 @@ CREATE TABLE IF NOT EXISTS weather_readings (
     -- Metadata
     source VARCHAR(50) NOT NULL,
     confidence DOUBLE PRECISION DEFAULT 1.0,
-    sensor_id VARCHAR(255)
+    sensor_id VARCHAR(255),
+    
+    -- Spatial partition, weather_cell_id(lat, lng), set by set_weather_cell_id()
+    cell_id INTEGER
 );
 
 -- Convert to hypertable for time-series optimization
 SELECT create_hypertable('weather_readings', 'timestamp', if_not_exists => TRUE);
 
+-- Space partitioning: hash cells into 8 partitions per time chunk, so area
+-- queries filtered on cell_id skip other partitions and scan in parallel
+SELECT add_dimension('weather_readings', 'cell_id', number_partitions => 8, if_not_exists => TRUE);
+
+-- Fill cell_id from the location on every insert, so writers need not
+-- compute it and no row is hidden from cell-filtered area queries
+CREATE OR REPLACE FUNCTION set_weather_cell_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.cell_id := weather_cell_id(ST_Y(NEW.location), ST_X(NEW.location));
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS weather_readings_cell_id ON weather_readings;
+CREATE TRIGGER weather_readings_cell_id
+    BEFORE INSERT OR UPDATE OF location ON weather_readings
+    FOR EACH ROW EXECUTE FUNCTION set_weather_cell_id();
+
 -- Create spatial index
 CREATE INDEX IF NOT EXISTS idx_weather_location ON weather_readings USING GIST(location);
 CREATE INDEX IF NOT EXISTS idx_weather_time_location ON weather_readings(timestamp, location);
 CREATE INDEX IF NOT EXISTS idx_weather_sensor ON weather_readings(sensor_id);
+CREATE INDEX IF NOT EXISTS idx_weather_cell_time ON weather_readings(cell_id, timestamp DESC);
 
 -- Sensor Stations Table
 CREATE TABLE IF NOT EXISTS sensor_stations (
@@ -94,8 +126,10 @@ CREATE TABLE IF NOT EXISTS building_data (
     floors INTEGER,
     facing VARCHAR(20),
     
-    -- Footprint
+    -- Footprint and attributes derived from it (see app/db/load_buildings.py)
     footprint GEOMETRY(POLYGON, 4326),
+    footprint_area DOUBLE PRECISION,
+    orientation_deg DOUBLE PRECISION,
     
     -- Metadata
     created_at TIMESTAMPTZ DEFAULT NOW(),
@@ -155,11 +189,35 @@ CREATE TABLE IF NOT EXISTS users (
 
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 
--- Data retention policies (optional - for production)
--- Keep raw sensor data for 30 days, then downsample
--- SELECT add_retention_policy('weather_readings', INTERVAL '30 days');
+-- Compression: chunks older than 7 days are compressed per sensor
+ALTER TABLE weather_readings SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'sensor_id',
+    timescaledb.compress_orderby = 'timestamp DESC'
+);
+SELECT add_compression_policy('weather_readings', INTERVAL '7 days', if_not_exists => TRUE);
+
+-- Continuous aggregates (downsampling tiers), finest first:
+--   weather_readings  raw        kept 30 days
+--   weather_5min      5 minutes  kept 180 days
+--   weather_hourly    1 hour     kept 2 years
+--   weather_daily     1 day      kept indefinitely
+-- Keep these intervals in sync with the RETENTION_* settings; the
+-- maintenance CLI (python -m app.db.maintenance verify) checks them.
+CREATE MATERIALIZED VIEW IF NOT EXISTS weather_5min
+WITH (timescaledb.continuous) AS
+SELECT
+    time_bucket('5 minutes', timestamp) AS bucket,
+    ST_SnapToGrid(location, 0.001) AS grid_location,
+    AVG(temperature) AS avg_temperature,
+    AVG(humidity) AS avg_humidity,
+    AVG(rainfall) AS avg_rainfall,
+    AVG(wind_speed) AS avg_wind_speed,
+    COUNT(*) AS reading_count
+FROM weather_readings
+GROUP BY bucket, grid_location
+WITH NO DATA;
 
--- Create continuous aggregates for performance
 CREATE MATERIALIZED VIEW IF NOT EXISTS weather_hourly
 WITH (timescaledb.continuous) AS
 SELECT
@@ -174,7 +232,41 @@ FROM weather_readings
 GROUP BY hour, grid_location
 WITH NO DATA;
 
--- Refresh policy for continuous aggregate
+CREATE MATERIALIZED VIEW IF NOT EXISTS weather_daily
+WITH (timescaledb.continuous) AS
+SELECT
+    time_bucket('1 day', timestamp) AS day,
+    ST_SnapToGrid(location, 0.001) AS grid_location,
+    AVG(temperature) AS avg_temperature,
+    MIN(temperature) AS min_temperature,
+    MAX(temperature) AS max_temperature,
+    AVG(humidity) AS avg_humidity,
+    AVG(rainfall) AS avg_rainfall,
+    AVG(wind_speed) AS avg_wind_speed,
+    COUNT(*) AS reading_count
+FROM weather_readings
+GROUP BY day, grid_location
+WITH NO DATA;
+
+-- Real-time aggregation: buckets past the last refresh (end_offset) are
+-- computed from raw readings at query time, so tier queries include the
+-- newest buckets
+ALTER MATERIALIZED VIEW weather_5min SET (timescaledb.materialized_only = false);
+ALTER MATERIALIZED VIEW weather_hourly SET (timescaledb.materialized_only = false);
+ALTER MATERIALIZED VIEW weather_daily SET (timescaledb.materialized_only = false);
+
+CREATE INDEX IF NOT EXISTS idx_weather_5min_location ON weather_5min USING GIST(grid_location);
+CREATE INDEX IF NOT EXISTS idx_weather_hourly_location ON weather_hourly USING GIST(grid_location);
+CREATE INDEX IF NOT EXISTS idx_weather_daily_location ON weather_daily USING GIST(grid_location);
+
+-- Refresh policies for continuous aggregates
+SELECT add_continuous_aggregate_policy('weather_5min',
+    start_offset => INTERVAL '1 hour',
+    end_offset => INTERVAL '5 minutes',
+    schedule_interval => INTERVAL '5 minutes',
+    if_not_exists => TRUE
+);
+
 SELECT add_continuous_aggregate_policy('weather_hourly',
     start_offset => INTERVAL '3 hours',
     end_offset => INTERVAL '1 hour',
@@ -182,6 +274,18 @@ SELECT add_continuous_aggregate_policy('weather_hourly',
     if_not_exists => TRUE
 );
 
+SELECT add_continuous_aggregate_policy('weather_daily',
+    start_offset => INTERVAL '3 days',
+    end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 day',
+    if_not_exists => TRUE
+);
+
+-- Retention policies; each tier outlives the raw data it is refreshed from
+SELECT add_retention_policy('weather_readings', INTERVAL '30 days', if_not_exists => TRUE);
+SELECT add_retention_policy('weather_5min', INTERVAL '180 days', if_not_exists => TRUE);
+SELECT add_retention_policy('weather_hourly', INTERVAL '730 days', if_not_exists => TRUE);
+
 -- Sample data for testing (Hong Kong locations)
 INSERT INTO building_data (building_id, address, location, height_meters, floors, facing) VALUES
     ('ifc-hk', 'International Finance Centre', ST_SetSRID(ST_MakePoint(114.1580, 22.2855), 4326), 420, 88, 'mixed'),